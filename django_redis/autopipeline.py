@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import threading
+from collections import deque
+
+from redis.exceptions import ResponseError
+
+from .pool import ConnectionPool
+
+# Commands that change the state of their connection or block it,
+# and so need a connection of their own.
+DEDICATED_COMMANDS = frozenset([
+    "MULTI", "WATCH", "UNWATCH", "EXEC", "DISCARD", "pubsub", "SUBSCRIBE", "PSUBSCRIBE",
+    "MONITOR", "SELECT", "AUTH", "CLIENT", "BLPOP", "BRPOP", "BRPOPLPUSH", "WAIT",
+])
+
+
+class _Request(object):
+    __slots__ = ("command", "done", "value", "error", "event")
+
+    def __init__(self, command):
+        self.command = command
+        self.done = False
+        self.value = None
+        self.error = None
+        self.event = threading.Event()
+
+
+class AutoPipeline(object):
+    """
+    Send the commands of concurrent threads over one connection.
+
+    Commands are queued; a thread waiting for a reply while no batch
+    is in flight becomes the leader: it sends all the queued commands
+    in one write and reads their replies in order, while the next
+    commands queue up. Then it hands the lead to the thread of the
+    oldest queued command, if any.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.batches = 0
+        self.commands = 0
+        self._queue = []
+        self._flushing = False
+        self._lock = threading.Lock()
+
+    def submit(self, command):
+        request = _Request(command)
+        with self._lock:
+            self._queue.append(request)
+        return request
+
+    def result(self, request):
+        with self._lock:
+            lead = not self._flushing
+            self._flushing = True
+
+        if not lead:
+            # Woken up when done, or when handed the lead.
+            request.event.wait()
+
+        if not request.done:
+            with self._lock:
+                batch, self._queue = self._queue, []
+            try:
+                self._flush(batch)
+            finally:
+                with self._lock:
+                    if self._queue:
+                        self._queue[0].event.set()
+                    else:
+                        self._flushing = False
+
+        if request.error is not None:
+            raise request.error
+        return request.value
+
+    def _done(self, request):
+        request.done = True
+        request.event.set()
+
+    def _fail(self, requests, error):
+        self.connection.disconnect()
+        for request in requests:
+            request.error = error
+            self._done(request)
+
+    def _flush(self, batch):
+        self.batches += 1
+        self.commands += len(batch)
+
+        try:
+            self.connection.send_packed_command([chunk for request in batch
+                                                 for chunk in request.command])
+        except Exception as e:
+            self._fail(batch, e)
+            return
+
+        for index, request in enumerate(batch):
+            try:
+                request.value = self.connection.read_response()
+            except ResponseError as e:
+                request.error = e
+            except Exception as e:
+                self._fail(batch[index:], e)
+                return
+            self._done(request)
+
+
+class MultiplexedConnection(object):
+    """
+    Connection handed to a single command, which sends it
+    through the shared auto pipeline.
+    """
+
+    def __init__(self, auto_pipeline):
+        self._auto_pipeline = auto_pipeline
+        self._requests = deque()
+        self.retry_on_timeout = auto_pipeline.connection.retry_on_timeout
+
+    def send_command(self, *args):
+        command = self._auto_pipeline.connection.pack_command(*args)
+        self._requests.append(self._auto_pipeline.submit(command))
+
+    def read_response(self):
+        return self._auto_pipeline.result(self._requests.popleft())
+
+    def disconnect(self):
+        # The auto pipeline drops the shared connection on errors.
+        pass
+
+
+class AutoPipelineConnectionPool(ConnectionPool):
+    """
+    Connection pool that multiplexes single commands over one shared
+    connection with an AutoPipeline. Pipelines, transactions, pub/sub
+    and blocking commands get a connection of their own.
+    """
+
+    def reset(self):
+        super(AutoPipelineConnectionPool, self).reset()
+        self._auto_pipeline = None
+        self._auto_pipeline_lock = threading.Lock()
+
+    def get_auto_pipeline(self):
+        if self._auto_pipeline is None:
+            with self._auto_pipeline_lock:
+                if self._auto_pipeline is None:
+                    self._auto_pipeline = AutoPipeline(self.make_connection())
+        return self._auto_pipeline
+
+    def get_connection(self, command_name, *keys, **options):
+        if command_name in DEDICATED_COMMANDS:
+            return super(AutoPipelineConnectionPool, self).get_connection(
+                command_name, *keys, **options)
+
+        self._checkpid()
+        return MultiplexedConnection(self.get_auto_pipeline())
+
+    def release(self, connection):
+        if not isinstance(connection, MultiplexedConnection):
+            super(AutoPipelineConnectionPool, self).release(connection)
+
+    def disconnect(self):
+        super(AutoPipelineConnectionPool, self).disconnect()
+        if self._auto_pipeline is not None:
+            self._auto_pipeline.connection.disconnect()
+
+    def stats(self):
+        stats = super(AutoPipelineConnectionPool, self).stats()
+        auto_pipeline = self._auto_pipeline
+        stats["batches"] = auto_pipeline.batches if auto_pipeline else 0
+        stats["batched_commands"] = auto_pipeline.commands if auto_pipeline else 0
+        return stats
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import threading
+import time
+
+from redis.exceptions import ConnectionError
+
+from .replicas import _connection_exceptions
+from .signals import circuit_breaker_state_changed
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreakerOpen(ConnectionError):
+    """
+    Raised instead of sending a command to a server whose
+    circuit breaker is open.
+    """
+
+
+class CircuitBreaker(object):
+    """
+    Stop sending commands to an unhealthy server.
+
+    The breaker opens when at least ``failure_rate`` of the last
+    ``min_requests`` or more commands sent within ``window`` seconds
+    failed with a connection error or a timeout. While open, commands
+    fail immediately with CircuitBreakerOpen. After ``reset_timeout``
+    seconds it lets ``half_open_requests`` probe commands through:
+    the breaker closes if they succeed and opens again otherwise.
+    """
+
+    def __init__(self, url, failure_rate=0.5, min_requests=10, window=10,
+                 reset_timeout=5, half_open_requests=1):
+        self.url = url
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.half_open_requests = half_open_requests
+
+        self.state = CLOSED
+        self.opened_at = 0
+        self.requests = 0
+        self.failures = 0
+        self.window_start = time.time()
+        self.probes = 0
+
+        self.rejected = 0
+        self.opened = 0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        old_state, self.state = self.state, state
+        if state == OPEN:
+            self.opened += 1
+            self.opened_at = time.time()
+        if state != HALF_OPEN:
+            self.probes = 0
+        self.requests = self.failures = 0
+        self.window_start = time.time()
+        return old_state
+
+    def _notify(self, old_state):
+        if old_state is not None and old_state != self.state:
+            circuit_breaker_state_changed.send(sender=self.__class__, breaker=self,
+                                               old_state=old_state, new_state=self.state)
+
+    def allow(self):
+        """
+        Return whether a command may be sent now.
+        """
+        old_state = None
+        with self._lock:
+            if self.state == OPEN:
+                if time.time() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                old_state = self._set_state(HALF_OPEN)
+
+            if self.state == HALF_OPEN:
+                if self.probes >= self.half_open_requests:
+                    self.rejected += 1
+                    allowed = False
+                else:
+                    self.probes += 1
+                    allowed = True
+            else:
+                allowed = True
+
+        self._notify(old_state)
+        return allowed
+
+    def success(self):
+        old_state = None
+        with self._lock:
+            if self.state == HALF_OPEN:
+                old_state = self._set_state(CLOSED)
+            elif self.state == CLOSED:
+                self._count(failed=False)
+        self._notify(old_state)
+
+    def failure(self):
+        old_state = None
+        with self._lock:
+            if self.state == HALF_OPEN:
+                old_state = self._set_state(OPEN)
+            elif self.state == CLOSED:
+                self._count(failed=True)
+                if (self.requests >= self.min_requests and
+                        self.failures >= self.failure_rate * self.requests):
+                    old_state = self._set_state(OPEN)
+        self._notify(old_state)
+
+    def _count(self, failed):
+        now = time.time()
+        if now - self.window_start > self.window:
+            self.requests = self.failures = 0
+            self.window_start = now
+
+        self.requests += 1
+        if failed:
+            self.failures += 1
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call ``func`` through the breaker.
+        """
+        if not self.allow():
+            raise CircuitBreakerOpen("Circuit breaker open for %s" % self.url)
+
+        try:
+            result = func(*args, **kwargs)
+        except _connection_exceptions:
+            self.failure()
+            raise
+        except Exception:
+            self.success()
+            raise
+
+        self.success()
+        return result
+
+    def instrument(self, client):
+        """
+        Route the commands and the pipelines of a raw
+        redis client through the breaker.
+        """
+        execute_command = client.execute_command
+        pipeline = client.pipeline
+
+        def _execute_command(*args, **options):
+            return self.call(execute_command, *args, **options)
+
+        def _pipeline(*args, **kwargs):
+            pipe = pipeline(*args, **kwargs)
+            execute = pipe.execute
+
+            def _execute(*args, **kwargs):
+                return self.call(execute, *args, **kwargs)
+
+            pipe.execute = _execute
+            return pipe
+
+        client.execute_command = _execute_command
+        client.pipeline = _pipeline
+        return client
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
@@ -1,12 +1,18 @@
 import functools
+import time
 import warnings
 import logging
+from contextlib import contextmanager
 
 from django.conf import settings
 from django.core.cache.backends.base import BaseCache
 
+from .client.default import DEFAULT_TIMEOUT
 from .util import load_class
 from .exceptions import ConnectionInterrupted
+from .deferred import ReadBatch
+from .instrumentation import get_metrics
+from .profiling import get_profiler
 
 DJANGO_REDIS_IGNORE_EXCEPTIONS = getattr(settings, "DJANGO_REDIS_IGNORE_EXCEPTIONS", False)
 DJANGO_REDIS_LOG_IGNORED_EXCEPTIONS = getattr(settings, "DJANGO_REDIS_LOG_IGNORED_EXCEPTIONS", False)
@@ -27,18 +33,37 @@ def omit_exception(method=None, return_value=None):
 
     @functools.wraps(method)
     def _decorator(self, *args, **kwargs):
+        metrics = self._metrics
+        if metrics is not None:
+            started = time.time()
+        profiler = self._profiler
+        span = profiler.start(method.__name__, args[0] if args else kwargs.get("key")) \
+            if profiler is not None else None
+
         try:
             return method(self, *args, **kwargs)
         except ConnectionInterrupted as e:
             if self._ignore_exceptions:
                 if DJANGO_REDIS_LOG_IGNORED_EXCEPTIONS:
                     logger.error(str(e))
+                if metrics is not None:
+                    metrics.ignored_error(method.__name__)
 
                 return return_value
             raise e.parent
+        finally:
+            if span is not None:
+                profiler.finish(span)
+            if metrics is not None:
+                metrics.operation(method.__name__, time.time() - started,
+                                  args[0] if args else kwargs.get("key"))
     return _decorator
 
 
+# Default passed to the client by get, to tell hits from misses.
+_MISSING = object()
+
+
 class RedisCache(BaseCache):
     def __init__(self, server, params):
         super(RedisCache, self).__init__(params)
@@ -49,8 +74,11 @@ class RedisCache(BaseCache):
         self._client_cls = options.get("CLIENT_CLASS", "django_redis.client.DefaultClient")
         self._client_cls = load_class(self._client_cls)
         self._client = None
+        self._read_batch = ReadBatch(self)
 
         self._ignore_exceptions = options.get("IGNORE_EXCEPTIONS", DJANGO_REDIS_IGNORE_EXCEPTIONS)
+        self._metrics = get_metrics(server, params)
+        self._profiler = get_profiler(server, params)
 
     @property
     def client(self):
@@ -69,22 +97,64 @@ class RedisCache(BaseCache):
     def incr_version(self, *args, **kwargs):
         return self.client.incr_version(*args, **kwargs)
 
+    @omit_exception(return_value={})
+    def incr_version_many(self, *args, **kwargs):
+        return self.client.incr_version_many(*args, **kwargs)
+
     @omit_exception
     def add(self, *args, **kwargs):
         return self.client.add(*args, **kwargs)
 
     @omit_exception
-    def get(self, key, default=None, version=None, client=None):
+    def get(self, key, default=None, version=None, client=None, namespace=None):
         try:
-            return self.client.get(key, default=default, version=version,
-                                   client=client)
+            value = self.client.get(key, default=_MISSING, version=version,
+                                    client=client, namespace=namespace)
         except ConnectionInterrupted as e:
             if DJANGO_REDIS_IGNORE_EXCEPTIONS or self._ignore_exceptions:
                 if DJANGO_REDIS_LOG_IGNORED_EXCEPTIONS:
                     logger.error(str(e))
+                if self._metrics is not None:
+                    self._metrics.ignored_error("get")
                 return default
             raise
 
+        if value is _MISSING:
+            if self._metrics is not None:
+                self._metrics.misses(1, key)
+            return default
+
+        if self._metrics is not None:
+            self._metrics.hits(1, key)
+        return value
+
+    def get_deferred(self, key, default=None, version=None, namespace=None):
+        """
+        Queue a read and return a DeferredValue. All queued reads are
+        fetched in one round trip when the first value is accessed.
+        """
+        return self._read_batch.add(key, default=default, version=version,
+                                    namespace=namespace)
+
+    @contextmanager
+    def read_batch(self):
+        """
+        Context manager that resolves every read deferred inside
+        the block, at the latest when the block exits.
+        """
+        try:
+            yield self._read_batch
+        finally:
+            self._read_batch.flush()
+
+    def pipeline(self, transaction=False):
+        """
+        Return a CachePipeline that buffers cache operations and
+        runs them in one round trip.
+        """
+        from .pipeline import CachePipeline
+        return CachePipeline(self, transaction=transaction)
+
     @omit_exception
     def delete(self, *args, **kwargs):
         return self.client.delete(*args, **kwargs)
@@ -93,6 +163,14 @@ class RedisCache(BaseCache):
     def delete_pattern(self, *args, **kwargs):
         return self.client.delete_pattern(*args, **kwargs)
 
+    @omit_exception
+    def invalidate_tags(self, *args, **kwargs):
+        return self.client.invalidate_tags(*args, **kwargs)
+
+    @omit_exception
+    def invalidate_namespace(self, *args, **kwargs):
+        return self.client.invalidate_namespace(*args, **kwargs)
+
     @omit_exception
     def delete_many(self, *args, **kwargs):
         return self.client.delete_many(*args, **kwargs)
@@ -102,8 +180,18 @@ class RedisCache(BaseCache):
         return self.client.clear()
 
     @omit_exception(return_value={})
-    def get_many(self, *args, **kwargs):
-        return self.client.get_many(*args, **kwargs)
+    def get_many(self, keys, *args, **kwargs):
+        if self._metrics is None:
+            return self.client.get_many(keys, *args, **kwargs)
+
+        keys = list(keys)
+        values = self.client.get_many(keys, *args, **kwargs)
+        for key in keys:
+            if key in values:
+                self._metrics.hits(1, key)
+            else:
+                self._metrics.misses(1, key)
+        return values
 
     @omit_exception
     def set_many(self, *args, **kwargs):
@@ -145,6 +233,68 @@ class RedisCache(BaseCache):
     def lock(self, *args, **kwargs):
         return self.client.lock(*args, **kwargs)
 
+    @omit_exception
+    def warm_up(self, *args, **kwargs):
+        return self.client.warm_up(*args, **kwargs)
+
+    @omit_exception
+    def incr_buffered(self, *args, **kwargs):
+        return self.client.incr_buffered(*args, **kwargs)
+
+    @omit_exception
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None, stale_ttl=None):
+        """
+        With ``stale_ttl``, the value is served stale for ``stale_ttl``
+        seconds after its ``timeout``, while it is refreshed in the
+        background.
+        """
+        # The client computes the value when the connection errors are
+        # ignored, so only the errors raised again reach omit_exception.
+        if stale_ttl is None:
+            return self.client.get_or_set(key, default, timeout=timeout, version=version)
+        return self.client.get_or_set_stale(key, default, timeout=timeout, stale_ttl=stale_ttl,
+                                            version=version)
+
+    @omit_exception
+    def get_or_set_stale(self, *args, **kwargs):
+        return self.client.get_or_set_stale(*args, **kwargs)
+
+    @omit_exception
+    def flush_counters(self):
+        return self.client.flush_counters()
+
+    @omit_exception
+    def flush_writes(self):
+        self.client.flush_writes()
+
     @omit_exception
     def close(self, **kwargs):
         self.client.close(**kwargs)
+
+    def circuit_breaker_stats(self):
+        return self.client.connection_factory.circuit_breaker_stats()
+
+    def connection_pool_stats(self):
+        return self.client.connection_factory.connection_pool_stats()
+
+    def write_behind_stats(self):
+        write_behind = self.client._write_behind
+        return write_behind.stats() if write_behind is not None else {}
+
+    def background_refresh_stats(self):
+        return self.client._refresher.stats()
+
+    def single_flight_stats(self):
+        single_flight = self.client._single_flight
+        return single_flight.stats() if single_flight is not None else {}
+
+    def buffered_counters_stats(self):
+        return self.client._counters.stats()
+
+    def hot_keys(self, count=10):
+        return self.client.hot_keys(count)
+
+    def published_hot_keys(self, count=10):
+        if self.client._hot_keys is None:
+            return []
+        return self.client._hot_keys.published(count)
@@ -2,9 +2,11 @@
 
 from __future__ import absolute_import, unicode_literals
 
-import random
 import socket
+import threading
+import time
 import warnings
+import weakref
 import zlib
 from collections import OrderedDict
 
@@ -22,6 +24,7 @@ try:
 except ImportError:
     DEFAULT_TIMEOUT = object()
 
+from redis.client import BasePipeline
 from redis.exceptions import ConnectionError
 from redis.exceptions import ResponseError
 
@@ -33,17 +36,180 @@ try:
 except ImportError:
     _main_exceptions = (ConnectionError, socket.timeout)
 
-from ..util import CacheKey, load_class, integer_types
-from ..exceptions import ConnectionInterrupted
-from .. import pool
+from ..util import CacheKey, load_class, integer_types, text_type
+from ..replicas import WriteTracker
+from ..exceptions import ConnectionInterrupted, ValueSizeWarning, ValueTooLarge
+from .. import pool, stale
+from ..jitter import TTLJitter
+
+# Default passed to get by get_or_set_stale, to tell hits from misses.
+_STALE_MISSING = object()
+
+# Jitter of the calls passing a jitter when none is configured.
+_default_jitter = TTLJitter()
+
+
+class _SharedState(dict):
+    """
+    The state shared by the clients of a cache: a dict that can be
+    weakly referenced.
+    """
+
+
+class _SharingClients(object):
+    """
+    Weak references to the clients sharing a state. The helpers of the
+    state (write-behind queue, counters...) call it to get one of the
+    clients still alive, rather than holding the client that built them.
+    """
+
+    def __init__(self):
+        self._clients = weakref.WeakSet()
+        self._current = lambda: None
+        self._lock = threading.Lock()
+
+    def add(self, client):
+        with self._lock:
+            self._clients.add(client)
+
+    def __call__(self):
+        client = self._current()
+        if client is None:
+            with self._lock:
+                client = next(iter(self._clients), None)
+                if client is not None:
+                    self._current = weakref.ref(client)
+        return client
+
+
+def _is_no_such_key_error(e):
+    return "no such key" in str(e).lower()
+
+
+# SET KEYS[1] to ARGV[1] for ARGV[2] seconds (-1 for no expiration),
+# if ARGV[3] is "NX" or "XX" only under that condition, then add KEYS[1]
+# to the tag sets in KEYS[2..] if it was set. The tag sets live as long
+# as their longest lived member. Returns 1 if the key was set.
+SET_WITH_TAGS_SCRIPT = """
+local ttl = tonumber(ARGV[2])
+local command = {"SET", KEYS[1], ARGV[1]}
+if ttl >= 0 then
+    command[#command + 1] = "EX"
+    command[#command + 1] = ARGV[2]
+end
+if ARGV[3] ~= "" then
+    command[#command + 1] = ARGV[3]
+end
+if not redis.call(unpack(command)) then
+    return false
+end
+for i = 2, #KEYS do
+    local tag = KEYS[i]
+    local existed = redis.call("EXISTS", tag)
+    redis.call("SADD", tag, KEYS[1])
+    if ttl < 0 then
+        redis.call("PERSIST", tag)
+    else
+        local current = redis.call("TTL", tag)
+        if existed == 0 or (current >= 0 and current < ttl) then
+            redis.call("EXPIRE", tag, ttl)
+        end
+    end
+end
+return 1
+"""
+
+# Delete all members of the tag sets in KEYS and the tag sets
+# themselves. Returns the number of deleted members, and the members.
+INVALIDATE_TAGS_SCRIPT = """
+local count = 0
+local removed = {}
+for _, tag in ipairs(KEYS) do
+    local members = redis.call("SMEMBERS", tag)
+    for i = 1, #members, 1000 do
+        count = count + redis.call("DEL", unpack(members, i, math.min(i + 999, #members)))
+    end
+    for _, member in ipairs(members) do
+        removed[#removed + 1] = member
+    end
+    redis.call("DEL", tag)
+end
+return {count, removed}
+"""
+
+# INCRBY KEYS[1] by ARGV[1] only if it exists, nil otherwise.
+INCR_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    return redis.call("INCRBY", KEYS[1], ARGV[1])
+end
+return false
+"""
+
+# INCRBY KEYS[1] by ARGV[1]. A key created by it expires in ARGV[2]
+# seconds, or never if ARGV[2] is negative. With an ARGV[2] of 0 the
+# key is deleted, as set does with a timeout of 0 or less.
+COUNTER_SCRIPT = """
+local ttl = tonumber(ARGV[2])
+local existed = redis.call("EXISTS", KEYS[1])
+local value = redis.call("INCRBY", KEYS[1], ARGV[1])
+if ttl == 0 then
+    redis.call("DEL", KEYS[1])
+elseif existed == 0 and ttl > 0 then
+    redis.call("EXPIRE", KEYS[1], ttl)
+end
+return value
+"""
 
 
 class DefaultClient(object):
+
+    # Namespace generations, cached per process by server list
+    # and generation key, as (generation, fetch time) tuples. At most
+    # NAMESPACE_GENERATION_CACHE_SIZE of them are kept.
+    _namespace_generations = {}
+
+    # State built from the cache settings (parsed servers, serializer,
+    # connection factory, raw clients, replica selector...), shared per
+    # process by all the clients of a cache, as Django builds a new cache
+    # backend, and so a new client, for every thread. Every client holds
+    # its state, which is dropped with the last client of the cache.
+    _shared_states = weakref.WeakValueDictionary()
+
     def __init__(self, server, params, backend):
         self._backend = backend
-        self._server = server
         self._params = params
 
+        # The OPTIONS dict of the settings is shared by the backends of a
+        # cache; the state keeps a reference to it, so its id is not reused.
+        options = params.get("OPTIONS")
+        key = (self.__class__, tuple(server) if isinstance(server, (list, tuple, set)) else server,
+               id(options), params.get("REVERSE_KEY_FUNCTION"))
+
+        state = self._shared_states.get(key)
+        if state is None or (options is not None and state["_options"] is not options):
+            self._sharing_clients = _SharingClients()
+            self.setup(server, params)
+            state = _SharedState((name, value) for name, value in self.__dict__.items()
+                                 if name not in ("_backend", "_params"))
+            self._shared_states[key] = state
+
+            if self._options.get("WARM_UP"):
+                try:
+                    self.warm_up()
+                except ConnectionInterrupted:
+                    # The connections are opened on demand instead.
+                    pass
+        else:
+            self.__dict__.update(state)
+        self._shared_state = state
+        self._sharing_clients.add(self)
+
+    def setup(self, server, params):
+        """
+        Build the client state from the cache settings. It runs once per
+        process for every cache, the following clients share its result.
+        """
+        self._server = server
         self.reverse_key = get_key_func(params.get("REVERSE_KEY_FUNCTION") or
                                         "django_redis.util.default_reverse_key")
 
@@ -63,6 +229,22 @@ class DefaultClient(object):
         serializer_cls = load_class(serializer_path)
         self._serializer = serializer_cls(options=self._options)
         self.connection_factory = pool.get_connection_factory(options=self._options)
+        self._scripts = {}
+        self._namespace_timeout = self._options.get("NAMESPACE_GENERATION_TIMEOUT", 1)
+        self._namespace_cache_size = self._options.get("NAMESPACE_GENERATION_CACHE_SIZE", 10000)
+        self._replica_selector = self.get_replica_selector()
+        self._write_tracker = self.get_write_tracker()
+        self._read_hedger = self.get_read_hedger()
+        self._write_behind = self.get_write_behind()
+        self._counters = self.get_buffered_counters()
+        self._hot_keys = self.get_hot_key_tracker()
+        self._refresher = self.get_background_refresher()
+        self._ttl_jitter = self.get_ttl_jitter()
+        self._single_flight = self.get_single_flight()
+        self._compressor = self._options["COMPRESS_COMPRESSOR"]
+        self._decompressor = self._options["COMPRESS_DECOMPRESSOR"]
+        self.setup_value_size_limits()
+        self.setup_profiler()
 
     def __contains__(self, key):
         return self.has_key(key)
@@ -79,7 +261,423 @@ class DefaultClient(object):
         if write or len(self._server) == 1:
             return 0
 
-        return random.randint(1, len(self._server) - 1)
+        return self._replica_selector.select()
+
+    def get_replica_selector(self):
+        """
+        Return the replica selector for this client, configured with
+        REPLICA_SELECTOR_CLASS and REPLICA_SELECTOR_KWARGS.
+        """
+        path = self._options.get("REPLICA_SELECTOR_CLASS",
+                                 "django_redis.replicas.RandomReplicaSelector")
+        cls = load_class(path)
+        return cls(self._server, **self._options.get("REPLICA_SELECTOR_KWARGS", {}))
+
+    def get_write_tracker(self):
+        """
+        Return the tracker of recent writes, when READ_YOUR_WRITES_WINDOW
+        is set in a master/slave setup.
+        """
+        window = self._options.get("READ_YOUR_WRITES_WINDOW", 0)
+        if not window or len(self._server) == 1:
+            return None
+
+        max_keys = self._options.get("READ_YOUR_WRITES_MAX_KEYS", 0)
+        return WriteTracker(window, max_keys=max_keys)
+
+    def _before_write(self, *keys):
+        if self._hot_keys is not None:
+            self._hot_keys.forget(keys or None)
+        if self._write_behind is not None:
+            # Keep the writes in order: send the queued ones first.
+            self._write_behind.flush()
+
+    def _after_write(self, *keys):
+        """
+        Called once the write of keys (of any key if none) is acknowledged,
+        or failed. The writes queued on a pipeline end with its execution.
+        """
+        if self._hot_keys is not None:
+            # Drop the values read while the write was in flight.
+            self._hot_keys.forget(keys or None)
+        if self._single_flight is not None:
+            # Reads started before the write must not be shared after it.
+            self._single_flight.written([smart_text(k) for k in keys] if keys else None)
+        if self._write_tracker is not None:
+            # The replicas may lag from the end of the write.
+            self._write_tracker.written([smart_text(k) for k in keys])
+
+    def get_write_behind(self):
+        """
+        Return the write-behind queue configured with WRITE_BEHIND_CLASS
+        and WRITE_BEHIND_KWARGS, if set.
+        """
+        path = self._options.get("WRITE_BEHIND_CLASS", None)
+        if path is None:
+            return None
+
+        cls = load_class(path)
+        return cls(self, **self._options.get("WRITE_BEHIND_KWARGS", {}))
+
+    def apply_write(self, op, key, pipeline, **kwargs):
+        """
+        Add to a pipeline a write queued by the write-behind queue.
+        The values of the sets are queued encoded, with their keys.
+        """
+        if op == "set":
+            kwargs.pop("namespace", None)
+            return self._set(key, client=pipeline, **kwargs)
+        return getattr(DefaultClient, op)(self, key, client=pipeline, **kwargs)
+
+    def flush_writes(self):
+        """
+        Send the writes pending in the write-behind queue.
+        """
+        if self._write_behind is not None:
+            self._write_behind.flush()
+
+    def get_buffered_counters(self):
+        """
+        Return the buffered counters, configured with BUFFERED_COUNTERS_CLASS
+        and BUFFERED_COUNTERS_KWARGS.
+        """
+        path = self._options.get("BUFFERED_COUNTERS_CLASS",
+                                 "django_redis.counters.BufferedCounters")
+        cls = load_class(path)
+        return cls(self, **self._options.get("BUFFERED_COUNTERS_KWARGS", {}))
+
+    def incr_buffered(self, key, delta=1, timeout=DEFAULT_TIMEOUT, version=None, namespace=None):
+        """
+        Add delta to a counter, buffered in memory and sent later. A missing
+        counter is created, expiring after timeout seconds.
+        """
+        self._counters.incr(key, delta=delta, timeout=timeout, version=version,
+                            namespace=namespace)
+
+    def flush_counters(self):
+        """
+        Send the deltas buffered by incr_buffered.
+        """
+        return self._counters.flush()
+
+    def incr_counters(self, counters, client=None):
+        """
+        Add the deltas of (key, delta, timeout, version, namespace) counters
+        in one pipeline, and return their new values, None for the counters
+        that could not be incremented. As with set, the counters with a
+        timeout of 0 or less are deleted.
+        """
+        if client is None:
+            client = self.get_client(write=True)
+
+        self._before_write(*[counter[0] for counter in counters])
+
+        try:
+            pipeline = client.pipeline(transaction=False)
+            script = self.get_script(COUNTER_SCRIPT, client)
+            for key, delta, timeout, version, namespace in counters:
+                if timeout == DEFAULT_TIMEOUT:
+                    timeout = self._backend.default_timeout
+                if timeout is None:
+                    ttl = -1
+                else:
+                    ttl = max(int(timeout), 1) if timeout > 0 else 0
+                script(keys=[self.make_key(key, version=version, namespace=namespace)],
+                       args=[delta, ttl], client=pipeline)
+            results = pipeline.execute(raise_on_error=False)
+        except _main_exceptions as e:
+            raise ConnectionInterrupted(connection=client, parent=e)
+        finally:
+            self._after_write(*[counter[0] for counter in counters])
+
+        return [None if isinstance(result, Exception) else result for result in results]
+
+    def get_hot_key_tracker(self):
+        """
+        Return the hot key tracker configured with HOT_KEYS_CLASS
+        and HOT_KEYS_KWARGS, if set.
+        """
+        path = self._options.get("HOT_KEYS_CLASS", None)
+        if path is None:
+            return None
+
+        cls = load_class(path)
+        return cls(self, **self._options.get("HOT_KEYS_KWARGS", {}))
+
+    def hot_keys(self, count=10):
+        """
+        Return the keys this process accesses the most.
+        """
+        if self._hot_keys is None:
+            return []
+        return self._hot_keys.top(count)
+
+    def _get_hot(self, key, default=None, version=None, client=None):
+        """
+        Read a key through the local cache of hot keys.
+        """
+        nkey = self.make_key(key, version=version)
+        found, value = self._hot_keys.get_local(nkey)
+        if not found:
+            if client is None:
+                client = self.get_read_client(key)
+
+            writes = self._hot_keys.writes
+            try:
+                value = client.get(nkey)
+            except _main_exceptions as e:
+                raise ConnectionInterrupted(connection=client, parent=e)
+
+            self._hot_keys.set_local(nkey, key, value, writes)
+
+        return self._get_result(value, default)
+
+    def get_background_refresher(self):
+        """
+        Return the refresher of stale values, configured with
+        BACKGROUND_REFRESH_CLASS and BACKGROUND_REFRESH_KWARGS.
+        """
+        path = self._options.get("BACKGROUND_REFRESH_CLASS",
+                                 "django_redis.stale.BackgroundRefresher")
+        cls = load_class(path)
+        return cls(self, **self._options.get("BACKGROUND_REFRESH_KWARGS", {}))
+
+    def get_ttl_jitter(self):
+        """
+        Return the TTL jitter configured with TTL_JITTER_CLASS and
+        TTL_JITTER_KWARGS, or TTL_JITTER (its spread), if any is set.
+        """
+        path = self._options.get("TTL_JITTER_CLASS", None)
+        spread = self._options.get("TTL_JITTER", None)
+        if path is None and not spread and "TTL_JITTER_KWARGS" not in self._options:
+            return None
+
+        kwargs = dict(self._options.get("TTL_JITTER_KWARGS", {}))
+        if spread:
+            kwargs.setdefault("spread", spread)
+        cls = load_class(path or "django_redis.jitter.TTLJitter")
+        return cls(**kwargs)
+
+    def jitter_timeout(self, timeout, key, jitter=None):
+        """
+        Return the timeout of key shortened by the TTL jitter. A jitter
+        overrides the configured spread, 0 disables it.
+        """
+        ttl_jitter = self._ttl_jitter
+        if jitter is None:
+            if ttl_jitter is None:
+                return timeout
+        elif not jitter:
+            return timeout
+        elif ttl_jitter is None:
+            ttl_jitter = _default_jitter
+        return ttl_jitter.apply(timeout, key, spread=jitter)
+
+    def get_single_flight(self):
+        """
+        Return the coalescer of concurrent reads and computations of the
+        same key, configured with SINGLE_FLIGHT_CLASS, or None if it is set
+        to None.
+        """
+        path = self._options.get("SINGLE_FLIGHT_CLASS", "django_redis.singleflight.SingleFlight")
+        if path is None:
+            return None
+
+        cls = load_class(path)
+        return cls(**self._options.get("SINGLE_FLIGHT_KWARGS", {}))
+
+    def _get_shared(self, key, default=None, version=None, client=None):
+        """
+        Read a key, sharing the GET with the threads of the process
+        reading it at the same time. Every caller decodes the reply.
+        """
+        nkey = self.make_key(key, version=version)
+
+        def fetch():
+            read_client = client if client is not None else self.get_read_client(key)
+            try:
+                return read_client.get(nkey)
+            except _main_exceptions as e:
+                raise ConnectionInterrupted(connection=read_client, parent=e)
+
+        value = self._single_flight.do((smart_text(key), version, "get"), fetch)
+        return self._get_result(value, default)
+
+    def _ignore_error(self, operation):
+        """
+        Return whether the connection errors of ``operation`` are ignored
+        (IGNORE_EXCEPTIONS), counting the error if so.
+        """
+        if not self._backend._ignore_exceptions:
+            return False
+        metrics = self._backend._metrics
+        if metrics is not None:
+            metrics.ignored_error(operation)
+        return True
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Return the value of a key, or set it to default (or its result,
+        if callable) when missing or None, as Django does. The threads of
+        the process missing the same key at the same time share one
+        computation. When the connection errors are ignored, the value is
+        computed and returned, unset, if redis cannot be reached.
+        """
+        try:
+            value = self.get(key, version=version)
+        except ConnectionInterrupted:
+            if not self._ignore_error("get_or_set"):
+                raise
+            return default() if callable(default) else default
+
+        metrics = self._backend._metrics
+        if value is not None:
+            if metrics is not None:
+                metrics.hits(1, key)
+            return value
+        if metrics is not None:
+            metrics.misses(1, key)
+
+        def compute():
+            try:
+                # Set by a computation that ended since the first read.
+                value = self.get(key, version=version)
+            except ConnectionInterrupted:
+                if not self._ignore_error("get_or_set"):
+                    raise
+                value = None
+            if value is not None:
+                return value
+
+            value = default() if callable(default) else default
+            if value is None:
+                return None
+            try:
+                self.add(key, value, timeout, version=version)
+                # Another process may have set it first.
+                return self.get(key, value, version=version)
+            except ConnectionInterrupted:
+                if not self._ignore_error("get_or_set"):
+                    raise
+                return value
+
+        if self._single_flight is None:
+            return compute()
+        # Unlike reads, not forgotten by the writes of the key (the add).
+        return self._single_flight.do(("get_or_set", key, version), compute)
+
+    def get_or_set_stale(self, key, default, timeout=DEFAULT_TIMEOUT, stale_ttl=0, version=None):
+        """
+        Return the value of a key, or set it to default (or its result,
+        if callable) when missing. The value is fresh for timeout seconds,
+        then served stale for stale_ttl more seconds while one background
+        refresh sets it again. When the connection errors are ignored, the
+        value is computed and returned, unset, if redis cannot be reached.
+        """
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self._backend.default_timeout
+
+        try:
+            packed = self.get(key, default=_STALE_MISSING, version=version)
+        except ConnectionInterrupted:
+            if not self._ignore_error("get_or_set_stale"):
+                raise
+            return default() if callable(default) else default
+
+        if packed is not _STALE_MISSING:
+            value, is_stale = stale.unpack(packed)
+            if is_stale:
+                self._refresher.refresh(key, default, timeout, stale_ttl, version=version)
+            return value
+
+        value = default() if callable(default) else default
+        timeout = self.jitter_timeout(timeout, key)
+        try:
+            self.set(key, stale.pack(value, timeout), version=version, jitter=0,
+                     timeout=None if timeout is None else timeout + stale_ttl)
+        except ConnectionInterrupted:
+            if not self._ignore_error("get_or_set_stale"):
+                raise
+        return value
+
+    def setup_value_size_limits(self):
+        """
+        Read the limits checked by encode: over VALUE_SIZE_SOFT_LIMIT bytes,
+        values are compressed harder or a warning is issued; over
+        VALUE_SIZE_HARD_LIMIT bytes, they are rejected.
+        """
+        self._value_size_soft_limit = self._options.get("VALUE_SIZE_SOFT_LIMIT", 0)
+        self._value_size_hard_limit = self._options.get("VALUE_SIZE_HARD_LIMIT", 0)
+        self._value_size_action = self._options.get("VALUE_SIZE_SOFT_LIMIT_ACTION", "warn")
+        if self._value_size_action not in ("warn", "compress"):
+            raise ImproperlyConfigured("VALUE_SIZE_SOFT_LIMIT_ACTION must be 'warn' or 'compress'")
+
+        compressor = self._options["COMPRESS_COMPRESSOR"]
+        if compressor is zlib.compress:
+            compressor = lambda value: zlib.compress(value, 9)
+        self._value_size_compressor = self._options.get("VALUE_SIZE_COMPRESSOR", compressor)
+
+        self._value_size_limited = bool(self._value_size_soft_limit or self._value_size_hard_limit)
+        # Values compressed over the soft limit must be decompressed
+        # even when COMPRESS_MIN_LEN is not set.
+        self._decompress = (self._options.get("COMPRESS_MIN_LEN", 0) > 0 or
+                            bool(self._value_size_soft_limit) and
+                            self._value_size_action == "compress")
+
+    def setup_profiler(self):
+        """
+        Time the serializer and the compressors in the spans of the
+        profiler, if PROFILER_CLASS is set.
+        """
+        profiler = self._backend._profiler
+        if profiler is None:
+            return
+
+        self._serializer.dumps = profiler.wrap("serialize", self._serializer.dumps)
+        self._serializer.loads = profiler.wrap("deserialize", self._serializer.loads)
+        self._compressor = profiler.wrap("compress", self._compressor)
+        self._decompressor = profiler.wrap("decompress", self._decompressor)
+        self._value_size_compressor = profiler.wrap("compress", self._value_size_compressor)
+
+    def get_read_hedger(self):
+        """
+        Return the read hedger configured with READ_HEDGER_CLASS and
+        READ_HEDGER_KWARGS, if set and there are two slaves or more.
+        """
+        path = self._options.get("READ_HEDGER_CLASS", None)
+        if path is None or len(self._server) < 3:
+            return None
+
+        cls = load_class(path)
+        return cls(self._server, **self._options.get("READ_HEDGER_KWARGS", {}))
+
+    def _reads_master(self, keys):
+        return (self._write_tracker is not None and
+                self._write_tracker.recently_written(smart_text(k) for k in keys))
+
+    def get_read_client(self, *keys):
+        """
+        Return a raw redis client for reading the given keys: the
+        master if any of them was written recently, a slave otherwise.
+        """
+        return self.get_client(write=self._reads_master(keys))
+
+    def _hedged_read(self, read, keys):
+        """
+        Call read with a raw client for the given keys, sending it to
+        a second slave too when the first one is slow to answer.
+        """
+        if self._reads_master(keys):
+            return read(self.get_client(write=True))
+
+        index = self.get_next_client_index(write=False)
+        return self._read_hedger.read(lambda i: read(self._get_client_at(i)), index)
+
+    def get_server(self, key):
+        """
+        Return the raw redis client storing the given key.
+        """
+        return self.get_client(write=True)
 
     def get_client(self, write=True):
         """
@@ -89,10 +687,14 @@ class DefaultClient(object):
         operations for obtain a native redis client/connection
         instance.
         """
-        index = self.get_next_client_index(write=write)
+        return self._get_client_at(self.get_next_client_index(write=write))
 
+    def _get_client_at(self, index):
         if self._clients[index] is None:
-            self._clients[index] = self.connect(index)
+            client = self._replica_selector.instrument(index, self.connect(index))
+            if self._backend._profiler is not None:
+                client = self._backend._profiler.instrument(client)
+            self._clients[index] = client
 
         return self._clients[index]
 
@@ -104,17 +706,54 @@ class DefaultClient(object):
         """
         return self.connection_factory.connect(self._server[index])
 
-    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None, nx=False, xx=False):
+    def get_script(self, script, client):
+        """
+        Return a redis Script object for the given lua source,
+        registering it on first use.
+        """
+        if script not in self._scripts:
+            self._scripts[script] = client.register_script(script)
+        return self._scripts[script]
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None, nx=False, xx=False,
+            tags=None, namespace=None, jitter=None):
         """
         Persist a value to the cache, and set an optional expiration time.
         Also supports optional nx parameter. If set to True - will use redis setnx instead of set.
+
+        When tags are given, the key is recorded in one redis set per tag,
+        in the same script and only if it is set, so it can be removed
+        with invalidate_tags.
+
+        With a write-behind queue, the write is queued and sent later,
+        unless nx or xx are given.
+
+        The timeout is shortened by the TTL jitter, if any; jitter
+        overrides its spread, 0 disables it.
         """
 
-        if not client:
+        nkey = self.make_key(key, version=version, namespace=namespace)
+        nvalue = self.encode(value, key=key)
+
+        if client is None:
+            if self._write_behind is not None and not (nx or xx):
+                # Queued encoded: the caller gets the encoding errors, and
+                # the changes made to the value after the call are not written.
+                self._write_behind.put("set", key, nkey=nkey, nvalue=nvalue, timeout=timeout,
+                                       version=version, tags=tags, namespace=namespace,
+                                       jitter=jitter)
+                return True
             client = self.get_client(write=True)
 
-        nkey = self.make_key(key, version=version)
-        nvalue = self.encode(value)
+        return self._set(key, nkey, nvalue, timeout=timeout, version=version, client=client,
+                         nx=nx, xx=xx, tags=tags, jitter=jitter)
+
+    def _set(self, key, nkey, nvalue, timeout=DEFAULT_TIMEOUT, version=None, client=None,
+             nx=False, xx=False, tags=None, jitter=None):
+        """
+        Write nvalue, the encoded value of key, to nkey.
+        """
+        self._before_write(key)
 
         if timeout is True:
             warnings.warn("Using True as timeout value, is now deprecated.", DeprecationWarning)
@@ -126,7 +765,7 @@ class DefaultClient(object):
         try:
             if timeout is not None:
                 if timeout > 0:
-                    timeout = int(timeout)
+                    timeout = self.jitter_timeout(int(timeout), key, jitter)
                 elif timeout <= 0:
                     if nx:
                         # Using negative timeouts when nx is True should
@@ -137,68 +776,193 @@ class DefaultClient(object):
                         # redis doesn't support negative timeouts in ex flags
                         # so it seems that it's better to just delete the key
                         # than to set it and than expire in a pipeline
-                        return self.delete(key, client=client, version=version)
+                        return self.delete(nkey, client=client, version=version)
+
+            if tags:
+                return self._set_with_tags(client, nkey, nvalue, timeout, nx, xx,
+                                           tags, version)
 
             return client.set(nkey, nvalue, nx=nx, ex=timeout, xx=xx)
         except _main_exceptions as e:
             raise ConnectionInterrupted(connection=client, parent=e)
+        finally:
+            self._after_write(key)
+
+    def make_tag_key(self, tag, version=None):
+        # Django warns about keys with control characters (CacheKeyWarning),
+        # so no valid key is the key of a tag set.
+        return self.make_key("\x00tag:%s" % tag, version=version)
+
+    def _set_with_tags(self, client, nkey, nvalue, timeout, nx, xx, tags, version):
+        tag_keys = [self.make_tag_key(tag, version=version) for tag in tags]
+        script = self.get_script(SET_WITH_TAGS_SCRIPT, client)
+        condition = "NX" if nx else "XX" if xx else ""
+        result = script(keys=[nkey] + tag_keys, client=client,
+                        args=[nvalue, -1 if timeout is None else timeout, condition])
+
+        if isinstance(client, BasePipeline):
+            return client
+        return True if result else None
+
+    def invalidate_tags(self, tags, version=None, client=None):
+        """
+        Remove all keys stored with any of the given tags, and the
+        tags themselves, atomically. Returns the number of removed keys.
+        """
+        if client is None:
+            client = self.get_client(write=True)
+
+        tag_keys = [self.make_tag_key(tag, version=version) for tag in tags]
+        if not tag_keys:
+            return 0
+
+        # The members are resolved first for _before_write, and returned
+        # by the script for _after_write, with the ones added meanwhile.
+        keys = set()
+        try:
+            pipeline = client.pipeline(transaction=False)
+            for tag_key in tag_keys:
+                pipeline.smembers(tag_key)
+            for members in pipeline.execute():
+                keys.update(self.reverse_key(smart_text(member)) for member in members)
+
+            self._before_write(*keys)
+
+            script = self.get_script(INVALIDATE_TAGS_SCRIPT, client)
+            count, removed = script(keys=tag_keys, client=client)
+            keys.update(self.reverse_key(smart_text(member)) for member in removed)
+            return count
+        except _main_exceptions as e:
+            raise ConnectionInterrupted(connection=client, parent=e)
+        finally:
+            self._after_write(*keys)
+
+    def _make_version_keys(self, key, version, delta):
+        """
+        Return the current and the incremented key for
+        the given key and version.
+        """
+        old_key = self.make_key(key, version)
+
+        if isinstance(key, CacheKey):
+            new_key = self.make_key(key.original_key(), version=version + delta)
+        else:
+            new_key = self.make_key(key, version=version + delta)
+
+        return old_key, new_key
 
     def incr_version(self, key, delta=1, version=None, client=None):
         """
         Adds delta to the cache version for the supplied key. Returns the
         new version.
+
+        The value is moved on the server with RENAME, so it keeps its
+        TTL and never travels to the client.
         """
 
         if client is None:
             client = self.get_client(write=True)
 
+        self._before_write(key)
+
         if version is None:
             version = self._backend.version
 
-        old_key = self.make_key(key, version)
-        value = self.get(old_key, version=version, client=client)
+        old_key, new_key = self._make_version_keys(key, version, delta)
 
         try:
-            ttl = client.ttl(old_key)
+            client.rename(old_key, new_key)
+        except ResponseError as e:
+            if _is_no_such_key_error(e):
+                raise ValueError("Key '%s' not found" % key)
+            raise ConnectionInterrupted(connection=client, parent=e)
         except _main_exceptions as e:
             raise ConnectionInterrupted(connection=client, parent=e)
+        finally:
+            self._after_write(key)
 
-        if value is None:
-            raise ValueError("Key '%s' not found" % key)
+        return version + delta
 
-        if isinstance(key, CacheKey):
-            new_key = self.make_key(key.original_key(), version=version + delta)
-        else:
-            new_key = self.make_key(key, version=version + delta)
+    def incr_version_many(self, keys, delta=1, version=None, client=None):
+        """
+        Adds delta to the cache version of many keys at once, using
+        one pipeline. Returns a dict with the new version of every
+        moved key; keys that do not exist are omitted.
+        """
 
-        self.set(new_key, value, timeout=ttl, client=client)
-        self.delete(old_key, client=client)
-        return version + delta
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        if client is None:
+            client = self.get_client(write=True)
+
+        self._before_write(*keys)
 
-    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        if version is None:
+            version = self._backend.version
+
+        try:
+            pipeline = client.pipeline(transaction=False)
+            for key in keys:
+                pipeline.rename(*self._make_version_keys(key, version, delta))
+            results = pipeline.execute(raise_on_error=False)
+        except _main_exceptions as e:
+            raise ConnectionInterrupted(connection=client, parent=e)
+        finally:
+            self._after_write(*keys)
+
+        moved = OrderedDict()
+        for key, result in zip(keys, results):
+            if isinstance(result, ResponseError):
+                if _is_no_such_key_error(result):
+                    continue
+                raise ConnectionInterrupted(connection=client, parent=result)
+            moved[key] = version + delta
+        return moved
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None,
+            namespace=None, jitter=None):
         """
         Add a value to the cache, failing if the key already exists.
 
         Returns ``True`` if the object was added, ``False`` if not.
         """
-        return self.set(key, value, timeout, version=version, client=client, nx=True)
+        return self.set(key, value, timeout, version=version, client=client, nx=True,
+                        namespace=namespace, jitter=jitter)
 
-    def get(self, key, default=None, version=None, client=None):
+    def get(self, key, default=None, version=None, client=None, namespace=None):
         """
         Retrieve a value from the cache.
 
         Returns decoded value if key is found, the default if not.
         """
         if client is None:
-            client = self.get_client(write=False)
+            if self._hot_keys is not None and self._hot_keys.local_timeout and namespace is None:
+                return self._get_hot(key, default, version)
+            if self._read_hedger is not None:
+                return self._hedged_read(
+                    lambda client: self.get(key, default, version, client, namespace), [key])
+            if self._single_flight is not None and namespace is None:
+                return self._get_shared(key, default, version)
+            client = self.get_read_client(key)
+
+        if namespace is not None and not isinstance(key, CacheKey):
+            value = self._namespaced_mget(client, [key], version, namespace)[0]
+        else:
+            key = self.make_key(key, version=version)
 
-        key = self.make_key(key, version=version)
+            try:
+                value = client.get(key)
+            except _main_exceptions as e:
+                raise ConnectionInterrupted(connection=client, parent=e)
 
-        try:
-            value = client.get(key)
-        except _main_exceptions as e:
-            raise ConnectionInterrupted(connection=client, parent=e)
+        return self._get_result(value, default)
 
+    def _get_result(self, value, default=None):
+        """
+        Turn a raw GET reply into the value returned by get.
+        """
         if value is None:
             return default
 
@@ -208,19 +972,31 @@ class DefaultClient(object):
         if client is None:
             client = self.get_client(write=True)
 
-        key = self.make_key(key, version=version)
+        self._before_write(key)
+
+        nkey = self.make_key(key, version=version)
 
-        if client.exists(key):
-            client.persist(key)
+        try:
+            if client.exists(nkey):
+                client.persist(nkey)
+        finally:
+            self._after_write(key)
 
     def expire(self, key, timeout, version=None, client=None):
         if client is None:
+            if self._write_behind is not None:
+                return self._write_behind.put("expire", key, timeout=timeout, version=version)
             client = self.get_client(write=True)
 
-        key = self.make_key(key, version=version)
+        self._before_write(key)
 
-        if client.exists(key):
-            client.expire(key, timeout)
+        nkey = self.make_key(key, version=version)
+
+        try:
+            if client.exists(nkey):
+                client.expire(nkey, timeout)
+        finally:
+            self._after_write(key)
 
     def lock(self, key, version=None, timeout=None, sleep=0.1,
              blocking_timeout=None, client=None):
@@ -231,17 +1007,23 @@ class DefaultClient(object):
         return client.lock(key, timeout=timeout, sleep=sleep,
                            blocking_timeout=blocking_timeout)
 
-    def delete(self, key, version=None, client=None):
+    def delete(self, key, version=None, client=None, namespace=None):
         """
         Remove a key from the cache.
         """
         if client is None:
+            if self._write_behind is not None:
+                return self._write_behind.put("delete", key, version=version, namespace=namespace)
             client = self.get_client(write=True)
 
+        self._before_write(key)
+
         try:
-            return client.delete(self.make_key(key, version=version))
+            return client.delete(self.make_key(key, version=version, namespace=namespace))
         except _main_exceptions as e:
             raise ConnectionInterrupted(connection=client, parent=e)
+        finally:
+            self._after_write(key)
 
     def delete_pattern(self, pattern, version=None, client=None):
         """
@@ -251,6 +1033,8 @@ class DefaultClient(object):
         if client is None:
             client = self.get_client(write=True)
 
+        self._before_write()
+
         pattern = self.make_key(pattern, version=version)
         try:
             count = 0
@@ -260,8 +1044,10 @@ class DefaultClient(object):
             return count
         except _main_exceptions as e:
             raise ConnectionInterrupted(connection=client, parent=e)
+        finally:
+            self._after_write()
 
-    def delete_many(self, keys, version=None, client=None):
+    def delete_many(self, keys, version=None, client=None, namespace=None):
         """
         Remove multiple keys at once.
         """
@@ -269,15 +1055,20 @@ class DefaultClient(object):
         if client is None:
             client = self.get_client(write=True)
 
-        keys = [self.make_key(k, version=version) for k in keys]
+        keys = list(keys)
+        self._before_write(*keys)
 
-        if not keys:
+        nkeys = [self.make_key(k, version=version, namespace=namespace) for k in keys]
+
+        if not nkeys:
             return
 
         try:
-            return client.delete(*keys)
+            return client.delete(*nkeys)
         except _main_exceptions as e:
             raise ConnectionInterrupted(connection=client, parent=e)
+        finally:
+            self._after_write(*keys)
 
     def clear(self, client=None):
         """
@@ -289,64 +1080,125 @@ class DefaultClient(object):
         """
         Decode the given value.
         """
+        metrics = self._backend._metrics
+        if metrics is None:
+            return self._decode(value)
+
+        started = time.time()
+        decoded = self._decode(value)
+        metrics.decoded(len(value) if isinstance(value, bytes) else 0, time.time() - started)
+        return decoded
+
+    def _decode(self, value):
         try:
             value = int(value)
         except (ValueError, TypeError):
-            if self._options.get("COMPRESS_MIN_LEN", 0) > 0:
+            if self._decompress:
                 try:
-                    value = self._options["COMPRESS_DECOMPRESSOR"](value)
+                    value = self._decompressor(value)
                 except self._options["COMPRESS_DECOMPRESSOR_ERROR"]:
                     # Handle little values, chosen to be not compressed
                     pass
             value = self._serializer.loads(value)
         return value
 
-    def encode(self, value):
+    def encode(self, value, key=None):
         """
-        Encode the given value.
+        Encode the given value, written to the given key.
         """
+        metrics = self._backend._metrics
+        if metrics is None and not self._value_size_limited:
+            return self._encode(value)
+
+        started = time.time()
+        if isinstance(value, bool) or not isinstance(value, integer_types):
+            serialized = self._serializer.dumps(value)
+            encoded = self._compress(serialized)
+            if self._value_size_limited:
+                encoded = self._check_value_size(key, serialized, encoded)
+        else:
+            serialized = encoded = value
+
+        if metrics is not None:
+            size = len(encoded) if isinstance(encoded, bytes) else len(str(encoded))
+            metrics.encoded(size, time.time() - started)
+            if serialized is not value:
+                raw = len(value) if isinstance(value, (bytes, text_type)) else None
+                metrics.value_size(key, size, len(serialized), raw)
+        return encoded
 
+    def _encode(self, value):
         if isinstance(value, bool) or not isinstance(value, integer_types):
-            encoded_value = self._serializer.dumps(value)
-            if self._options.get("COMPRESS_MIN_LEN", 0) > 0:
-                if len(encoded_value) >= self._options["COMPRESS_MIN_LEN"]:
-                    # We should try to compress if COMPRESS_MIN_LEN > 0
-                    # and this string is longer than our min threshold.
-                    compressed = self._options["COMPRESS_COMPRESSOR"](encoded_value)
-                    if len(compressed) < len(encoded_value):
-                        encoded_value = compressed
-            return encoded_value
+            return self._compress(self._serializer.dumps(value))
+
+        return value
 
+    def _compress(self, value):
+        if self._options.get("COMPRESS_MIN_LEN", 0) > 0:
+            if len(value) >= self._options["COMPRESS_MIN_LEN"]:
+                # We should try to compress if COMPRESS_MIN_LEN > 0
+                # and this string is longer than our min threshold.
+                compressed = self._compressor(value)
+                if len(compressed) < len(value):
+                    value = compressed
         return value
 
-    def get_many(self, keys, version=None, client=None):
+    def _check_value_size(self, key, serialized, encoded):
+        soft_limit = self._value_size_soft_limit
+        if soft_limit and len(encoded) > soft_limit:
+            if self._value_size_action == "compress":
+                compressed = self._value_size_compressor(serialized)
+                if len(compressed) < len(encoded):
+                    encoded = compressed
+
+            if len(encoded) > soft_limit:
+                warnings.warn("Value of %d bytes for key %s is larger than VALUE_SIZE_SOFT_LIMIT "
+                              "(%d bytes)" % (len(encoded), key, soft_limit), ValueSizeWarning)
+
+        hard_limit = self._value_size_hard_limit
+        if hard_limit and len(encoded) > hard_limit:
+            raise ValueTooLarge("Value of %d bytes for key %s is larger than VALUE_SIZE_HARD_LIMIT "
+                                "(%d bytes)" % (len(encoded), key, hard_limit))
+        return encoded
+
+    def get_many(self, keys, version=None, client=None, namespace=None):
         """
         Retrieve many keys.
         """
 
+        keys = list(keys)
         if client is None:
-            client = self.get_client(write=False)
+            if self._read_hedger is not None:
+                return self._hedged_read(
+                    lambda client: self.get_many(keys, version, client, namespace), keys)
+            client = self.get_read_client(*keys)
 
         if not keys:
             return {}
 
         recovered_data = OrderedDict()
 
-        new_keys = [self.make_key(k, version=version) for k in keys]
-        map_keys = dict(zip(new_keys, keys))
+        if namespace is not None:
+            results = self._namespaced_mget(client, keys, version, namespace)
+        else:
+            new_keys = [self.make_key(k, version=version) for k in keys]
+            map_keys = dict(zip(new_keys, keys))
 
-        try:
-            results = client.mget(*new_keys)
-        except _main_exceptions as e:
-            raise ConnectionInterrupted(connection=client, parent=e)
+            try:
+                results = client.mget(*new_keys)
+            except _main_exceptions as e:
+                raise ConnectionInterrupted(connection=client, parent=e)
+
+            keys = [map_keys[key] for key in new_keys]
 
-        for key, value in zip(new_keys, results):
+        for key, value in zip(keys, results):
             if value is None:
                 continue
-            recovered_data[map_keys[key]] = self.decode(value)
+            recovered_data[key] = self.decode(value)
         return recovered_data
 
-    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, client=None, tags=None,
+                 namespace=None, jitter=None):
         """
         Set a bunch of values in the cache at once from a dict of key/value
         pairs. This is much more efficient than calling set() multiple times.
@@ -360,16 +1212,27 @@ class DefaultClient(object):
         try:
             pipeline = client.pipeline()
             for key, value in data.items():
-                self.set(key, value, timeout, version=version, client=pipeline)
+                self.set(key, value, timeout, version=version, client=pipeline,
+                         tags=tags, namespace=namespace, jitter=jitter)
             pipeline.execute()
         except _main_exceptions as e:
             raise ConnectionInterrupted(connection=client, parent=e)
+        finally:
+            self._after_write(*data)
 
-    def _incr(self, key, delta=1, version=None, client=None):
+    def _incr(self, key, delta=1, version=None, client=None, namespace=None):
         if client is None:
             client = self.get_client(write=True)
 
-        key = self.make_key(key, version=version)
+        self._before_write(key)
+
+        original_key = key
+        key = self.make_key(key, version=version, namespace=namespace)
+
+        if isinstance(client, BasePipeline):
+            # The reply is nil if the key does not exist.
+            script = self.get_script(INCR_SCRIPT, client)
+            return script(keys=[key], args=[delta], client=client)
 
         try:
             if not client.exists(key):
@@ -387,26 +1250,29 @@ class DefaultClient(object):
                 timeout = client.ttl(key)
                 value = self.get(key, version=version, client=client) + delta
                 self.set(key, value, version=version, timeout=timeout,
-                         client=client)
+                         client=client, jitter=0)
         except _main_exceptions as e:
             raise ConnectionInterrupted(connection=client, parent=e)
+        finally:
+            self._after_write(original_key)
 
         return value
 
-    def incr(self, key, delta=1, version=None, client=None):
+    def incr(self, key, delta=1, version=None, client=None, namespace=None):
         """
         Add delta to value in the cache. If the key does not exist, raise a
         ValueError exception.
         """
-        return self._incr(key=key, delta=delta, version=version, client=client)
+        return self._incr(key=key, delta=delta, version=version, client=client,
+                          namespace=namespace)
 
-    def decr(self, key, delta=1, version=None, client=None):
+    def decr(self, key, delta=1, version=None, client=None, namespace=None):
         """
         Decreace delta to value in the cache. If the key does not exist, raise a
         ValueError exception.
         """
         return self._incr(key=key, delta=-delta, version=version,
-                          client=client)
+                          client=client, namespace=namespace)
 
     def ttl(self, key, version=None, client=None):
         """
@@ -414,7 +1280,7 @@ class DefaultClient(object):
         If key is a non volatile key, it returns None.
         """
         if client is None:
-            client = self.get_client(write=False)
+            client = self.get_read_client(key)
 
         key = self.make_key(key, version=version)
         if not client.exists(key):
@@ -423,15 +1289,15 @@ class DefaultClient(object):
         t = client.ttl(key)
         return (t >= 0 and t or None)
 
-    def has_key(self, key, version=None, client=None):
+    def has_key(self, key, version=None, client=None, namespace=None):
         """
         Test if key exists.
         """
 
         if client is None:
-            client = self.get_client(write=False)
+            client = self.get_read_client(key)
 
-        key = self.make_key(key, version=version)
+        key = self.make_key(key, version=version, namespace=namespace)
         try:
             return client.exists(key)
         except _main_exceptions as e:
@@ -469,10 +1335,158 @@ class DefaultClient(object):
         except _main_exceptions as e:
             raise ConnectionInterrupted(connection=client, parent=e)
 
-    def make_key(self, key, version=None):
+    def make_key(self, key, version=None, namespace=None, generation=None):
         if isinstance(key, CacheKey):
             return key
-        return CacheKey(self._backend.make_key(key, version))
+
+        profiler = self._backend._profiler
+        span = profiler.push("make_key", **{"cache.span": "make_key"}) \
+            if profiler is not None else None
+        try:
+            if namespace is not None:
+                if generation is None:
+                    generation = self.get_namespace_generation(namespace, version=version)
+                key = "%s:%s:%s" % (namespace, generation, key)
+
+            key = CacheKey(self._backend.make_key(key, version))
+        finally:
+            if span is not None:
+                profiler.finish(span)
+
+        if self._hot_keys is not None:
+            self._hot_keys.sample(key)
+        return key
+
+    def make_namespace_key(self, namespace, version=None):
+        return self.make_key("ns:%s" % namespace, version=version)
+
+    def _get_cached_generation(self, namespace_key):
+        """
+        Return the process local generation for the given namespace
+        key, and whether it is still fresh.
+        """
+        cache_key = (tuple(self._server), str(namespace_key))
+        cached = self._namespace_generations.get(cache_key)
+        if cached is None:
+            return 0, False
+
+        generation, fetched_at = cached
+        return generation, time.time() - fetched_at < self._namespace_timeout
+
+    def _set_cached_generation(self, namespace_key, generation):
+        cache_key = (tuple(self._server), str(namespace_key))
+        generations = self._namespace_generations
+        now = time.time()
+        if cache_key not in generations and len(generations) >= self._namespace_cache_size:
+            # Drop the expired generations, or all of them if none expired.
+            for key, cached in list(generations.items()):
+                if now - cached[1] >= self._namespace_timeout:
+                    generations.pop(key, None)
+            if len(generations) >= self._namespace_cache_size:
+                generations.clear()
+        generations[cache_key] = (int(generation or 0), now)
+
+    def get_generation_client(self, namespace_key):
+        """
+        Return the client of the server holding a namespace generation.
+        Generations are read from the master: a lagging slave could
+        return one older than an invalidation.
+        """
+        return self.get_client(write=True)
+
+    def get_namespace_generation(self, namespace, version=None, client=None):
+        """
+        Return the current generation of a namespace, read from the
+        master. It is cached per process for NAMESPACE_GENERATION_TIMEOUT
+        seconds.
+        """
+        namespace_key = self.make_namespace_key(namespace, version=version)
+        generation, fresh = self._get_cached_generation(namespace_key)
+        if fresh:
+            return generation
+
+        if client is None:
+            client = self.get_generation_client(namespace_key)
+
+        try:
+            generation = client.get(namespace_key)
+        except _main_exceptions as e:
+            raise ConnectionInterrupted(connection=client, parent=e)
+
+        self._set_cached_generation(namespace_key, generation)
+        return int(generation or 0)
+
+    def _namespaced_mget(self, client, keys, version, namespace):
+        """
+        Fetch the raw values of namespaced keys. When the cached
+        generation is stale, it is validated in the same MGET as the
+        data, so only a changed generation costs a second round trip;
+        reading from a slave, it is fetched from the master first.
+        """
+        namespace_key = self.make_namespace_key(namespace, version=version)
+        generation, fresh = self._get_cached_generation(namespace_key)
+        if not fresh:
+            generation_client = self.get_generation_client(namespace_key)
+            if client is not generation_client:
+                generation = self.get_namespace_generation(namespace, version=version,
+                                                           client=generation_client)
+                fresh = True
+
+        new_keys = [self.make_key(k, version=version, namespace=namespace,
+                                  generation=generation) for k in keys]
+        try:
+            if fresh:
+                return client.mget(*new_keys)
+
+            results = client.mget(namespace_key, *new_keys)
+            current = int(results[0] or 0)
+            self._set_cached_generation(namespace_key, current)
+            if current == generation:
+                return results[1:]
+
+            new_keys = [self.make_key(k, version=version, namespace=namespace,
+                                      generation=current) for k in keys]
+            return client.mget(*new_keys)
+        except _main_exceptions as e:
+            raise ConnectionInterrupted(connection=client, parent=e)
+
+    def invalidate_namespace(self, namespace, version=None, client=None):
+        """
+        Invalidate all keys of a namespace at once, incrementing its
+        generation. Old keys are left to expire. Returns the new
+        generation.
+        """
+        if client is None:
+            client = self.get_client(write=True)
+
+        self._before_write()
+
+        namespace_key = self.make_namespace_key(namespace, version=version)
+        try:
+            generation = client.incr(namespace_key)
+        except _main_exceptions as e:
+            raise ConnectionInterrupted(connection=client, parent=e)
+        finally:
+            self._after_write()
+
+        self._set_cached_generation(namespace_key, generation)
+        return generation
+
+    def warm_up(self, count=None):
+        """
+        Open ``count`` connections (WARM_UP by default, 1) to every
+        server, so the first requests do not pay for them. With WARM_UP,
+        this is done once the client is set up.
+        """
+        if count is None:
+            count = self._options.get("WARM_UP") or 1
+
+        for index in range(len(self._server)):
+            client = self._get_client_at(index)
+            try:
+                pool.warm_up_connection_pool(client.connection_pool, count)
+            except _main_exceptions as e:
+                raise ConnectionInterrupted(connection=client, parent=e)
 
     def close(self, **kwargs):
         if getattr(settings, "DJANGO_REDIS_CLOSE_CONNECTION", False):
@@ -3,7 +3,6 @@
 import random
 import socket
 import time
-from collections import OrderedDict
 
 from redis.exceptions import ConnectionError
 
@@ -46,9 +45,9 @@ def _is_expired(x):
 
 
 class HerdClient(DefaultClient):
-    def __init__(self, *args, **kwargs):
+    def setup(self, *args, **kwargs):
         self._marker = Marker()
-        super(HerdClient, self).__init__(*args, **kwargs)
+        super(HerdClient, self).setup(*args, **kwargs)
 
     def _pack(self, value, timeout):
         herd_timeout = ((timeout or self._backend.default_timeout)
@@ -72,7 +71,7 @@ class HerdClient(DefaultClient):
         return unpacked, False
 
     def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
-            client=None, nx=False, xx=False):
+            client=None, nx=False, xx=False, tags=None, namespace=None, jitter=None):
 
         if timeout == DEFAULT_TIMEOUT:
             timeout = self._backend.default_timeout
@@ -80,18 +79,21 @@ class HerdClient(DefaultClient):
         if timeout is None or timeout <= 0:
             return super(HerdClient, self).set(key, value, timeout=timeout,
                                                version=version, client=client,
-                                               nx=nx, xx=xx)
+                                               nx=nx, xx=xx, tags=tags,
+                                               namespace=namespace)
 
+        # The packed expiration follows the jittered timeout.
+        timeout = self.jitter_timeout(timeout, key, jitter)
         packed = self._pack(value, timeout)
         real_timeout = (timeout + CACHE_HERD_TIMEOUT)
 
         return super(HerdClient, self).set(key, packed, timeout=real_timeout,
                                            version=version, client=client,
-                                           nx=nx)
+                                           nx=nx, tags=tags, namespace=namespace,
+                                           jitter=0)
 
-    def get(self, key, default=None, version=None, client=None):
-        packed = super(HerdClient, self).get(key, default=default,
-                                             version=version, client=client)
+    def _get_result(self, value, default=None):
+        packed = super(HerdClient, self)._get_result(value, default=default)
         val, refresh = self._unpack(packed)
 
         if refresh:
@@ -99,34 +101,19 @@ class HerdClient(DefaultClient):
 
         return val
 
-    def get_many(self, keys, version=None, client=None):
-        if client is None:
-            client = self.get_client(write=False)
-
-        if not keys:
-            return {}
-
-        recovered_data = OrderedDict()
-
-        new_keys = [self.make_key(key, version=version) for key in keys]
-        map_keys = dict(zip(new_keys, keys))
-
-        try:
-            results = client.mget(*new_keys)
-        except _main_exceptions as e:
-            raise ConnectionInterrupted(connection=client, parent=e)
-
-        for key, value in zip(new_keys, results):
-            if value is None:
-                continue
+    def get_many(self, keys, version=None, client=None, namespace=None):
+        recovered_data = super(HerdClient, self).get_many(keys, version=version,
+                                                          client=client,
+                                                          namespace=namespace)
 
-            val, refresh = self._unpack(self.decode(value))
-            recovered_data[map_keys[key]] = None if refresh else val
+        for key, value in recovered_data.items():
+            val, refresh = self._unpack(value)
+            recovered_data[key] = None if refresh else val
 
         return recovered_data
 
     def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, client=None,
-                 herd=True):
+                 herd=True, tags=None, namespace=None, jitter=None):
         """
         Set a bunch of values in the cache at once from a dict of key/value
         pairs. This is much more efficient than calling set() multiple times.
@@ -142,10 +129,13 @@ class HerdClient(DefaultClient):
         try:
             pipeline = client.pipeline()
             for key, value in data.items():
-                set_function(key, value, timeout, version=version, client=pipeline)
+                set_function(key, value, timeout, version=version, client=pipeline,
+                             tags=tags, namespace=namespace, jitter=jitter)
             pipeline.execute()
         except _main_exceptions as e:
             raise ConnectionInterrupted(connection=client, parent=e)
+        finally:
+            self._after_write(*data)
 
     def incr(self, *args, **kwargs):
         raise NotImplementedError()
@@ -8,6 +8,7 @@ from collections import OrderedDict
 from redis.exceptions import ConnectionError
 
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 try:
     from django.utils.encoding import smart_text
@@ -16,15 +17,29 @@ except ImportError:
 
 from ..hash_ring import HashRing
 from ..exceptions import ConnectionInterrupted
+from .. import pool
 from ..util import CacheKey
-from .default import DefaultClient, DEFAULT_TIMEOUT
+from .default import DefaultClient, DEFAULT_TIMEOUT, _main_exceptions
+
+# Delete every key of KEYS whose DUMP is still the ARGV of the same
+# index, keeping the keys written since. Returns the number of deleted
+# keys.
+DELETE_UNCHANGED_SCRIPT = """
+local count = 0
+for i, key in ipairs(KEYS) do
+    if redis.call("DUMP", key) == ARGV[i] then
+        count = count + redis.call("DEL", key)
+    end
+end
+return count
+"""
 
 
 class ShardClient(DefaultClient):
     _findhash = re.compile('.*\{(.*)\}.*', re.I)
 
-    def __init__(self, *args, **kwargs):
-        super(ShardClient, self).__init__(*args, **kwargs)
+    def setup(self, *args, **kwargs):
+        super(ShardClient, self).setup(*args, **kwargs)
 
         if not isinstance(self._server, (list, tuple)):
             self._server = [self._server]
@@ -35,10 +50,18 @@ class ShardClient(DefaultClient):
     def get_client(self, write=True):
         raise NotImplementedError
 
+    def get_write_behind(self):
+        if self._options.get("WRITE_BEHIND_CLASS", None) is not None:
+            raise ImproperlyConfigured("The shard client does not support write-behind.")
+        return None
+
     def connect(self):
         connection_dict = {}
         for name in self._server:
-            connection_dict[name] = self.connection_factory.connect(name)
+            client = self.connection_factory.connect(name)
+            if self._backend._profiler is not None:
+                client = self._backend._profiler.instrument(client)
+            connection_dict[name] = client
         return connection_dict
 
     def get_server_name(self, _key):
@@ -53,54 +76,71 @@ class ShardClient(DefaultClient):
         name = self.get_server_name(key)
         return self._serverdict[name]
 
-    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None,
+            namespace=None, jitter=None):
         if client is None:
-            key = self.make_key(key, version=version)
+            key = self.make_key(key, version=version, namespace=namespace)
             client = self.get_server(key)
 
         return super(ShardClient, self)\
-            .add(key=key, value=value, version=version, client=client, timeout=timeout)
+            .add(key=key, value=value, version=version, client=client, timeout=timeout,
+                 namespace=namespace, jitter=jitter)
 
-    def get(self, key, default=None, version=None, client=None):
+    def get(self, key, default=None, version=None, client=None, namespace=None):
         if client is None:
-            key = self.make_key(key, version=version)
+            key = self.make_key(key, version=version, namespace=namespace)
             client = self.get_server(key)
+            if self._hot_keys is not None and self._hot_keys.local_timeout:
+                return self._get_hot(key, default, client=client)
+            if self._single_flight is not None and namespace is None:
+                return self._get_shared(key, default, client=client)
 
         return super(ShardClient, self)\
-            .get(key=key, default=default, version=version, client=client)
+            .get(key=key, default=default, version=version, client=client,
+                 namespace=namespace)
 
-    def get_many(self, keys, version=None):
+    def get_many(self, keys, version=None, namespace=None):
         if not keys:
             return {}
 
         recovered_data = OrderedDict()
 
-        new_keys = [self.make_key(key, version=version) for key in keys]
+        new_keys = [self.make_key(key, version=version, namespace=namespace) for key in keys]
         map_keys = dict(zip(new_keys, keys))
 
+        # One MGET per node.
+        server_keys = OrderedDict()
         for key in new_keys:
-            client = self.get_server(key)
-            value = self.get(key=key, version=version, client=client)
+            server_keys.setdefault(self.get_server_name(key), []).append(key)
 
-            if value is None:
-                continue
+        results = {}
+        for name, group in server_keys.items():
+            results.update(super(ShardClient, self)
+                           .get_many(group, version=version, client=self._serverdict[name]))
 
-            recovered_data[map_keys[key]] = value
+        for key in new_keys:
+            if key in results:
+                recovered_data[map_keys[key]] = results[key]
         return recovered_data
 
-    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None, nx=False):
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None, nx=False,
+            tags=None, namespace=None, jitter=None):
         """
         Persist a value to the cache, and set an optional expiration time.
+
+        Tag sets are stored on the same node as the tagged key.
         """
         if client is None:
-            key = self.make_key(key, version=version)
+            key = self.make_key(key, version=version, namespace=namespace)
             client = self.get_server(key)
 
         return super(ShardClient, self).set(key=key, value=value,
                                             timeout=timeout, version=version,
-                                            client=client, nx=nx)
+                                            client=client, nx=nx, tags=tags,
+                                            namespace=namespace, jitter=jitter)
 
-    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, tags=None,
+                 namespace=None, jitter=None):
         """
         Set a bunch of values in the cache at once from a dict of key/value
         pairs. This is much more efficient than calling set() multiple times.
@@ -109,29 +149,42 @@ class ShardClient(DefaultClient):
         the default cache timeout will be used.
         """
         for key, value in data.items():
-            self.set(key, value, timeout, version=version)
+            self.set(key, value, timeout, version=version, tags=tags,
+                     namespace=namespace, jitter=jitter)
+
+    def invalidate_tags(self, tags, version=None):
+        """
+        Remove all keys stored with any of the given tags. Every node
+        keeps its own tag sets, so all nodes are invalidated.
+        """
+        res = 0
+        for server, connection in self._serverdict.items():
+            res += super(ShardClient, self).invalidate_tags(tags, version=version,
+                                                            client=connection)
+        return res
 
-    def has_key(self, key, version=None, client=None):
+    def has_key(self, key, version=None, client=None, namespace=None):
         """
         Test if key exists.
         """
 
         if client is None:
-            key = self.make_key(key, version=version)
+            key = self.make_key(key, version=version, namespace=namespace)
             client = self.get_server(key)
 
-        key = self.make_key(key, version=version)
+        key = self.make_key(key, version=version, namespace=namespace)
         try:
             return client.exists(key)
         except ConnectionError:
             raise ConnectionInterrupted(connection=client)
 
-    def delete(self, key, version=None, client=None):
+    def delete(self, key, version=None, client=None, namespace=None):
         if client is None:
-            key = self.make_key(key, version=version)
+            key = self.make_key(key, version=version, namespace=namespace)
             client = self.get_server(key)
 
-        return super(ShardClient, self).delete(key=key, version=version, client=client)
+        return super(ShardClient, self).delete(key=key, version=version, client=client,
+                                               namespace=namespace)
 
     def ttl(self, key, version=None, client=None):
         """
@@ -171,59 +224,172 @@ class ShardClient(DefaultClient):
         return super(ShardClient, self).lock(key, timeout=timeout, sleep=sleep, client=client,
                                              blocking_timeout=blocking_timeout)
 
-    def delete_many(self, keys, version=None):
+    def delete_many(self, keys, version=None, namespace=None):
         """
         Remove multiple keys at once.
         """
         res = 0
-        for key in [self.make_key(k, version=version) for k in keys]:
+        for key in [self.make_key(k, version=version, namespace=namespace) for k in keys]:
             client = self.get_server(key)
             res += self.delete(key, client=client)
         return res
 
     def incr_version(self, key, delta=1, version=None, client=None):
+        if version is None:
+            version = self._backend.version
+
+        old_key, new_key = self._make_version_keys(key, version, delta)
+
         if client is None:
-            key = self.make_key(key, version=version)
-            client = self.get_server(key)
+            client = self.get_server(old_key)
+
+        new_client = self.get_server(new_key)
+        if new_client is client:
+            return super(ShardClient, self).incr_version(old_key, delta=delta,
+                                                         version=version, client=client)
+
+        if not self._move_keys(client, new_client, [key], [(old_key, new_key)])[0]:
+            raise ValueError("Key '%s' not found" % key)
 
+        return version + delta
+
+    def incr_version_many(self, keys, delta=1, version=None):
+        """
+        Adds delta to the cache version of many keys. Keys that stay on
+        the same node are renamed in one pipeline per node; only keys
+        whose new version lives on another node are copied with
+        DUMP/RESTORE.
+        """
         if version is None:
             version = self._backend.version
 
-        old_key = self.make_key(key, version)
-        value = self.get(old_key, version=version, client=client)
+        keys = list(keys)
+        local_keys = OrderedDict()
+        moving_keys = OrderedDict()
 
-        try:
-            ttl = client.ttl(old_key)
-        except ConnectionError:
-            raise ConnectionInterrupted(connection=client)
+        for key in keys:
+            old_key, new_key = self._make_version_keys(key, version, delta)
+            source = self.get_server_name(old_key)
+            target = self.get_server_name(new_key)
 
-        if value is None:
-            raise ValueError("Key '%s' not found" % key)
+            if source == target:
+                local_keys.setdefault(source, []).append(key)
+            else:
+                moving_keys.setdefault((source, target), []).append((key, old_key, new_key))
 
-        if isinstance(key, CacheKey):
-            new_key = self.make_key(key.original_key(), version=version + delta)
-        else:
-            new_key = self.make_key(key, version=version + delta)
+        moved = set()
+        for name, group in local_keys.items():
+            client = self._serverdict[name]
+            moved.update(super(ShardClient, self).incr_version_many(
+                group, delta=delta, version=version, client=client))
 
-        self.set(new_key, value, timeout=ttl, client=self.get_server(new_key))
-        self.delete(old_key, client=client)
-        return version + delta
+        for (source, target), group in moving_keys.items():
+            found = self._move_keys(self._serverdict[source], self._serverdict[target],
+                                    [key for key, _, _ in group],
+                                    [(old_key, new_key) for _, old_key, new_key in group])
+            moved.update(key for (key, _, _), ok in zip(group, found) if ok)
+
+        return OrderedDict((key, version + delta) for key in keys if key in moved)
+
+    def _move_keys(self, source, target, keys, pairs):
+        """
+        Move keys between two nodes with DUMP/RESTORE, keeping their
+        TTL. ``pairs`` holds the old and new made keys of ``keys``.
+        Returns a list of flags telling which keys existed.
 
-    def incr(self, key, delta=1, version=None, client=None):
+        The move is not atomic: an old key written between its DUMP and
+        its deletion is kept on the source node, and the new key holds
+        the value it had when dumped.
+        """
+        self._before_write(*keys)
+        try:
+            try:
+                pipeline = source.pipeline()
+                for old_key, _ in pairs:
+                    pipeline.dump(old_key)
+                    pipeline.pttl(old_key)
+                results = pipeline.execute()
+            except _main_exceptions as e:
+                raise ConnectionInterrupted(connection=source, parent=e)
+
+            found = []
+            dumps = []
+            try:
+                pipeline = target.pipeline()
+                for i, (old_key, new_key) in enumerate(pairs):
+                    dumped, pttl = results[i * 2], results[i * 2 + 1]
+                    found.append(dumped is not None)
+                    if dumped is None:
+                        continue
+
+                    dumps.append((old_key, dumped))
+                    pipeline.execute_command("RESTORE", new_key, pttl if pttl > 0 else 0,
+                                             dumped, "REPLACE")
+                pipeline.execute()
+            except _main_exceptions as e:
+                raise ConnectionInterrupted(connection=target, parent=e)
+
+            if dumps:
+                script = self.get_script(DELETE_UNCHANGED_SCRIPT, source)
+                try:
+                    script(keys=[old_key for old_key, _ in dumps],
+                           args=[dumped for _, dumped in dumps], client=source)
+                except _main_exceptions as e:
+                    raise ConnectionInterrupted(connection=source, parent=e)
+
+            return found
+        finally:
+            self._after_write(*keys)
+
+    def incr(self, key, delta=1, version=None, client=None, namespace=None):
         if client is None:
-            key = self.make_key(key, version=version)
+            key = self.make_key(key, version=version, namespace=namespace)
             client = self.get_server(key)
 
         return super(ShardClient, self)\
-            .incr(key=key, delta=delta, version=version, client=client)
+            .incr(key=key, delta=delta, version=version, client=client,
+                  namespace=namespace)
 
-    def decr(self, key, delta=1, version=None, client=None):
+    def decr(self, key, delta=1, version=None, client=None, namespace=None):
         if client is None:
-            key = self.make_key(key, version=version)
+            key = self.make_key(key, version=version, namespace=namespace)
             client = self.get_server(key)
 
         return super(ShardClient, self)\
-            .decr(key=key, delta=delta, version=version, client=client)
+            .decr(key=key, delta=delta, version=version, client=client,
+                  namespace=namespace)
+
+    def incr_counters(self, counters, client=None):
+        """
+        Increment the counters with one pipeline per node.
+        """
+        if client is not None:
+            return super(ShardClient, self).incr_counters(counters, client=client)
+
+        groups = OrderedDict()
+        made = []
+        for index, (key, delta, timeout, version, namespace) in enumerate(counters):
+            key = self.make_key(key, version=version, namespace=namespace)
+            made.append((key, delta, timeout, version, namespace))
+            groups.setdefault(self.get_server_name(key), []).append(index)
+
+        results = [None] * len(counters)
+        for name, indexes in groups.items():
+            values = super(ShardClient, self).incr_counters([made[i] for i in indexes],
+                                                            client=self._serverdict[name])
+            for index, value in zip(indexes, values):
+                results[index] = value
+        return results
+
+    def get_generation_client(self, namespace_key):
+        return self.get_server(namespace_key)
+
+    def invalidate_namespace(self, namespace, version=None, client=None):
+        if client is None:
+            client = self.get_server(self.make_namespace_key(namespace, version=version))
+
+        return super(ShardClient, self)\
+            .invalidate_namespace(namespace, version=version, client=client)
 
     def iter_keys(self, key, version=None):
         raise NotImplementedError("iter_keys not supported on sharded client")
@@ -259,6 +425,16 @@ class ShardClient(DefaultClient):
                 res += connection.delete(*keys)
         return res
 
+    def warm_up(self, count=None):
+        if count is None:
+            count = self._options.get("WARM_UP") or 1
+
+        for client in self._serverdict.values():
+            try:
+                pool.warm_up_connection_pool(client.connection_pool, count)
+            except _main_exceptions as e:
+                raise ConnectionInterrupted(connection=client, parent=e)
+
     def close(self, **kwargs):
         if getattr(settings, "DJANGO_REDIS_CLOSE_CONNECTION", False):
             for client in self._serverdict.values():
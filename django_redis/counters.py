@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import atexit
+import os
+import threading
+import weakref
+
+from .client.default import DEFAULT_TIMEOUT
+
+# The counters holding deltas, kept until they are flushed, also on exit,
+# with a client of their cache to send them.
+_pending_counters = {}
+
+
+@atexit.register
+def _flush_pending_counters():
+    for counters in list(_pending_counters):
+        counters.flush()
+
+
+def _run(ref, wakeup, flush_interval):
+    # The counters are only held while flushed, so they are dropped with
+    # their cache.
+    while True:
+        wakeup.wait(flush_interval)
+        wakeup.clear()
+        counters = ref()
+        if counters is None:
+            return
+        counters.flush()
+        del counters
+
+
+class _Shard(object):
+    """
+    The pending deltas of one thread.
+    """
+    __slots__ = ("deltas", "increments", "lock", "thread")
+
+    def __init__(self):
+        self.deltas = {}
+        self.increments = 0
+        self.lock = threading.Lock()
+        self.thread = threading.current_thread()
+
+
+class BufferedCounters(object):
+    """
+    Counters incremented in memory and added to redis in batches.
+
+    Every thread adds its increments to a buffer of its own, so that
+    incrementing does not contend on a lock. A background thread sends
+    the buffered deltas every ``flush_interval`` seconds, or as soon as
+    a thread buffers ``flush_threshold`` counters, as one pipeline of
+    INCRBY. Missing counters are created with the timeout given to
+    ``incr`` (the default timeout of the cache if omitted); existing
+    ones keep their ttl.
+
+    Counting is at most once: the increments buffered since the last
+    flush are lost if the process is killed, and a batch failing on a
+    connection error is dropped, not retried. The buffers are flushed
+    when the process exits.
+    """
+
+    def __init__(self, client, flush_interval=1.0, flush_threshold=1000):
+        # The counters are shared by the clients of a cache, and held by them.
+        self._clients = client._sharing_clients
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+
+        self._shards = []
+        # Increments counted by the buffers of finished threads.
+        self._increments = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._pid = None
+
+    @property
+    def client(self):
+        return self._clients()
+
+    def _start(self):
+        self._pid = os.getpid()
+        # Deltas buffered by the parent process belong to it.
+        del self._shards[:]
+        thread = threading.Thread(target=_run, name="django-redis-counters",
+                                  args=(weakref.ref(self), self._wakeup, self.flush_interval))
+        thread.daemon = True
+        thread.start()
+
+    def _get_shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is not None and self._pid == os.getpid():
+            return shard
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            shard = self._local.shard = _Shard()
+            self._shards.append(shard)
+        return shard
+
+    def incr(self, key, delta=1, timeout=DEFAULT_TIMEOUT, version=None, namespace=None):
+        """
+        Add ``delta`` to the counter ``key``. The new value is not known
+        until the counter is flushed.
+        """
+        shard = self._get_shard()
+        counter = (key, version, namespace)
+
+        with shard.lock:
+            if not shard.deltas and self not in _pending_counters:
+                _pending_counters[self] = self.client
+            pending = shard.deltas.get(counter)
+            shard.deltas[counter] = ((pending[0] if pending else 0) + delta, timeout)
+            shard.increments += 1
+            size = len(shard.deltas)
+
+        if size >= self.flush_threshold:
+            self._wakeup.set()
+
+    def __len__(self):
+        return sum(len(shard.deltas) for shard in self._shards)
+
+    def flush(self):
+        """
+        Send the buffered deltas of all threads, in the calling thread.
+        Return the number of counters sent.
+        """
+        with self._flush_lock:
+            with self._lock:
+                shards = list(self._shards)
+                # Buffers of finished threads are dropped once drained.
+                finished = [shard for shard in shards if not shard.thread.is_alive()]
+                self._shards[:] = [shard for shard in shards if shard not in finished]
+                self._increments += sum(shard.increments for shard in finished)
+                # Added again by the increments following the drain below.
+                client = _pending_counters.pop(self, None) or self.client
+
+            totals = {}
+            for shard in shards:
+                with shard.lock:
+                    deltas, shard.deltas = shard.deltas, {}
+
+                for counter, (delta, timeout) in deltas.items():
+                    pending = totals.get(counter)
+                    totals[counter] = ((pending[0] if pending else 0) + delta, timeout)
+
+            counters = [(key, delta, timeout, version, namespace)
+                        for (key, version, namespace), (delta, timeout) in totals.items()
+                        if delta]
+            if not counters:
+                return 0
+
+            try:
+                results = client.incr_counters(counters)
+            except Exception:
+                self.failed += len(counters)
+                return 0
+
+            failed = results.count(None)
+            self.failed += failed
+            self.flushed += len(counters) - failed
+            self.batches += 1
+            return len(counters)
+
+    def stats(self):
+        return {
+            "pending": len(self),
+            "increments": self._increments + sum(shard.increments for shard in self._shards),
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
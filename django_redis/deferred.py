@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from collections import OrderedDict
+
+
+class DeferredValue(object):
+    """
+    Result of a command queued with ``get_deferred`` or on a
+    cache pipeline.
+
+    Accessing ``value`` runs all the commands queued so far on
+    the same batch in a single round trip. If the command
+    failed, its exception is raised instead.
+    """
+
+    def __init__(self, batch, key, default=None):
+        self._batch = batch
+        self._done = False
+        self._value = None
+        self._error = None
+        self.key = key
+        self.default = default
+
+    def done(self):
+        return self._done
+
+    def resolve(self, value):
+        self._value = value
+        self._done = True
+
+    def fail(self, error):
+        self._error = error
+        self._done = True
+
+    @property
+    def value(self):
+        if not self._done:
+            self._batch.flush()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def __repr__(self):
+        if self._error is not None:
+            return "<DeferredValue {0!r}: {1!r}>".format(self.key, self._error)
+        if self._done:
+            return "<DeferredValue {0!r}: {1!r}>".format(self.key, self._value)
+        return "<DeferredValue {0!r}: pending>".format(self.key)
+
+
+class ReadBatch(object):
+    """
+    Queue of deferred reads of a cache backend. All pending
+    reads are fetched together with ``get_many``: one MGET,
+    or one MGET per node with the shard client.
+    """
+
+    def __init__(self, cache):
+        self._cache = cache
+        self._pending = []
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, key, default=None, version=None, namespace=None):
+        deferred = DeferredValue(self, key, default)
+        self._pending.append((version, namespace, deferred))
+        return deferred
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+
+        groups = OrderedDict()
+        for version, namespace, deferred in pending:
+            groups.setdefault((version, namespace), []).append(deferred)
+
+        try:
+            for (version, namespace), group in groups.items():
+                keys = list(OrderedDict.fromkeys(d.key for d in group))
+                results = self._cache.get_many(keys, version=version, namespace=namespace)
+
+                for deferred in group:
+                    deferred.resolve(results.get(deferred.key, deferred.default))
+        except Exception:
+            # Keep unresolved reads queued, so they can be retried.
+            self._pending[:0] = [item for item in pending if not item[2].done()]
+            raise
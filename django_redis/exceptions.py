@@ -7,6 +7,18 @@ class ConnectionInterrumped(Exception):
         self.parent = parent
 
 
+class ValueTooLarge(ValueError):
+    """
+    Raised instead of writing a value larger than VALUE_SIZE_HARD_LIMIT.
+    """
+
+
+class ValueSizeWarning(RuntimeWarning):
+    """
+    Warns of a value larger than VALUE_SIZE_SOFT_LIMIT.
+    """
+
+
 class ConnectionInterrupted(ConnectionInterrumped):
     def __str__(self):
       error_type = "ConnectionInterrupted"
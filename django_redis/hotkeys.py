@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+import random
+import socket
+import threading
+import time
+import weakref
+
+try:
+    from django.utils.encoding import smart_text
+except ImportError:
+    from django.utils.encoding import smart_unicode as smart_text
+
+import redis
+
+from .util import CacheKey
+
+# redis-py 3 takes the members and scores of zadd as a mapping.
+if redis.VERSION[0] >= 3:
+    def _zadd(client, key, scores):
+        return client.zadd(key, scores)
+else:
+    def _zadd(client, key, scores):
+        return client.zadd(key, **scores)
+
+
+def _run(ref, publish_interval):
+    # The tracker is only held while publishing, so it is dropped with its
+    # cache.
+    while True:
+        time.sleep(publish_interval)
+        tracker = ref()
+        if tracker is None:
+            return
+        try:
+            tracker.publish()
+        except Exception:
+            tracker.publish_failures += 1
+        del tracker
+
+
+class HotKeyTracker(object):
+    """
+    Find the keys this process accesses the most.
+
+    A ``sample_rate`` fraction of the accessed keys is counted in a
+    count-min sketch of ``depth`` rows of ``width`` counters, and the
+    ``top_k`` keys with the highest estimates are kept. All counts are
+    halved every ``decay_interval`` seconds, so that the estimates follow
+    the current traffic. Memory is bounded by the sketch and top_k.
+
+    Keys estimated to be accessed ``hot_threshold`` times or more are
+    hot. With ``local_timeout``, the values of hot keys read with get are
+    kept in process memory for that many seconds, unless missing or read
+    while the process writes them.
+
+    With ``publish_interval``, a background thread stores the top keys of
+    the process in redis every ``publish_interval`` seconds, so that
+    ``published`` can add them up across processes.
+    """
+
+    def __init__(self, client, sample_rate=0.01, top_k=100, width=2048, depth=4,
+                 decay_interval=60, hot_threshold=1000, local_timeout=0, publish_interval=0):
+        # The tracker is shared by the clients of a cache, and held by them.
+        self._clients = client._sharing_clients
+        self.sample_rate = sample_rate
+        self.top_k = top_k
+        self.width = width
+        self.depth = depth
+        self.decay_interval = decay_interval
+        self.hot_threshold = hot_threshold
+        self.local_timeout = local_timeout
+        self.publish_interval = publish_interval
+
+        self.samples = 0
+        self.local_hits = 0
+        self.publish_failures = 0
+
+        self._rows = [[0] * width for x in range(depth)]
+        self._top = {}
+        self._top_min = 0
+        self._next_decay = time.time() + decay_interval
+        self._local = {}
+        # Bumped by every write, to not cache the values read during one.
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._pid = None
+
+    @property
+    def client(self):
+        return self._clients()
+
+    def _start(self):
+        self._pid = os.getpid()
+        if self.publish_interval:
+            thread = threading.Thread(target=_run, name="django-redis-hot-keys",
+                                      args=(weakref.ref(self), self.publish_interval))
+            thread.daemon = True
+            thread.start()
+
+    def sample(self, key):
+        """
+        Count an access to ``key``, with a probability of sample_rate.
+        """
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start()
+
+        key = smart_text(key)
+        with self._lock:
+            now = time.time()
+            if now >= self._next_decay:
+                self._decay(now)
+
+            self.samples += 1
+            cells = [hash((seed, key)) % self.width for seed in range(self.depth)]
+            estimate = min(row[cell] for row, cell in zip(self._rows, cells)) + 1
+            # Conservative update: only raise the counters below the new estimate.
+            for row, cell in zip(self._rows, cells):
+                if row[cell] < estimate:
+                    row[cell] = estimate
+
+            if key in self._top or len(self._top) < self.top_k:
+                self._top[key] = estimate
+            elif estimate > self._top_min:
+                coldest = min(self._top, key=self._top.get)
+                if estimate > self._top[coldest]:
+                    del self._top[coldest]
+                    self._top[key] = estimate
+                    self._top_min = min(self._top.values())
+
+    def _decay(self, now):
+        self._rows = [[count >> 1 for count in row] for row in self._rows]
+        self._top = dict((key, count >> 1) for key, count in self._top.items() if count > 1)
+        self._top_min = min(self._top.values()) if self._top else 0
+        self._next_decay = now + self.decay_interval
+
+    def top(self, count=10):
+        """
+        Return the ``count`` hottest keys of the process, as (key,
+        estimated accesses) pairs.
+        """
+        with self._lock:
+            top = sorted(self._top.items(), key=lambda item: item[1], reverse=True)[:count]
+        return [(key, int(estimate / self.sample_rate)) for key, estimate in top]
+
+    def is_hot(self, key):
+        return self._top.get(smart_text(key), 0) >= self.hot_threshold * self.sample_rate
+
+    def get_local(self, key):
+        """
+        Return (True, raw value) if ``key`` is cached locally,
+        (False, None) otherwise.
+        """
+        entry = self._local.get(smart_text(key))
+        if entry is not None and entry[2] > time.time():
+            self.local_hits += 1
+            return True, entry[1]
+        return False, None
+
+    def set_local(self, key, original_key, value, writes=None):
+        """
+        Cache the raw value of ``key`` locally if it is hot and found.
+        ``original_key`` is the key given by the caller, and ``writes``
+        the value of ``writes`` before the value was read: it is not
+        cached if the process wrote since.
+        """
+        if value is None or not self.is_hot(key):
+            return
+        if writes is not None and writes != self.writes:
+            return
+
+        now = time.time()
+        if len(self._local) >= self.top_k:
+            for cached, entry in list(self._local.items()):
+                if entry[2] <= now:
+                    self._local.pop(cached, None)
+        self._local[smart_text(key)] = (smart_text(original_key), value, now + self.local_timeout)
+
+    def forget(self, original_keys=None):
+        """
+        Drop the locally cached values of the keys written by this
+        process, or all of them. Called when a write starts and ends.
+        """
+        self.writes += 1
+        if not self._local:
+            return
+        if original_keys is None:
+            self._local.clear()
+            return
+
+        original_keys = set(smart_text(key) for key in original_keys)
+        for cached, entry in list(self._local.items()):
+            if entry[0] in original_keys:
+                self._local.pop(cached, None)
+
+    def _make_key(self, name):
+        # The hash tag keeps all the keys of the tracker on one shard.
+        return CacheKey(self.client._backend.make_key("{hot-keys}:%s" % name))
+
+    def publish(self):
+        """
+        Store the top keys of the process in redis.
+        """
+        registry = self._make_key("processes")
+        key = self._make_key("%s:%d" % (socket.gethostname(), os.getpid()))
+        timeout = int(max(self.publish_interval, 1) * 2)
+
+        client = self.client.get_server(registry)
+        pipeline = client.pipeline()
+        pipeline.delete(key)
+        top = self.top(self.top_k)
+        if top:
+            _zadd(pipeline, key, dict(top))
+            pipeline.expire(key, timeout)
+            pipeline.sadd(registry, key)
+            pipeline.expire(registry, timeout)
+        pipeline.execute()
+
+    def published(self, count=10):
+        """
+        Return the ``count`` hottest keys published by all processes,
+        as (key, estimated accesses) pairs.
+        """
+        registry = self._make_key("processes")
+        client = self.client.get_server(registry)
+
+        totals = {}
+        for key in client.smembers(registry):
+            top = client.zrange(key, 0, -1, withscores=True)
+            if not top:
+                client.srem(registry, key)
+            for member, score in top:
+                member = smart_text(member)
+                totals[member] = totals.get(member, 0) + int(score)
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]
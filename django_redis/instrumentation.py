@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import bisect
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from .signals import cache_metric
+from .util import load_class, string_types, text_type
+
+# Upper bounds, in seconds, of the buckets of the timing histograms.
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Upper bounds, in bytes, of the buckets of the value size histograms.
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+TIMING = "timing"
+SIZE = "size"
+COUNTER = "counter"
+
+# Metrics of every instrumented cache of the process, by alias.
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class Histogram(object):
+    def __init__(self, buckets, unit):
+        self.buckets = buckets
+        self.unit = unit
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        Return the (upper bound, count) pairs of the buckets,
+        counting the observations less than or equal to the bound.
+        """
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class SignalSink(object):
+    """
+    Send every measure with the ``cache_metric`` signal.
+    """
+
+    def emit(self, name, value, kind, labels):
+        cache_metric.send(sender=self.__class__, name=name, value=value, kind=kind,
+                          labels=labels)
+
+
+class CallbackSink(object):
+    """
+    Pass every measure to ``callback(name, value, kind, labels)``, as a
+    StatsD client would need. ``callback`` may be a dotted path.
+    """
+
+    def __init__(self, callback):
+        if isinstance(callback, string_types):
+            callback = load_class(callback)
+        self.callback = callback
+
+    def emit(self, name, value, kind, labels):
+        self.callback(name, value, kind, labels)
+
+
+class Metrics(object):
+    """
+    Measures of one cache: latency of its operations, hits and misses
+    of get and get_many, bytes and time spent encoding and decoding
+    values, sizes of the values written (raw, serialized and stored),
+    and errors ignored with IGNORE_EXCEPTIONS.
+
+    The measures are aggregated in memory, labelled with the cache alias,
+    and with the key prefix (the part of the key before the first
+    ``prefix_separator``) if set; at most ``max_prefixes`` prefixes are
+    tracked, the other ones are labelled "other". Every measure is also
+    passed to the ``sinks``, instances or dotted paths of sink classes.
+    """
+
+    def __init__(self, alias, prefix_separator=None, max_prefixes=100, buckets=DEFAULT_BUCKETS,
+                 sinks=()):
+        self.alias = alias
+        self.prefix_separator = prefix_separator
+        self.max_prefixes = max_prefixes
+        self.buckets = tuple(buckets)
+        self.sinks = [load_class(sink)() if isinstance(sink, string_types) else sink
+                      for sink in sinks]
+
+        self.histograms = {}
+        self.counters = {}
+        self._prefixes = set()
+        self._lock = threading.Lock()
+
+    def _labels(self, key=None, **labels):
+        labels["alias"] = self.alias
+        if self.prefix_separator is not None:
+            labels["prefix"] = self._prefix(key)
+        return labels
+
+    def _prefix(self, key):
+        if not isinstance(key, string_types):
+            return ""
+
+        prefix = key.split(self.prefix_separator, 1)[0] if self.prefix_separator in key else ""
+        if prefix not in self._prefixes:
+            # Only adding a prefix takes the lock, so max_prefixes holds.
+            with self._lock:
+                if prefix not in self._prefixes:
+                    if len(self._prefixes) >= self.max_prefixes:
+                        return "other"
+                    self._prefixes.add(prefix)
+        return prefix
+
+    def _emit(self, name, value, kind, labels):
+        for sink in self.sinks:
+            sink.emit(name, value, kind, labels)
+
+    def _observe(self, name, value, labels, buckets, unit):
+        series = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(series)
+            if histogram is None:
+                histogram = self.histograms[series] = Histogram(buckets, unit)
+            histogram.observe(value)
+
+    def timing(self, name, seconds, labels):
+        self._observe(name, seconds, labels, self.buckets, "seconds")
+        self._emit(name, seconds, TIMING, labels)
+
+    def size(self, name, size, labels):
+        self._observe(name, size, labels, SIZE_BUCKETS, "bytes")
+        self._emit(name, size, SIZE, labels)
+
+    def incr(self, name, count, labels):
+        series = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[series] = self.counters.get(series, 0) + count
+        self._emit(name, count, COUNTER, labels)
+
+    def operation(self, operation, seconds, key=None):
+        self.timing("operation", seconds, self._labels(key, operation=operation))
+
+    def hits(self, count, key=None):
+        if count:
+            self.incr("hits", count, self._labels(key))
+
+    def misses(self, count, key=None):
+        if count:
+            self.incr("misses", count, self._labels(key))
+
+    def ignored_error(self, operation):
+        self.incr("ignored_errors", 1, self._labels(operation=operation))
+
+    def encoded(self, size, seconds):
+        self.incr("bytes_sent", size, self._labels())
+        self.timing("encode", seconds, self._labels())
+
+    def value_size(self, key, stored, serialized, raw=None):
+        labels = self._labels(key)
+        self.size("value_stored", stored, labels)
+        self.size("value_serialized", serialized, labels)
+        if raw is not None:
+            self.size("value_raw", raw, labels)
+
+    def compression_ratio(self, **labels):
+        """
+        Return the stored size of the values written over their
+        serialized size, for the series matching ``labels``.
+        """
+        def total(name):
+            with self._lock:
+                return sum(histogram.sum for (series_name, series_labels), histogram
+                           in self.histograms.items()
+                           if series_name == name and set(labels.items()) <= set(series_labels))
+
+        serialized = total("value_serialized")
+        return total("value_stored") / serialized if serialized else None
+
+    def decoded(self, size, seconds):
+        self.incr("bytes_received", size, self._labels())
+        self.timing("decode", seconds, self._labels())
+
+    def get_counter(self, name, **labels):
+        """
+        Return the sum of the counter ``name`` over the series
+        matching ``labels``.
+        """
+        with self._lock:
+            return sum(value for (series_name, series_labels), value in self.counters.items()
+                       if series_name == name and set(labels.items()) <= set(series_labels))
+
+    def get_histogram(self, name, **labels):
+        """
+        Return the histogram ``name`` of the series matching ``labels``
+        exactly, or None.
+        """
+        series = (name, tuple(sorted(self._labels(**labels).items())))
+        return self.histograms.get(series)
+
+
+def _find_alias(server, params):
+    options = params.get("OPTIONS")
+    for alias, conf in getattr(settings, "CACHES", {}).items():
+        if options is not None and conf.get("OPTIONS") is options:
+            return alias
+    for alias, conf in getattr(settings, "CACHES", {}).items():
+        if conf.get("LOCATION") == server:
+            return alias
+    return server if isinstance(server, string_types) else ",".join(server)
+
+
+def get_metrics(server, params):
+    """
+    Return the Metrics of the cache configured with ``params``, shared
+    by its backends, or None if INSTRUMENTATION_CLASS is not set.
+    """
+    options = params.get("OPTIONS") or {}
+    path = options.get("INSTRUMENTATION_CLASS", None)
+    if path is None:
+        return None
+
+    alias = _find_alias(server, params)
+    metrics = _registry.get(alias)
+    if metrics is None:
+        with _registry_lock:
+            metrics = _registry.get(alias)
+            if metrics is None:
+                cls = load_class(path)
+                metrics = _registry[alias] = cls(alias,
+                                                 **options.get("INSTRUMENTATION_KWARGS", {}))
+    return metrics
+
+
+def _format_labels(labels, **extra):
+    labels = sorted(labels + tuple(extra.items()))
+    return "{%s}" % ",".join('%s="%s"' % (name, text_type(value).replace("\\", "\\\\")
+                                          .replace('"', '\\"').replace("\n", "\\n"))
+                             for name, value in labels)
+
+
+def prometheus_text():
+    """
+    Return the metrics of all the instrumented caches in the
+    Prometheus text exposition format.
+    """
+    histograms = {}
+    counters = {}
+    for metrics in list(_registry.values()):
+        with metrics._lock:
+            for (name, labels), histogram in metrics.histograms.items():
+                histograms.setdefault(name, []).append(
+                    (histogram.unit, labels, histogram.cumulative(), histogram.sum,
+                     histogram.count))
+            for (name, labels), value in metrics.counters.items():
+                counters.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(histograms):
+        metric = "django_redis_%s_%s" % (name, histograms[name][0][0])
+        lines.append("# TYPE %s histogram" % metric)
+        for unit, labels, buckets, total, count in histograms[name]:
+            for bound, value in buckets:
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append("%s_bucket%s %d" % (metric, _format_labels(labels, le=le), value))
+            lines.append("%s_sum%s %r" % (metric, _format_labels(labels), total))
+            lines.append("%s_count%s %d" % (metric, _format_labels(labels), count))
+
+    for name in sorted(counters):
+        metric = "django_redis_%s_total" % name
+        lines.append("# TYPE %s counter" % metric)
+        for labels, value in counters[name]:
+            lines.append("%s%s %d" % (metric, _format_labels(labels), value))
+
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """
+    Django view serving prometheus_text().
+    """
+    return HttpResponse(prometheus_text(), content_type="text/plain; version=0.0.4")
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import random
+import zlib
+
+from .util import load_class, smart_bytes, string_types, text_type
+
+
+def uniform(rnd):
+    return rnd.random()
+
+
+DISTRIBUTIONS = {
+    "uniform": uniform,
+}
+
+
+class TTLJitter(object):
+    """
+    Shorten timeouts by a random fraction of up to ``spread`` of their
+    length (0.1 for up to 10%), so values set together do not expire
+    together. The fraction is drawn by ``distribution``: "uniform", or a
+    function (or its dotted path) taking a random.Random and returning a
+    number between 0 and 1. With ``deterministic``, the fraction only
+    depends on the key, so setting a key again gives it the same timeout.
+    """
+
+    def __init__(self, spread=0.1, distribution="uniform", deterministic=False):
+        if not 0 <= spread <= 1:
+            raise ValueError("spread must be between 0 and 1: %r" % spread)
+        if isinstance(distribution, string_types):
+            distribution = DISTRIBUTIONS.get(distribution) or load_class(distribution)
+        self.spread = spread
+        self.distribution = distribution
+        self.deterministic = deterministic
+        self._random = random.Random()
+
+    def apply(self, timeout, key, spread=None):
+        """
+        Return the jittered ``timeout`` of ``key``, in whole seconds.
+        ``spread`` overrides the spread of the instance.
+        """
+        if spread is None:
+            spread = self.spread
+        if not spread or timeout is None or timeout <= 0:
+            return timeout
+
+        if self.deterministic:
+            rnd = random.Random(zlib.crc32(smart_bytes(text_type(key))))
+        else:
+            rnd = self._random
+        fraction = min(max(self.distribution(rnd), 0), 1)
+        return max(int(timeout * (1 - spread * fraction)), 1)
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, unicode_literals
+
+import bisect
+import multiprocessing
+import random
+import string
+import threading
+import time
+
+from .client.default import DEFAULT_TIMEOUT
+
+OPERATIONS = ("get", "set", "get_many", "set_many", "delete")
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def _accumulate(values):
+    total = 0.0
+    result = []
+    for value in values:
+        total += value
+        result.append(total)
+    return result
+
+
+def parse_range(value):
+    """
+    Parse "100" or "100-1000" into a (low, high) pair of ints.
+    """
+    low, sep, high = str(value).partition("-")
+    low = int(low)
+    high = int(high) if sep else low
+    if low < 0 or high < low:
+        raise ValueError("invalid range: %r" % value)
+    return low, high
+
+
+def parse_mix(value):
+    """
+    Parse "get=80,set=20" into a list of (operation, weight) pairs.
+    """
+    mix = []
+    for item in value.split(","):
+        operation, sep, weight = item.strip().partition("=")
+        if operation not in OPERATIONS or not sep:
+            raise ValueError("invalid operation mix: %r" % value)
+        mix.append((operation, float(weight)))
+    if not mix or sum(weight for operation, weight in mix) <= 0:
+        raise ValueError("invalid operation mix: %r" % value)
+    return mix
+
+
+class UniformKeys(object):
+    """
+    Key indexes drawn uniformly out of ``count``.
+    """
+
+    def __init__(self, count):
+        self.count = count
+
+    def sample(self, rnd):
+        return rnd.randrange(self.count)
+
+
+class ZipfKeys(object):
+    """
+    Key indexes out of ``count`` following Zipf's law: the probability
+    of the key of rank ``i`` is proportional to ``1 / i ** exponent``.
+    """
+
+    def __init__(self, count, exponent=0.99):
+        self.count = count
+        self.exponent = exponent
+        self._cdf = _accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1))
+
+    def sample(self, rnd):
+        return min(bisect.bisect_left(self._cdf, rnd.random() * self._cdf[-1]), self.count - 1)
+
+
+class Workload(object):
+    """
+    A cache workload: ``keys`` keys named ``prefix:<index>`` chosen with
+    the ``distribution`` ("zipf" or "uniform"), operations picked out of
+    ``mix`` by weight, get_many and set_many of ``batch`` keys, values
+    of ``value_size`` bytes and ttls of ``ttl`` seconds, (low, high)
+    ranges drawn uniformly; ``ttl=None`` uses the timeout of the cache.
+    With ``fill_misses``, the keys get misses are set afterwards, as a
+    cache-aside application would.
+    """
+
+    def __init__(self, keys=10000, distribution="zipf", zipf_exponent=0.99, mix=None,
+                 batch=10, value_size=(100, 100), ttl=None, prefix="loadgen",
+                 fill_misses=False):
+        if distribution == "zipf":
+            self.keys = ZipfKeys(keys, zipf_exponent)
+        elif distribution == "uniform":
+            self.keys = UniformKeys(keys)
+        else:
+            raise ValueError("unknown key distribution: %r" % distribution)
+
+        mix = mix or [("get", 90), ("set", 10)]
+        self.config = {
+            "keys": keys,
+            "distribution": distribution,
+            "zipf_exponent": zipf_exponent if distribution == "zipf" else None,
+            "mix": dict(mix),
+            "batch": batch,
+            "value_size": list(value_size),
+            "ttl": list(ttl) if ttl is not None else None,
+            "prefix": prefix,
+            "fill_misses": fill_misses,
+        }
+        self.batch = batch
+        self.value_size = value_size
+        self.ttl = ttl
+        self.prefix = prefix
+        self.fill_misses = fill_misses
+
+        self._operations = [operation for operation, weight in mix]
+        self._weights = _accumulate(weight for operation, weight in mix)
+
+        # Pseudo random text, so values are only partly compressible.
+        rnd = random.Random(value_size[1])
+        self._payload = "".join(rnd.choice(string.ascii_letters + string.digits)
+                                for x in range(value_size[1]))
+
+    def key(self, rnd):
+        return "%s:%d" % (self.prefix, self.keys.sample(rnd))
+
+    def value(self, rnd):
+        return self._payload[:rnd.randint(*self.value_size)]
+
+    def timeout(self, rnd):
+        return DEFAULT_TIMEOUT if self.ttl is None else rnd.randint(*self.ttl)
+
+    def operation(self, rnd):
+        return self._operations[bisect.bisect_right(self._weights,
+                                                    rnd.random() * self._weights[-1])]
+
+    def preload(self, cache, rnd=None):
+        """
+        Set all the keys of the workload.
+        """
+        rnd = rnd or random.Random(0)
+        count = self.config["keys"]
+        for start in range(0, count, 1000):
+            cache.set_many(dict(("%s:%d" % (self.prefix, index), self.value(rnd))
+                                for index in range(start, min(start + 1000, count))),
+                           timeout=self.timeout(rnd))
+
+    def execute(self, cache, operation, rnd):
+        """
+        Run ``operation`` on ``cache``, and return its (hits, misses).
+        """
+        if operation == "get":
+            key = self.key(rnd)
+            if cache.get(key) is not None:
+                return 1, 0
+            if self.fill_misses:
+                cache.set(key, self.value(rnd), self.timeout(rnd))
+            return 0, 1
+
+        if operation == "get_many":
+            keys = set(self.key(rnd) for x in range(self.batch))
+            found = cache.get_many(keys)
+            if self.fill_misses and len(found) < len(keys):
+                cache.set_many(dict((key, self.value(rnd)) for key in keys if key not in found),
+                               self.timeout(rnd))
+            return len(found), len(keys) - len(found)
+
+        if operation == "set":
+            cache.set(self.key(rnd), self.value(rnd), self.timeout(rnd))
+        elif operation == "set_many":
+            cache.set_many(dict((self.key(rnd), self.value(rnd)) for x in range(self.batch)),
+                           self.timeout(rnd))
+        elif operation == "delete":
+            cache.delete(self.key(rnd))
+        return 0, 0
+
+
+def _new_stats():
+    return {"latencies": dict((operation, []) for operation in OPERATIONS),
+            "errors": dict((operation, 0) for operation in OPERATIONS),
+            "hits": 0, "misses": 0}
+
+
+def _merge_stats(stats, other):
+    for operation in OPERATIONS:
+        stats["latencies"][operation].extend(other["latencies"][operation])
+        stats["errors"][operation] += other["errors"][operation]
+    stats["hits"] += other["hits"]
+    stats["misses"] += other["misses"]
+
+
+def _worker(cache, workload, deadline, operations, seed, stats):
+    rnd = random.Random(seed)
+    latencies = stats["latencies"]
+    timer = time.time
+    count = 0
+    while (operations is None or count < operations) and \
+            (deadline is None or timer() < deadline):
+        operation = workload.operation(rnd)
+        count += 1
+        started = timer()
+        try:
+            hits, misses = workload.execute(cache, operation, rnd)
+        except Exception:
+            stats["errors"][operation] += 1
+        else:
+            latencies[operation].append(timer() - started)
+            stats["hits"] += hits
+            stats["misses"] += misses
+
+
+def _run_threads(alias, workload, duration, operations, threads, seed):
+    from . import get_cache
+
+    cache = get_cache(alias)
+    deadline = time.time() + duration if duration is not None else None
+    per_thread = [_new_stats() for x in range(threads)]
+    workers = []
+    for index in range(threads):
+        count = None
+        if operations is not None:
+            count = operations // threads + (1 if index < operations % threads else 0)
+        workers.append(threading.Thread(target=_worker,
+                                        args=(cache, workload, deadline, count,
+                                              seed + index, per_thread[index])))
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    stats = _new_stats()
+    for other in per_thread:
+        _merge_stats(stats, other)
+    return stats
+
+
+def _run_process(args):
+    # Connections opened by the parent must not be shared with it.
+    from .pool import reset_connection_pools
+    reset_connection_pools()
+    return _run_threads(*args)
+
+
+def _percentile(ordered, percentile):
+    # Nearest rank.
+    index = max(int(round(len(ordered) * percentile / 100.0 + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def run_load(alias, workload, duration=10, operations=None, threads=1, processes=1, seed=None):
+    """
+    Run ``workload`` against the cache ``alias`` with ``threads``
+    threads in each of ``processes`` processes, for ``duration`` seconds
+    or until ``operations`` operations are done, and return a report:
+    throughput, latency percentiles (in milliseconds) of each operation,
+    hits, misses and hit ratio of get and get_many, and error counts.
+    """
+    if seed is None:
+        seed = random.randrange(1 << 30)
+    if operations is not None:
+        duration = None
+
+    started = time.time()
+    if processes == 1:
+        stats = _run_threads(alias, workload, duration, operations, threads, seed)
+    else:
+        jobs = []
+        for index in range(processes):
+            count = None
+            if operations is not None:
+                count = operations // processes + (1 if index < operations % processes else 0)
+            jobs.append((alias, workload, duration, count, threads, seed + index * threads))
+
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_run_process, jobs)
+        finally:
+            pool.close()
+            pool.join()
+
+        stats = _new_stats()
+        for other in results:
+            _merge_stats(stats, other)
+    elapsed = time.time() - started
+
+    report = {}
+    total = 0
+    for operation in OPERATIONS:
+        latencies = sorted(stats["latencies"][operation])
+        errors = stats["errors"][operation]
+        if not latencies and not errors:
+            continue
+        total += len(latencies) + errors
+
+        summary = {"count": len(latencies), "errors": errors}
+        if latencies:
+            summary["mean"] = sum(latencies) / len(latencies) * 1000
+            summary["max"] = latencies[-1] * 1000
+            for percentile in PERCENTILES:
+                summary["p%s" % ("%g" % percentile).replace(".", "")] = \
+                    _percentile(latencies, percentile) * 1000
+        report[operation] = summary
+
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        "cache": alias,
+        "workload": workload.config,
+        "threads": threads,
+        "processes": processes,
+        "seed": seed,
+        "duration": elapsed,
+        "operations": total,
+        "throughput": total / elapsed if elapsed else 0,
+        "errors": sum(stats["errors"].values()),
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "hit_ratio": stats["hits"] / lookups if lookups else None,
+        "latency": report,
+    }
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from optparse import make_option
+
+# Types of the argparse options, as named by optparse.
+_OPTPARSE_TYPES = {int: "int", float: "float"}
+
+
+class _Recorder(object):
+    def __init__(self):
+        self.options = []
+
+    def add_argument(self, *args, **kwargs):
+        kwargs = dict(kwargs)
+        if "type" in kwargs:
+            kwargs["type"] = _OPTPARSE_TYPES[kwargs["type"]]
+        if "choices" in kwargs:
+            kwargs["type"] = "choice"
+        if kwargs.get("action") in ("store_true", "store_false"):
+            kwargs.setdefault("default", kwargs["action"] == "store_false")
+        self.options.append(make_option(*[str(arg) for arg in args], **kwargs))
+
+
+def optparse_options(add_arguments):
+    """
+    Return the options added by the ``add_arguments`` method of a command
+    as optparse options, for the ``option_list`` of Django < 1.8.
+    """
+    recorder = _Recorder()
+    add_arguments(None, recorder)
+    return tuple(recorder.options)
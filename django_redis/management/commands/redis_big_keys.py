@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+try:
+    from django.utils.encoding import smart_text
+except ImportError:
+    from django.utils.encoding import smart_unicode as smart_text
+
+from django.core.management.base import BaseCommand
+
+from ... import get_cache
+from ..base import optparse_options
+
+
+class Command(BaseCommand):
+    help = ("Sample the keys of a cache with SCAN and MEMORY USAGE, and show "
+            "the key prefixes using the most memory.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cache", default="default",
+                            help="Alias of the cache (default: default).")
+        parser.add_argument("--samples", type=int, default=10000,
+                            help="Number of keys to sample per server (default: 10000).")
+        parser.add_argument("--separator", default=":",
+                            help="Separator ending the key prefixes (default: ':').")
+        parser.add_argument("--count", type=int, default=20,
+                            help="Number of prefixes to show (default: 20).")
+
+    if not hasattr(BaseCommand, "add_arguments"):
+        # Django < 1.8 parses the options with optparse.
+        option_list = BaseCommand.option_list + optparse_options(add_arguments)
+
+    def handle(self, *args, **options):
+        cache = get_cache(options["cache"])
+        client = cache.client
+        separator = options["separator"]
+
+        if hasattr(client, "_serverdict"):
+            servers = list(client._serverdict.values())
+        else:
+            servers = [client.get_client(write=True)]
+
+        # prefix: [keys, bytes, biggest key, its size]
+        prefixes = {}
+        pattern = client.make_key("*")
+        for server in servers:
+            for index, key in enumerate(server.scan_iter(pattern)):
+                if index >= options["samples"]:
+                    break
+
+                size = server.execute_command("MEMORY", "USAGE", key)
+                if size is None:
+                    continue
+
+                key = client.reverse_key(smart_text(key))
+                prefix = key.split(separator, 1)[0] if separator in key else ""
+                stats = prefixes.setdefault(prefix, [0, 0, None, 0])
+                stats[0] += 1
+                stats[1] += size
+                if size > stats[3]:
+                    stats[2], stats[3] = key, size
+
+        if not prefixes:
+            self.stdout.write("No keys found.")
+            return
+
+        top = sorted(prefixes.items(), key=lambda item: item[1][1], reverse=True)
+        self.stdout.write("%12s %8s %12s  %s" % ("bytes", "keys", "biggest", "prefix"))
+        for prefix, (keys, size, biggest, biggest_size) in top[:options["count"]]:
+            self.stdout.write("%12d %8d %12d  %s (%s)" % (size, keys, biggest_size,
+                                                          prefix or "-", biggest))
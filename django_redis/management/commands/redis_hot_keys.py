@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import get_cache
+from ..base import optparse_options
+
+
+class Command(BaseCommand):
+    help = "Show the hottest keys of a cache, as published by its processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cache", default="default",
+                            help="Alias of the cache (default: default).")
+        parser.add_argument("--count", type=int, default=20,
+                            help="Number of keys to show (default: 20).")
+
+    if not hasattr(BaseCommand, "add_arguments"):
+        # Django < 1.8 parses the options with optparse.
+        option_list = BaseCommand.option_list + optparse_options(add_arguments)
+
+    def handle(self, *args, **options):
+        cache = get_cache(options["cache"])
+        if getattr(getattr(cache, "client", None), "_hot_keys", None) is None:
+            raise CommandError("HOT_KEYS_CLASS is not set for the cache '%s'." % options["cache"])
+
+        top = cache.published_hot_keys(options["count"])
+        if not top:
+            self.stdout.write("No hot keys published yet.")
+            return
+
+        width = max(len(str(count)) for key, count in top)
+        for key, count in top:
+            self.stdout.write("%*d  %s" % (width, count, key))
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import get_cache
+from ...loadgen import OPERATIONS, Workload, parse_mix, parse_range, run_load
+from ..base import optparse_options
+
+
+class Command(BaseCommand):
+    help = ("Run a load test against a cache, and report the throughput, the "
+            "latency percentiles and the hit ratio as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cache", default="default",
+                            help="Alias of the cache (default: default).")
+        parser.add_argument("--duration", type=float, default=10,
+                            help="Seconds to run for (default: 10).")
+        parser.add_argument("--operations", type=int, default=None,
+                            help="Number of operations to run, instead of --duration.")
+        parser.add_argument("--threads", type=int, default=1,
+                            help="Threads per process (default: 1).")
+        parser.add_argument("--processes", type=int, default=1,
+                            help="Processes (default: 1).")
+        parser.add_argument("--keys", type=int, default=10000,
+                            help="Number of distinct keys (default: 10000).")
+        parser.add_argument("--distribution", choices=("zipf", "uniform"), default="zipf",
+                            help="Distribution of the keys accessed (default: zipf).")
+        parser.add_argument("--zipf-exponent", type=float, default=0.99,
+                            help="Skew of the zipf distribution (default: 0.99).")
+        parser.add_argument("--mix", default="get=90,set=10",
+                            help="Weights of the operations, out of %s (default: "
+                                 "get=90,set=10)." % ", ".join(OPERATIONS))
+        parser.add_argument("--batch", type=int, default=10,
+                            help="Keys per get_many and set_many (default: 10).")
+        parser.add_argument("--value-size", default="100",
+                            help="Value size in bytes, or a MIN-MAX range (default: 100).")
+        parser.add_argument("--ttl", default=None,
+                            help="Timeout in seconds, or a MIN-MAX range (default: the "
+                                 "timeout of the cache).")
+        parser.add_argument("--prefix", default="loadgen",
+                            help="Prefix of the keys (default: loadgen).")
+        parser.add_argument("--preload", action="store_true",
+                            help="Set all the keys before starting.")
+        parser.add_argument("--fill-misses", action="store_true",
+                            help="Set the keys get and get_many miss, like a cache-aside "
+                                 "application.")
+        parser.add_argument("--cleanup", action="store_true",
+                            help="Delete the keys of the workload when done.")
+        parser.add_argument("--seed", type=int, default=None,
+                            help="Seed of the random generators, for repeatable runs.")
+        parser.add_argument("--output", default=None,
+                            help="File to write the report to (default: standard output).")
+
+    if not hasattr(BaseCommand, "add_arguments"):
+        # Django < 1.8 parses the options with optparse.
+        option_list = BaseCommand.option_list + optparse_options(add_arguments)
+
+    def handle(self, *args, **options):
+        if options["threads"] < 1 or options["processes"] < 1 or options["keys"] < 1:
+            raise CommandError("--threads, --processes and --keys must be positive.")
+
+        try:
+            workload = Workload(
+                keys=options["keys"],
+                distribution=options["distribution"],
+                zipf_exponent=options["zipf_exponent"],
+                mix=parse_mix(options["mix"]),
+                batch=options["batch"],
+                value_size=parse_range(options["value_size"]),
+                ttl=parse_range(options["ttl"]) if options["ttl"] is not None else None,
+                prefix=options["prefix"],
+                fill_misses=options["fill_misses"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        cache = get_cache(options["cache"])
+        if options["preload"]:
+            workload.preload(cache)
+
+        try:
+            report = run_load(options["cache"], workload, duration=options["duration"],
+                              operations=options["operations"], threads=options["threads"],
+                              processes=options["processes"], seed=options["seed"])
+        finally:
+            if options["cleanup"]:
+                cache.delete_pattern("%s:*" % options["prefix"])
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,788 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import hashlib
+import pickle
+import re
+import threading
+import time
+from collections import deque
+
+try:
+    from inspect import getfullargspec as getargspec
+except ImportError:
+    from inspect import getargspec
+
+from redis.connection import Connection
+from redis.exceptions import NoScriptError, ResponseError
+from redis.lock import LuaLock
+
+from .client.default import (COUNTER_SCRIPT, INCR_SCRIPT, INVALIDATE_TAGS_SCRIPT,
+                             SET_WITH_TAGS_SCRIPT)
+from .client.sharded import DELETE_UNCHANGED_SCRIPT
+from .pool import ConnectionFactory, ConnectionPool
+from .util import text_type
+
+OK = b"OK"
+
+WRONGTYPE = "WRONGTYPE Operation against a key holding the wrong kind of value"
+
+# Servers of the process, by (host, port) or ("unix", path).
+_servers = {}
+_servers_lock = threading.Lock()
+
+# Python implementations of lua scripts, by sha1 of their source.
+_scripts = {}
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, float):
+        return repr(value).encode("ascii")
+    return text_type(value).encode("utf-8")
+
+
+def _sha1(source):
+    return hashlib.sha1(_to_bytes(source)).hexdigest()
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ResponseError("value is not an integer or out of range")
+
+
+def _format_score(score):
+    return ("%d" % score if score == int(score) else repr(score)).encode("ascii")
+
+
+def _glob_to_regex(pattern):
+    """
+    Translate a redis glob pattern (``*``, ``?``, ``[...]``, ``[^...]``
+    and backslash escapes) into a compiled bytes regex.
+    """
+    result = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index:index + 1]
+        index += 1
+        if char == b"*":
+            result.append(b".*")
+        elif char == b"?":
+            result.append(b".")
+        elif char == b"\\" and index < len(pattern):
+            result.append(re.escape(pattern[index:index + 1]))
+            index += 1
+        elif char == b"[":
+            end = pattern.find(b"]", index + 1)
+            if end < 0:
+                result.append(re.escape(char))
+                continue
+            group = pattern[index:end]
+            index = end + 1
+            if group.startswith(b"^"):
+                group = b"^" + group[1:].replace(b"\\", b"\\\\")
+            else:
+                group = group.replace(b"\\", b"\\\\")
+            result.append(b"[" + group + b"]")
+        else:
+            result.append(re.escape(char))
+    return re.compile(b"".join(result) + b"\\Z", re.DOTALL)
+
+
+def register_script(source, function):
+    """
+    Run ``function(call, keys, args)`` instead of the lua script
+    ``source``. ``call(*args)`` runs a command, like ``redis.call``;
+    keys and args are bytes, and the function returns what the script
+    would: an integer, bytes, a list, or None for nil and false.
+    """
+    _scripts[_sha1(source)] = function
+
+
+class _Database(object):
+    def __init__(self, index):
+        self.index = index
+        self.data = {}
+        # Expiration times, in seconds since the epoch.
+        self.expires = {}
+
+    def get(self, key, now=None):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= (now or time.time()):
+            self.delete(key)
+        return self.data.get(key)
+
+    def delete(self, key):
+        self.expires.pop(key, None)
+        return self.data.pop(key, None) is not None
+
+    def purge(self):
+        now = time.time()
+        for key, deadline in list(self.expires.items()):
+            if deadline <= now:
+                self.delete(key)
+
+    def set(self, key, value, deadline=None, keep_ttl=False):
+        self.data[key] = value
+        if deadline is not None:
+            self.expires[key] = deadline
+        elif not keep_ttl:
+            self.expires.pop(key, None)
+
+
+class InMemoryServer(object):
+    """
+    A redis server living in the memory of the process, running the
+    commands the clients use: strings, counters, sets, sorted sets, key
+    expiration, SCAN, transactions, and the lua scripts registered with
+    ``register_script`` (the ones of django-redis and of the redis-py
+    locks are). Other commands fail like unknown commands. Commands are
+    atomic, and expired keys are deleted lazily, when read.
+    """
+
+    def __init__(self, address=None):
+        self.address = address
+        self.lock = threading.RLock()
+        self.databases = {}
+        self.scripts = set()
+        self.commands = 0
+
+        # Command name: (method, least and most arguments, None for any).
+        self._commands = {}
+        for name in dir(self):
+            if name.startswith("command_"):
+                spec = getargspec(getattr(type(self), name))
+                # Not counting self and db.
+                arguments = len(spec.args) - 2
+                most = None if spec.varargs else arguments
+                self._commands[name[8:].upper().encode("ascii")] = (
+                    getattr(self, name), arguments - len(spec.defaults or ()), most)
+
+    def database(self, index):
+        database = self.databases.get(index)
+        if database is None:
+            database = self.databases[index] = _Database(index)
+        return database
+
+    def execute(self, db, args):
+        """
+        Run a command in the database ``db``, and return its reply,
+        or the ResponseError it failed with.
+        """
+        with self.lock:
+            try:
+                return self.call(db, args)
+            except ResponseError as e:
+                return e
+
+    def call(self, db, args):
+        args = [_to_bytes(arg) for arg in args]
+        command = self._commands.get(args[0].upper())
+        if command is None:
+            raise ResponseError("unknown command '%s'" % args[0].decode("utf-8", "replace"))
+
+        method, least, most = command
+        if len(args) - 1 < least or (most is not None and len(args) - 1 > most):
+            raise ResponseError("wrong number of arguments for '%s' command"
+                                % args[0].decode("utf-8", "replace").lower())
+
+        self.commands += 1
+        return method(self.database(db), *args[1:])
+
+    def _get(self, db, key, kind):
+        value = db.get(key)
+        if value is not None and not isinstance(value, kind):
+            raise ResponseError(WRONGTYPE)
+        return value
+
+    # Server
+
+    def command_ping(self, db, message=None):
+        return b"PONG" if message is None else message
+
+    def command_echo(self, db, message):
+        return message
+
+    def command_wait(self, db, replicas, timeout):
+        return 0
+
+    def command_dbsize(self, db):
+        db.purge()
+        return len(db.data)
+
+    def command_flushdb(self, db, *options):
+        db.data.clear()
+        db.expires.clear()
+        return OK
+
+    def command_flushall(self, db, *options):
+        self.databases.clear()
+        return OK
+
+    def command_info(self, db, *sections):
+        lines = ["# Server", "redis_version:6.2.0", "redis_mode:standalone",
+                 "# Memory", "used_memory:%d" % sum(self._memory_usage(database, key)
+                                                    for database in self.databases.values()
+                                                    for key in database.data),
+                 "# Stats", "total_commands_processed:%d" % self.commands,
+                 "# Keyspace"]
+        for index, database in sorted(self.databases.items()):
+            database.purge()
+            if database.data:
+                lines.append("db%d:keys=%d,expires=%d,avg_ttl=0" % (index, len(database.data),
+                                                                     len(database.expires)))
+        return "\r\n".join(lines).encode("ascii")
+
+    def command_memory(self, db, subcommand, key=None, *options):
+        if subcommand.upper() != b"USAGE" or key is None:
+            raise ResponseError("unknown subcommand '%s'" % subcommand.decode("utf-8"))
+        if db.get(key) is None:
+            return None
+        return self._memory_usage(db, key)
+
+    def _memory_usage(self, db, key):
+        value = db.data.get(key)
+        if isinstance(value, bytes):
+            size = len(value)
+        elif isinstance(value, dict):
+            size = sum(len(member) + 16 for member in value)
+        else:
+            size = sum(len(member) + 8 for member in value or ())
+        return len(key) + size + 48
+
+    # Keys
+
+    def command_del(self, db, *keys):
+        return sum(1 for key in keys if db.get(key) is not None and db.delete(key))
+
+    command_unlink = command_del
+
+    def command_exists(self, db, *keys):
+        return sum(1 for key in keys if db.get(key) is not None)
+
+    def command_type(self, db, key):
+        value = db.get(key)
+        if value is None:
+            return b"none"
+        if isinstance(value, bytes):
+            return b"string"
+        return b"zset" if isinstance(value, dict) else b"set"
+
+    def command_keys(self, db, pattern):
+        db.purge()
+        regex = _glob_to_regex(pattern)
+        return [key for key in db.data if regex.match(key)]
+
+    def command_scan(self, db, cursor, *options):
+        # All the keys are returned at once, which SCAN allows: keys
+        # deleted while iterating can not make it skip any.
+        pattern = b"*"
+        options = list(options)
+        while options:
+            option = options.pop(0).upper()
+            if option == b"MATCH":
+                pattern = options.pop(0)
+            elif option == b"COUNT":
+                options.pop(0)
+            else:
+                raise ResponseError("syntax error")
+        return [b"0", self.command_keys(db, pattern)]
+
+    def command_rename(self, db, key, new_key):
+        value = db.get(key)
+        if value is None:
+            raise ResponseError("no such key")
+        deadline = db.expires.get(key)
+        db.delete(key)
+        db.set(new_key, value, deadline)
+        return OK
+
+    def command_renamenx(self, db, key, new_key):
+        if db.get(new_key) is not None:
+            if db.get(key) is None:
+                raise ResponseError("no such key")
+            return 0
+        self.command_rename(db, key, new_key)
+        return 1
+
+    def command_dump(self, db, key):
+        value = db.get(key)
+        if value is None:
+            return None
+        return b"memory:" + pickle.dumps(value, 2)
+
+    def command_restore(self, db, key, ttl, payload, *options):
+        if not payload.startswith(b"memory:"):
+            raise ResponseError("DUMP payload version or checksum are wrong")
+        if db.get(key) is not None and b"REPLACE" not in [option.upper() for option in options]:
+            raise ResponseError("BUSYKEY Target key name already exists.")
+        ttl = _int(ttl)
+        db.set(key, pickle.loads(payload[7:]), time.time() + ttl / 1000.0 if ttl else None)
+        return OK
+
+    # Expiration
+
+    def _expire_at(self, db, key, deadline):
+        if db.get(key) is None:
+            return 0
+        if deadline <= time.time():
+            db.delete(key)
+        else:
+            db.expires[key] = deadline
+        return 1
+
+    def command_expire(self, db, key, seconds):
+        return self._expire_at(db, key, time.time() + _int(seconds))
+
+    def command_pexpire(self, db, key, milliseconds):
+        return self._expire_at(db, key, time.time() + _int(milliseconds) / 1000.0)
+
+    def command_expireat(self, db, key, timestamp):
+        return self._expire_at(db, key, _int(timestamp))
+
+    def command_pexpireat(self, db, key, timestamp):
+        return self._expire_at(db, key, _int(timestamp) / 1000.0)
+
+    def command_persist(self, db, key):
+        if db.get(key) is None:
+            return 0
+        return 1 if db.expires.pop(key, None) is not None else 0
+
+    def command_pttl(self, db, key):
+        if db.get(key) is None:
+            return -2
+        deadline = db.expires.get(key)
+        if deadline is None:
+            return -1
+        return max(int(round((deadline - time.time()) * 1000)), 0)
+
+    def command_ttl(self, db, key):
+        ttl = self.command_pttl(db, key)
+        return ttl if ttl < 0 else int((ttl + 500) / 1000)
+
+    # Strings
+
+    def command_get(self, db, key):
+        return self._get(db, key, bytes)
+
+    def command_set(self, db, key, value, *options):
+        deadline = None
+        nx = xx = keep_ttl = get = False
+        options = list(options)
+        while options:
+            option = options.pop(0).upper()
+            if option in (b"EX", b"PX") and options:
+                amount = _int(options.pop(0))
+                if amount <= 0:
+                    raise ResponseError("invalid expire time in set")
+                deadline = time.time() + (amount if option == b"EX" else amount / 1000.0)
+            elif option == b"NX":
+                nx = True
+            elif option == b"XX":
+                xx = True
+            elif option == b"KEEPTTL":
+                keep_ttl = True
+            elif option == b"GET":
+                get = True
+            else:
+                raise ResponseError("syntax error")
+
+        previous = self._get(db, key, bytes) if get else db.get(key)
+        if (nx and previous is not None) or (xx and previous is None):
+            return previous if get else None
+        db.set(key, value, deadline, keep_ttl)
+        return previous if get else OK
+
+    def command_setex(self, db, key, seconds, value):
+        return self.command_set(db, key, value, b"EX", seconds)
+
+    def command_psetex(self, db, key, milliseconds, value):
+        return self.command_set(db, key, value, b"PX", milliseconds)
+
+    def command_setnx(self, db, key, value):
+        return 1 if self.command_set(db, key, value, b"NX") else 0
+
+    def command_getset(self, db, key, value):
+        return self.command_set(db, key, value, b"GET")
+
+    def command_mget(self, db, *keys):
+        return [value if isinstance(value, bytes) else None
+                for value in (db.get(key) for key in keys)]
+
+    def command_mset(self, db, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise ResponseError("wrong number of arguments for 'mset' command")
+        for index in range(0, len(pairs), 2):
+            db.set(pairs[index], pairs[index + 1])
+        return OK
+
+    def command_msetnx(self, db, *pairs):
+        if any(db.get(pairs[index]) is not None for index in range(0, len(pairs), 2)):
+            return 0
+        self.command_mset(db, *pairs)
+        return 1
+
+    def command_strlen(self, db, key):
+        return len(self._get(db, key, bytes) or b"")
+
+    def command_append(self, db, key, value):
+        value = (self._get(db, key, bytes) or b"") + value
+        db.set(key, value, keep_ttl=True)
+        return len(value)
+
+    def command_incrby(self, db, key, amount):
+        value = _int(self._get(db, key, bytes) or 0) + _int(amount)
+        db.set(key, _to_bytes(value), keep_ttl=True)
+        return value
+
+    def command_incr(self, db, key):
+        return self.command_incrby(db, key, 1)
+
+    def command_decrby(self, db, key, amount):
+        return self.command_incrby(db, key, -_int(amount))
+
+    def command_decr(self, db, key):
+        return self.command_incrby(db, key, -1)
+
+    # Sets
+
+    def command_sadd(self, db, key, *members):
+        value = self._get(db, key, set)
+        if value is None:
+            value = set()
+            db.set(key, value)
+        count = len(value)
+        value.update(members)
+        return len(value) - count
+
+    def command_srem(self, db, key, *members):
+        value = self._get(db, key, set) or set()
+        count = len(value)
+        value.difference_update(members)
+        if not value:
+            db.delete(key)
+        return count - len(value)
+
+    def command_smembers(self, db, key):
+        return list(self._get(db, key, set) or ())
+
+    def command_scard(self, db, key):
+        return len(self._get(db, key, set) or ())
+
+    def command_sismember(self, db, key, member):
+        return 1 if member in (self._get(db, key, set) or ()) else 0
+
+    # Sorted sets
+
+    def command_zadd(self, db, key, *args):
+        args = list(args)
+        if len(args) % 2 or not args:
+            raise ResponseError("syntax error")
+        value = self._get(db, key, dict)
+        if value is None:
+            value = {}
+            db.set(key, value)
+        count = len(value)
+        for index in range(0, len(args), 2):
+            try:
+                value[args[index + 1]] = float(args[index])
+            except ValueError:
+                raise ResponseError("value is not a valid float")
+        return len(value) - count
+
+    def command_zincrby(self, db, key, amount, member):
+        value = self._get(db, key, dict)
+        if value is None:
+            value = {}
+            db.set(key, value)
+        value[member] = value.get(member, 0.0) + float(amount)
+        return _format_score(value[member])
+
+    def command_zrem(self, db, key, *members):
+        value = self._get(db, key, dict) or {}
+        count = sum(1 for member in members if value.pop(member, None) is not None)
+        if not value:
+            db.delete(key)
+        return count
+
+    def command_zscore(self, db, key, member):
+        score = (self._get(db, key, dict) or {}).get(member)
+        return None if score is None else _format_score(score)
+
+    def command_zcard(self, db, key):
+        return len(self._get(db, key, dict) or ())
+
+    def _zrange(self, db, key, start, stop, options, reverse):
+        value = self._get(db, key, dict) or {}
+        members = sorted(value.items(), key=lambda item: (item[1], item[0]), reverse=reverse)
+        start, stop = _int(start), _int(stop)
+        if start < 0:
+            start = max(len(members) + start, 0)
+        if stop < 0:
+            stop += len(members)
+        members = members[start:stop + 1]
+
+        if b"WITHSCORES" not in [option.upper() for option in options]:
+            return [member for member, score in members]
+        return [item for member, score in members for item in (member, _format_score(score))]
+
+    def command_zrange(self, db, key, start, stop, *options):
+        return self._zrange(db, key, start, stop, options, False)
+
+    def command_zrevrange(self, db, key, start, stop, *options):
+        return self._zrange(db, key, start, stop, options, True)
+
+    # Scripts
+
+    def command_script(self, db, subcommand, *args):
+        subcommand = subcommand.upper()
+        if subcommand == b"LOAD" and len(args) == 1:
+            sha = _sha1(args[0])
+            if sha not in _scripts:
+                raise ResponseError("the in-memory server can not run this lua script; "
+                                    "see django_redis.memory.register_script")
+            self.scripts.add(sha)
+            return sha.encode("ascii")
+        if subcommand == b"EXISTS":
+            return [1 if sha.decode("ascii").lower() in self.scripts else 0 for sha in args]
+        if subcommand == b"FLUSH":
+            self.scripts.clear()
+            return OK
+        raise ResponseError("unknown subcommand '%s'" % subcommand.decode("utf-8"))
+
+    def command_eval(self, db, source, numkeys, *args):
+        sha = self.command_script(db, b"LOAD", source)
+        return self.command_evalsha(db, sha, numkeys, *args)
+
+    def command_evalsha(self, db, sha, numkeys, *args):
+        sha = sha.decode("ascii").lower()
+        if sha not in self.scripts:
+            raise NoScriptError("No matching script. Please use EVAL.")
+
+        numkeys = _int(numkeys)
+        result = _scripts[sha](lambda *args: self.call(db.index, args),
+                               list(args[:numkeys]), list(args[numkeys:]))
+        if result is True:
+            return 1
+        return None if result is False else result
+
+
+def get_server(address):
+    """
+    Return the in-memory server of ``address``, starting it if needed.
+    """
+    server = _servers.get(address)
+    if server is None:
+        with _servers_lock:
+            server = _servers.get(address)
+            if server is None:
+                server = _servers[address] = InMemoryServer(address)
+    return server
+
+
+def flush_all():
+    """
+    Drop the data of all the in-memory servers of the process.
+    """
+    for server in list(_servers.values()):
+        with server.lock:
+            server.databases.clear()
+
+
+class InMemoryConnection(Connection):
+    """
+    Connection to the InMemoryServer of its host and port (or unix
+    socket path): commands run in the calling thread when sent, and
+    their replies are queued until read, so pipelines work unchanged.
+    """
+
+    description_format = "InMemoryConnection<host=%(host)s,port=%(port)s,db=%(db)s>"
+
+    def __init__(self, path=None, **kwargs):
+        super(InMemoryConnection, self).__init__(**kwargs)
+        self.path = path
+        self.server = None
+        self._selected = self.db
+        self._replies = deque()
+        self._transaction = None
+
+    def connect(self):
+        if self.server is None:
+            address = ("unix", self.path) if self.path else (self.host, self.port)
+            self.server = get_server(address)
+            self._selected = int(self.db or 0)
+
+    def disconnect(self):
+        self.server = None
+        self._replies.clear()
+        self._transaction = None
+
+    def can_read(self, timeout=0):
+        return bool(self._replies)
+
+    def pack_command(self, *args):
+        return [args]
+
+    def pack_commands(self, commands):
+        return [tuple(args) for args in commands]
+
+    def send_packed_command(self, commands):
+        self.connect()
+        for args in commands:
+            self._replies.append(self._execute(args))
+
+    def _execute(self, args):
+        if isinstance(args[0], (bytes, text_type)) and b" " in _to_bytes(args[0]):
+            args = tuple(_to_bytes(args[0]).split()) + tuple(args[1:])
+        args = [self.encoder.encode(arg) for arg in args]
+        command = args[0].upper()
+
+        if command == b"MULTI":
+            if self._transaction is not None:
+                return ResponseError("MULTI calls can not be nested")
+            self._transaction = []
+            return OK
+        if command == b"DISCARD":
+            self._transaction = None
+            return OK
+        if command == b"EXEC":
+            if self._transaction is None:
+                return ResponseError("EXEC without MULTI")
+            commands, self._transaction = self._transaction, None
+            with self.server.lock:
+                return [self.server.execute(self._selected, queued) for queued in commands]
+        if self._transaction is not None:
+            self._transaction.append(args)
+            return b"QUEUED"
+
+        if command == b"SELECT":
+            self._selected = int(args[1])
+            return OK
+        return self.server.execute(self._selected, args)
+
+    def read_response(self):
+        reply = self._replies.popleft()
+        if isinstance(reply, ResponseError):
+            raise reply
+        return reply
+
+
+class InMemoryConnectionPool(ConnectionPool):
+    """
+    Connection pool of InMemoryConnection, for CONNECTION_POOL_CLASS.
+    """
+
+    def __init__(self, connection_class=None, **connection_kwargs):
+        super(InMemoryConnectionPool, self).__init__(connection_class=InMemoryConnection,
+                                                     **connection_kwargs)
+
+
+class InMemoryConnectionFactory(ConnectionFactory):
+    """
+    Connection factory using InMemoryConnection in the pools of every
+    class (see CONNECTION_POOL_CLASS), for CONNECTION_FACTORY or
+    DJANGO_REDIS_CONNECTION_FACTORY.
+    """
+
+    def get_connection_pool(self, params):
+        connection_pool = super(InMemoryConnectionFactory, self).get_connection_pool(params)
+        connection_pool.connection_class = InMemoryConnection
+        return connection_pool
+
+
+def _set_with_tags(call, keys, args):
+    ttl = int(args[1])
+    command = ["SET", keys[0], args[0]]
+    if ttl >= 0:
+        command.extend(["EX", args[1]])
+    if args[2]:
+        command.append(args[2])
+    if call(*command) is None:
+        return False
+
+    for tag in keys[1:]:
+        existed = call("EXISTS", tag)
+        call("SADD", tag, keys[0])
+        if ttl < 0:
+            call("PERSIST", tag)
+        else:
+            current = call("TTL", tag)
+            if existed == 0 or 0 <= current < ttl:
+                call("EXPIRE", tag, ttl)
+    return True
+
+
+def _invalidate_tags(call, keys, args):
+    count = 0
+    removed = []
+    for tag in keys:
+        members = call("SMEMBERS", tag)
+        if members:
+            count += call("DEL", *members)
+            removed.extend(members)
+        call("DEL", tag)
+    return [count, removed]
+
+
+def _incr(call, keys, args):
+    if call("EXISTS", keys[0]) == 1:
+        return call("INCRBY", keys[0], args[0])
+    return None
+
+
+def _counter(call, keys, args):
+    ttl = int(args[1])
+    existed = call("EXISTS", keys[0])
+    value = call("INCRBY", keys[0], args[0])
+    if ttl == 0:
+        call("DEL", keys[0])
+    elif existed == 0 and ttl > 0:
+        call("EXPIRE", keys[0], ttl)
+    return value
+
+
+def _delete_unchanged(call, keys, args):
+    count = 0
+    for key, dumped in zip(keys, args):
+        if call("DUMP", key) == dumped:
+            count += call("DEL", key)
+    return count
+
+
+def _lock_acquire(call, keys, args):
+    if call("SETNX", keys[0], args[0]) == 1:
+        if args[1] != b"":
+            call("PEXPIRE", keys[0], args[1])
+        return 1
+    return 0
+
+
+def _lock_release(call, keys, args):
+    if call("GET", keys[0]) != args[0]:
+        return 0
+    call("DEL", keys[0])
+    return 1
+
+
+def _lock_extend(call, keys, args):
+    if call("GET", keys[0]) != args[0]:
+        return 0
+    expiration = call("PTTL", keys[0])
+    if expiration < 0:
+        return 0
+    call("PEXPIRE", keys[0], expiration + int(args[1]))
+    return 1
+
+
+register_script(SET_WITH_TAGS_SCRIPT, _set_with_tags)
+register_script(INVALIDATE_TAGS_SCRIPT, _invalidate_tags)
+register_script(INCR_SCRIPT, _incr)
+register_script(COUNTER_SCRIPT, _counter)
+register_script(DELETE_UNCHANGED_SCRIPT, _delete_unchanged)
+register_script(LuaLock.LUA_ACQUIRE_SCRIPT, _lock_acquire)
+register_script(LuaLock.LUA_RELEASE_SCRIPT, _lock_release)
+register_script(LuaLock.LUA_EXTEND_SCRIPT, _lock_extend)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+try:
+    from django.core.cache.backends.base import DEFAULT_TIMEOUT
+except ImportError:
+    DEFAULT_TIMEOUT = object()
+
+from .cache import omit_exception
+from .client.default import _main_exceptions
+from .deferred import DeferredValue
+from .exceptions import ConnectionInterrupted
+
+
+class CachePipeline(object):
+    """
+    Buffer cache operations and run them in a single round trip.
+
+    Every operation returns a DeferredValue. Commands are sent when the
+    ``with`` block exits, when ``execute`` is called, or when the value
+    of one of them is accessed. Decoded results are also collected, in
+    call order, in ``results``.
+
+    With ``transaction=True`` every execution is wrapped in MULTI/EXEC.
+    """
+
+    def __init__(self, backend, transaction=False):
+        self._client = backend.client
+        self._ignore_exceptions = backend._ignore_exceptions
+        self._metrics = backend._metrics
+        self._profiler = backend._profiler
+        self._transaction = transaction
+        self._redis = self._client.get_client(write=True)
+        self._pipeline = None
+        self._pending = []
+        self.results = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+        else:
+            self.reset()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _queue(self, key, callback, queue, default=None):
+        if self._pipeline is None:
+            self._pipeline = self._redis.pipeline(transaction=self._transaction)
+
+        start = len(self._pipeline.command_stack)
+        queue(self._pipeline)
+        stop = len(self._pipeline.command_stack)
+
+        deferred = DeferredValue(self, key, default=default)
+        self._pending.append((deferred, start, stop, callback))
+        return deferred
+
+    def get(self, key, default=None, version=None, namespace=None):
+        nkey = self._client.make_key(key, version=version, namespace=namespace)
+        return self._queue(key, lambda replies: self._client._get_result(replies[0], default),
+                           lambda pipeline: pipeline.get(nkey), default=default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, nx=False, xx=False,
+            tags=None, namespace=None, jitter=None):
+        return self._queue(key, lambda replies: replies[0],
+                           lambda pipeline: self._client.set(key, value, timeout, version=version,
+                                                             client=pipeline, nx=nx, xx=xx,
+                                                             tags=tags, namespace=namespace,
+                                                             jitter=jitter))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, namespace=None,
+            jitter=None):
+        return self._queue(key, lambda replies: bool(replies[0]),
+                           lambda pipeline: self._client.add(key, value, timeout, version=version,
+                                                             client=pipeline, namespace=namespace,
+                                                             jitter=jitter))
+
+    def delete(self, key, version=None, namespace=None):
+        return self._queue(key, lambda replies: replies[0],
+                           lambda pipeline: self._client.delete(key, version=version,
+                                                                client=pipeline,
+                                                                namespace=namespace))
+
+    def _incr_result(self, key, replies):
+        if replies[0] is None:
+            raise ValueError("Key '%s' not found" % key)
+        return replies[0]
+
+    def incr(self, key, delta=1, version=None, namespace=None):
+        return self._queue(key, lambda replies: self._incr_result(key, replies),
+                           lambda pipeline: self._client.incr(key, delta, version=version,
+                                                              client=pipeline,
+                                                              namespace=namespace))
+
+    def decr(self, key, delta=1, version=None, namespace=None):
+        return self._queue(key, lambda replies: self._incr_result(key, replies),
+                           lambda pipeline: self._client.decr(key, delta, version=version,
+                                                              client=pipeline,
+                                                              namespace=namespace))
+
+    def expire(self, key, timeout, version=None):
+        return self._queue(key, lambda replies: bool(replies[-1]),
+                           lambda pipeline: self._client.expire(key, timeout, version=version,
+                                                                client=pipeline))
+
+    def wait(self, num_replicas, timeout):
+        """
+        Block until the writes queued so far are acknowledged by
+        ``num_replicas`` replicas, or ``timeout`` milliseconds pass.
+        Resolves to the number of replicas that acknowledged them.
+        """
+        return self._queue(None, lambda replies: replies[0],
+                           lambda pipeline: pipeline.execute_command("WAIT", num_replicas, timeout))
+
+    def reset(self):
+        """
+        Discard all queued operations.
+        """
+        if self._pipeline is not None:
+            self._pipeline.reset()
+        self._pipeline = None
+        self._pending = []
+
+    def flush(self):
+        self.execute()
+
+    @omit_exception(return_value=[])
+    def execute(self):
+        """
+        Send all queued operations and return their results.
+        """
+        pipeline, pending = self._pipeline, self._pending
+        self._pipeline, self._pending = None, []
+
+        if not pending:
+            return []
+
+        try:
+            replies = pipeline.execute(raise_on_error=False)
+        except _main_exceptions as e:
+            for deferred, _, _, _ in pending:
+                if self._ignore_exceptions:
+                    deferred.resolve(deferred.default)
+                    self.results.append(deferred.default)
+                else:
+                    deferred.fail(e)
+            raise ConnectionInterrupted(connection=self._redis, parent=e)
+        finally:
+            # The writes queued on the pipeline are done.
+            self._client._after_write(*[deferred.key for deferred, _, _, _ in pending
+                                        if deferred.key is not None])
+
+        results = []
+        for deferred, start, stop, callback in pending:
+            command_replies = replies[start:stop]
+            errors = [r for r in command_replies if isinstance(r, Exception)]
+
+            if errors:
+                deferred.fail(errors[0])
+                results.append(errors[0])
+                continue
+
+            try:
+                value = callback(command_replies)
+            except ValueError as e:
+                deferred.fail(e)
+                results.append(e)
+                continue
+
+            deferred.resolve(value)
+            results.append(value)
+
+        self.results.extend(results)
+        return results
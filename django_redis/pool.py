@@ -1,15 +1,136 @@
 import re
+import threading
+import time
 import warnings
 
+try:
+    from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
+except ImportError:
+    from urllib import urlencode
+    from urlparse import parse_qs, urlparse, urlunparse
+
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 
+import redis
+import redis.sentinel
 from redis import StrictRedis
 from redis.connection import DefaultParser
+from redis.exceptions import ConnectionError
+from redis.sentinel import Sentinel, SentinelManagedConnection
 
 from . import util
 
 
+class ConnectionPoolStatsMixin(object):
+    """
+    Count the connections of a pool and the time spent waiting for them.
+    """
+
+    def reset(self):
+        super(ConnectionPoolStatsMixin, self).reset()
+        self._stats_lock = threading.Lock()
+        self.created_connections = 0
+        self.in_use_connections = 0
+        self.waits = 0
+        self.wait_time = 0
+        self.max_wait_time = 0
+
+    def make_connection(self):
+        connection = super(ConnectionPoolStatsMixin, self).make_connection()
+        with self._stats_lock:
+            self.created_connections += 1
+        return connection
+
+    def get_connection(self, command_name, *keys, **options):
+        started = time.time()
+        try:
+            connection = super(ConnectionPoolStatsMixin, self).get_connection(
+                command_name, *keys, **options)
+        finally:
+            elapsed = time.time() - started
+            with self._stats_lock:
+                self.waits += 1
+                self.wait_time += elapsed
+                self.max_wait_time = max(self.max_wait_time, elapsed)
+
+        with self._stats_lock:
+            self.in_use_connections += 1
+        return connection
+
+    def release(self, connection):
+        if connection.pid == self.pid:
+            with self._stats_lock:
+                self.in_use_connections -= 1
+        super(ConnectionPoolStatsMixin, self).release(connection)
+
+    def stats(self):
+        return {
+            "created": self.created_connections,
+            "in_use": self.in_use_connections,
+            "idle": self.created_connections - self.in_use_connections,
+            "waits": self.waits,
+            "wait_time": self.wait_time,
+            "max_wait_time": self.max_wait_time,
+        }
+
+
+class ConnectionPool(ConnectionPoolStatsMixin, redis.ConnectionPool):
+    """
+    Plain redis pool keeping the counters of ConnectionPoolStatsMixin.
+    """
+
+
+class BlockingConnectionPool(ConnectionPoolStatsMixin, redis.BlockingConnectionPool):
+    """
+    Pool holding at most ``max_connections`` connections; getting one
+    waits up to ``timeout`` seconds for another to be released.
+    """
+
+
+class SentinelConnectionPool(ConnectionPoolStatsMixin, redis.sentinel.SentinelConnectionPool):
+    pass
+
+
+def warm_up_connection_pool(connection_pool, count):
+    """
+    Open connections until the pool holds ``count`` of them.
+    """
+    connections = []
+    try:
+        for x in range(min(count, connection_pool.max_connections)):
+            connection = connection_pool.get_connection("PING")
+            connections.append(connection)
+            connection.connect()
+    finally:
+        for connection in connections:
+            connection_pool.release(connection)
+
+
+def reset_connection_pools():
+    """
+    Drop the connections inherited from the parent process, without
+    shutting them down, so they keep working in the parent. Call it
+    from a post-fork hook (like gunicorn's ``post_fork``) when caches
+    were used before forking.
+    """
+    for connection_pool in ConnectionFactory._pools.values():
+        connections = (getattr(connection_pool, "_available_connections", []) +
+                       list(getattr(connection_pool, "_in_use_connections", [])) +
+                       getattr(connection_pool, "_connections", []))
+
+        auto_pipeline = getattr(connection_pool, "_auto_pipeline", None)
+        if auto_pipeline is not None:
+            connections.append(auto_pipeline.connection)
+
+        for connection in connections:
+            sock, connection._sock = connection._sock, None
+            if sock is not None:
+                sock.close()
+
+        connection_pool.reset()
+
+
 class ConnectionFactory(object):
 
     # Store connection pool by cache backend options.
@@ -18,6 +139,9 @@ class ConnectionFactory(object):
     # as Django creates new cache client (DefaultClient) instance for every request.
     _pools = {}
 
+    # Circuit breakers by connection url, process-global like _pools.
+    _circuit_breakers = {}
+
     oldparams_rx = re.compile("^(?:[^:]+:\d{1,5}:\d+|unix:[\w/\-\.]+:\d+)$", flags=re.I)
 
     def __init__(self, options):
@@ -27,6 +151,10 @@ class ConnectionFactory(object):
         self.pool_cls_kwargs = options.get("CONNECTION_POOL_KWARGS", {})
         self.options = options
 
+        breaker_cls_path = options.get("CIRCUIT_BREAKER_CLASS", None)
+        self.breaker_cls = breaker_cls_path and util.load_class(breaker_cls_path)
+        self.breaker_cls_kwargs = options.get("CIRCUIT_BREAKER_KWARGS", {})
+
     def adapt_old_url_format(self, url):
         warnings.warn("Using deprecated connection string format.", DeprecationWarning)
 
@@ -100,7 +228,41 @@ class ConnectionFactory(object):
         for create new connection.
         """
         pool = self.get_or_create_connection_pool(params)
-        return StrictRedis(connection_pool=pool)
+        client = StrictRedis(connection_pool=pool)
+
+        breaker = self.get_circuit_breaker(params)
+        if breaker is not None:
+            client = breaker.instrument(client)
+        return client
+
+    def get_circuit_breaker(self, params):
+        """
+        Given a connection parameters, return the shared circuit
+        breaker for them, or None if CIRCUIT_BREAKER_CLASS is not set.
+        """
+        if not self.breaker_cls:
+            return None
+
+        key = params["url"]
+        if key not in self._circuit_breakers:
+            self._circuit_breakers[key] = self.breaker_cls(key, **self.breaker_cls_kwargs)
+        return self._circuit_breakers[key]
+
+    def circuit_breaker_stats(self):
+        """
+        Return the state and the counters of every circuit
+        breaker of the process, by connection url.
+        """
+        return dict((url, breaker.stats()) for url, breaker in self._circuit_breakers.items())
+
+    def connection_pool_stats(self):
+        """
+        Return the counters of every connection pool of the
+        process that keeps them, by connection url.
+        """
+        return dict((url, connection_pool.stats())
+                    for url, connection_pool in self._pools.items()
+                    if hasattr(connection_pool, "stats"))
 
     def get_parser_cls(self):
         cls = self.options.get("PARSER_CLASS", None)
@@ -134,10 +296,134 @@ class ConnectionFactory(object):
         return self.pool_cls.from_url(**cp_params)
 
 
+class CachedSentinel(Sentinel):
+    """
+    Sentinel manager that caches the discovered master and replicas
+    of every service for ``topology_timeout`` seconds, instead of
+    asking the sentinels on every new connection. ``reset`` drops the
+    cached topology of a service.
+    """
+
+    def __init__(self, sentinels, topology_timeout=5, **kwargs):
+        super(CachedSentinel, self).__init__(sentinels, **kwargs)
+        self.topology_timeout = topology_timeout
+        self._masters = {}
+        self._slaves = {}
+
+    def _cached(self, cache, service_name, discover):
+        entry = cache.get(service_name)
+        if entry is not None and entry[1] > time.time():
+            return entry[0]
+
+        value = discover(service_name)
+        cache[service_name] = (value, time.time() + self.topology_timeout)
+        return value
+
+    def discover_master(self, service_name):
+        return self._cached(self._masters, service_name,
+                            super(CachedSentinel, self).discover_master)
+
+    def discover_slaves(self, service_name):
+        return self._cached(self._slaves, service_name,
+                            super(CachedSentinel, self).discover_slaves)
+
+    def reset(self, service_name):
+        self._masters.pop(service_name, None)
+        self._slaves.pop(service_name, None)
+
+
+class SentinelConnection(SentinelManagedConnection):
+    """
+    Sentinel managed connection that drops the cached topology when
+    its server cannot be reached or, being the master, answers with
+    READONLY; the retry of the command then connects to the address
+    the sentinels currently report.
+    """
+
+    def _reset_topology(self):
+        self.connection_pool.sentinel_manager.reset(self.connection_pool.service_name)
+
+    def connect(self):
+        try:
+            return super(SentinelConnection, self).connect()
+        except ConnectionError:
+            self._reset_topology()
+            raise
+
+    def send_packed_command(self, command):
+        try:
+            return super(SentinelConnection, self).send_packed_command(command)
+        except ConnectionError:
+            self._reset_topology()
+            raise
+
+    def read_response(self):
+        try:
+            return super(SentinelConnection, self).read_response()
+        except ConnectionError:
+            self._reset_topology()
+            raise
+
+
+class SentinelConnectionFactory(ConnectionFactory):
+    """
+    Connection factory that discovers the servers from Redis Sentinel.
+
+    The host of every url is the name of a service monitored by the
+    sentinels given in the SENTINELS option: "redis://mymaster/0" connects
+    to its master and "redis://mymaster/0?is_master=0" to its replicas.
+    """
+
+    # Sentinel managers by sentinel addresses, process-global like _pools,
+    # so the cached topology is shared by all clients.
+    _sentinels = {}
+
+    def __init__(self, options):
+        options = dict(options)
+        options.setdefault("CONNECTION_POOL_CLASS", "redis.sentinel.SentinelConnectionPool")
+        super(SentinelConnectionFactory, self).__init__(options)
+
+        sentinels = options.get("SENTINELS")
+        if not sentinels:
+            raise ImproperlyConfigured("SENTINELS must be provided as a list of (host, port).")
+
+        sentinel_kwargs = {}
+        for option, kwarg in (("SOCKET_TIMEOUT", "socket_timeout"),
+                              ("SOCKET_CONNECT_TIMEOUT", "socket_connect_timeout")):
+            if options.get(option):
+                sentinel_kwargs[kwarg] = options[option]
+        sentinel_kwargs.update(options.get("SENTINEL_KWARGS", {}))
+
+        key = tuple(tuple(sentinel) for sentinel in sentinels)
+        if key not in self._sentinels:
+            self._sentinels[key] = CachedSentinel(
+                sentinels,
+                topology_timeout=options.get("SENTINEL_TOPOLOGY_TIMEOUT", 5),
+                sentinel_kwargs=sentinel_kwargs)
+        self.sentinel = self._sentinels[key]
+
+    def get_connection_pool(self, params):
+        url = urlparse(params["url"])
+        query = parse_qs(url.query)
+        is_master = query.pop("is_master", ["1"])[0].lower() not in ("0", "false", "no")
+
+        cp_params = dict(params)
+        cp_params.update(self.pool_cls_kwargs)
+        cp_params.update({
+            "url": urlunparse(url._replace(query=urlencode(query, doseq=True))),
+            "service_name": url.netloc.rsplit("@", 1)[-1].split(":")[0],
+            "sentinel_manager": self.sentinel,
+            "is_master": is_master,
+            "connection_class": SentinelConnection,
+        })
+        return self.pool_cls.from_url(**cp_params)
+
+
 def get_connection_factory(path=None, options=None):
     if path is None:
-        path = getattr(settings, "DJANGO_REDIS_CONNECTION_FACTORY",
-                       "django_redis.pool.ConnectionFactory")
+        path = (options or {}).get("CONNECTION_FACTORY") or \
+            getattr(settings, "DJANGO_REDIS_CONNECTION_FACTORY",
+                    "django_redis.pool.ConnectionFactory")
 
     cls = util.load_class(path)
     return cls(options or {})
@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import random
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    from django.utils.deprecation import MiddlewareMixin
+except ImportError:
+    MiddlewareMixin = object
+
+from .instrumentation import _find_alias
+from .signals import cache_profiled
+from .util import load_class, string_types, text_type
+
+# Profilers of every profiled cache of the process, by alias.
+_registry = {}
+_registry_lock = threading.Lock()
+
+# Collectors of the spans of the current thread (see collect).
+_local = threading.local()
+
+# Longest db.statement attribute of the command spans.
+MAX_STATEMENT_LENGTH = 200
+
+
+def _size(value):
+    """
+    Approximate size in bytes of a command argument or reply.
+    """
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, text_type):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (list, tuple)):
+        return sum(_size(item) for item in value)
+    if value is None or isinstance(value, (bool, Exception)):
+        return 0
+    return len(str(value))
+
+
+def _statement(args):
+    statement = " ".join(arg.decode("utf-8", "replace") if isinstance(arg, bytes)
+                         else text_type(arg) for arg in args)
+    if len(statement) > MAX_STATEMENT_LENGTH:
+        statement = statement[:MAX_STATEMENT_LENGTH - 3] + "..."
+    return statement
+
+
+class Span(object):
+    """
+    A timed part of a cache operation. ``start`` and ``end`` are
+    seconds since the epoch.
+    """
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "end", "attributes")
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = random.getrandbits(64)
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.end = None
+        self.start = time.time()
+
+    @property
+    def duration(self):
+        return (self.end or time.time()) - self.start
+
+    def as_dict(self):
+        """
+        Return the span as OpenTelemetry exporters describe them: hex
+        ids, and times in nanoseconds since the epoch.
+        """
+        return {
+            "name": self.name,
+            "trace_id": "%032x" % self.trace_id,
+            "span_id": "%016x" % self.span_id,
+            "parent_id": "%016x" % self.parent_id if self.parent_id is not None else None,
+            "start_time": int(self.start * 1e9),
+            "end_time": int(self.end * 1e9) if self.end is not None else None,
+            "attributes": dict(self.attributes),
+        }
+
+
+class Collector(object):
+    """
+    The spans of the operations of a thread, between ``collect`` and
+    ``stop_collecting``. With ``sampled``, all operations are profiled.
+    """
+
+    def __init__(self, sampled=True):
+        self.sampled = sampled
+        self.spans = []
+
+
+def collect(sampled=True):
+    """
+    Start collecting the spans of the operations of the current
+    thread, and return the Collector receiving them.
+    """
+    collector = Collector(sampled)
+    collectors = getattr(_local, "collectors", None)
+    if collectors is None:
+        collectors = _local.collectors = []
+    collectors.append(collector)
+    return collector
+
+
+def stop_collecting(collector):
+    collectors = getattr(_local, "collectors", None) or []
+    if collector in collectors:
+        collectors.remove(collector)
+
+
+def summarize(spans):
+    """
+    Return the number of cache operations and redis commands of
+    ``spans``, their time in seconds, the bytes sent and received, and
+    the count and time of the spans by name (make_key, serialize,
+    compress, decompress, deserialize, command).
+    """
+    summary = {"operations": 0, "commands": 0, "time": 0.0, "bytes_sent": 0,
+               "bytes_received": 0, "spans": {}}
+    for span in spans:
+        if span.parent_id is None:
+            summary["operations"] += 1
+            summary["time"] += span.duration
+
+        kind = span.attributes.get("cache.span", span.name)
+        if kind == "command":
+            summary["commands"] += span.attributes.get("db.commands", 1)
+            summary["bytes_sent"] += span.attributes.get("net.bytes_sent", 0)
+            summary["bytes_received"] += span.attributes.get("net.bytes_received", 0)
+        if span.parent_id is not None:
+            totals = summary["spans"].setdefault(kind, {"count": 0, "time": 0.0})
+            totals["count"] += 1
+            totals["time"] += span.duration
+    return summary
+
+
+class CallbackExporter(object):
+    """
+    Pass every finished span to ``callback(span)``, as returned by
+    Span.as_dict. ``callback`` may be a dotted path.
+    """
+
+    def __init__(self, callback):
+        if isinstance(callback, string_types):
+            callback = load_class(callback)
+        self.callback = callback
+
+    def export(self, spans):
+        for span in spans:
+            self.callback(span.as_dict())
+
+
+class OpenTelemetryExporter(object):
+    """
+    Replay the spans of every sampled operation with an OpenTelemetry
+    tracer (the opentelemetry-api package is required), as children of
+    the span current when the operation ran, if any.
+    """
+
+    def __init__(self, tracer_name="django_redis"):
+        from opentelemetry import trace
+        self._trace = trace
+        self._tracer = trace.get_tracer(tracer_name)
+
+    def export(self, spans):
+        started = {}
+        for span in spans:
+            if span.parent_id is None:
+                context = None
+            else:
+                context = self._trace.set_span_in_context(started[span.parent_id])
+            started[span.span_id] = self._tracer.start_span(
+                span.name, context=context, attributes=span.attributes,
+                start_time=int(span.start * 1e9))
+
+        for span in reversed(spans):
+            started[span.span_id].end(end_time=int(span.end * 1e9))
+
+
+class Profiler(object):
+    """
+    Timing spans of a ``sample_rate`` fraction of the operations of a
+    cache, or of all the operations run while a sampled Collector is
+    active: the operation, and its make_key, serialize, compress,
+    decompress, deserialize and redis command spans. The spans of every
+    sampled operation are passed to the ``exporters``, instances or
+    dotted paths of exporter classes, and to the active collectors.
+    """
+
+    def __init__(self, alias, sample_rate=0.01, exporters=()):
+        self.alias = alias
+        self.sample_rate = sample_rate
+        self.exporters = [load_class(exporter)() if isinstance(exporter, string_types)
+                          else exporter for exporter in exporters]
+        self.export_failures = 0
+        self._local = threading.local()
+
+    def active(self):
+        """
+        Whether an operation is profiled in the current thread.
+        """
+        return bool(getattr(self._local, "stack", None))
+
+    def start(self, operation, key=None):
+        """
+        Start the span of a cache operation, and return it, or None if
+        the operation is not sampled.
+        """
+        if getattr(self._local, "stack", None):
+            return self.push(operation, **{"cache.operation": operation})
+
+        collectors = getattr(_local, "collectors", None)
+        if collectors:
+            sampled = any(collector.sampled for collector in collectors)
+        else:
+            sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        if not sampled:
+            return None
+
+        attributes = {"cache.alias": self.alias, "cache.operation": operation}
+        if isinstance(key, string_types):
+            attributes["cache.key"] = key
+        span = Span(operation, random.getrandbits(128), attributes=attributes)
+        self._local.stack = [span]
+        self._local.spans = [span]
+        return span
+
+    def push(self, name, **attributes):
+        """
+        Start a span in the profiled operation, and return it, or None
+        if no operation is profiled.
+        """
+        stack = getattr(self._local, "stack", None)
+        if not stack:
+            return None
+
+        parent = stack[-1]
+        span = Span(name, parent.trace_id, parent.span_id, attributes)
+        stack.append(span)
+        self._local.spans.append(span)
+        return span
+
+    def finish(self, span, **attributes):
+        """
+        End ``span``, and the spans started in it and not ended. The
+        spans of an operation are exported when it ends.
+        """
+        span.end = time.time()
+        span.attributes.update(attributes)
+
+        stack = self._local.stack
+        while stack:
+            current = stack.pop()
+            if current is span:
+                break
+            current.end = span.end
+        if stack:
+            return
+
+        spans = self._local.spans
+        self._local.stack = self._local.spans = None
+        for collector in getattr(_local, "collectors", None) or ():
+            collector.spans.extend(spans)
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans)
+            except Exception:
+                self.export_failures += 1
+
+    def wrap(self, name, function):
+        """
+        Return ``function`` (of one bytes argument, returning bytes,
+        like a serializer or compressor method) timed in ``name`` spans.
+        """
+        def wrapper(value):
+            span = self.push(name, **{"cache.span": name})
+            if span is None:
+                return function(value)
+            try:
+                result = function(value)
+            except Exception as e:
+                self.finish(span, error=repr(e))
+                raise
+            self.finish(span, **{"bytes.in": _size(value), "bytes.out": _size(result)})
+            return result
+        return wrapper
+
+    def instrument(self, client):
+        """
+        Time the commands and pipelines of the raw redis ``client``.
+        """
+        execute_command = client.execute_command
+
+        def _execute_command(*args, **options):
+            span = self.push(args[0], **{"cache.span": "command", "db.system": "redis",
+                                         "db.operation": args[0], "db.statement": _statement(args),
+                                         "net.bytes_sent": _size(args)})
+            if span is None:
+                return execute_command(*args, **options)
+            try:
+                result = execute_command(*args, **options)
+            except Exception as e:
+                self.finish(span, error=repr(e))
+                raise
+            self.finish(span, **{"net.bytes_received": _size(result)})
+            return result
+
+        create_pipeline = client.pipeline
+
+        def _pipeline(*args, **kwargs):
+            pipeline = create_pipeline(*args, **kwargs)
+            execute = pipeline.execute
+
+            def _execute(*args, **kwargs):
+                commands = [command for command, options in pipeline.command_stack]
+                span = self.push("PIPELINE", **{
+                    "cache.span": "command", "db.system": "redis", "db.operation": "PIPELINE",
+                    "db.statement": _statement(command[0] for command in commands),
+                    "db.commands": len(commands), "net.bytes_sent": _size(commands)})
+                if span is None:
+                    return execute(*args, **kwargs)
+                try:
+                    result = execute(*args, **kwargs)
+                except Exception as e:
+                    self.finish(span, error=repr(e))
+                    raise
+                self.finish(span, **{"net.bytes_received": _size(result)})
+                return result
+
+            pipeline.execute = _execute
+            return pipeline
+
+        client.execute_command = _execute_command
+        client.pipeline = _pipeline
+        return client
+
+
+def get_profiler(server, params):
+    """
+    Return the Profiler of the cache configured with ``params``, shared
+    by its backends, or None if PROFILER_CLASS is not set.
+    """
+    options = params.get("OPTIONS") or {}
+    path = options.get("PROFILER_CLASS", None)
+    if path is None:
+        return None
+
+    alias = _find_alias(server, params)
+    profiler = _registry.get(alias)
+    if profiler is None:
+        with _registry_lock:
+            profiler = _registry.get(alias)
+            if profiler is None:
+                cls = load_class(path)
+                profiler = _registry[alias] = cls(alias, **options.get("PROFILER_KWARGS", {}))
+    return profiler
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """
+    Profile the cache operations of a DJANGO_REDIS_PROFILING_SAMPLE_RATE
+    fraction of the requests (all of them by default), and summarize
+    them: in a ``Server-Timing`` header, in ``request.cache_profile``,
+    and with the ``cache_profiled`` signal.
+    """
+
+    def process_request(self, request):
+        sample_rate = getattr(settings, "DJANGO_REDIS_PROFILING_SAMPLE_RATE", 1.0)
+        if sample_rate >= 1 or random.random() < sample_rate:
+            request._cache_collector = collect()
+
+    def process_response(self, request, response):
+        collector = getattr(request, "_cache_collector", None)
+        if collector is None:
+            return response
+
+        stop_collecting(collector)
+        summary = request.cache_profile = summarize(collector.spans)
+        cache_profiled.send(sender=self.__class__, request=request, summary=summary,
+                            spans=collector.spans)
+
+        timings = ['cache;dur=%.3f;desc="%d operations, %d commands"'
+                   % (summary["time"] * 1000, summary["operations"], summary["commands"])]
+        for name, totals in sorted(summary["spans"].items()):
+            timings.append("cache-%s;dur=%.3f" % (name.replace("_", "-"), totals["time"] * 1000))
+        response["Server-Timing"] = ", ".join(
+            [value for value in [response.get("Server-Timing")] if value] + timings)
+        return response
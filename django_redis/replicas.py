@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import math
+import random
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+
+try:
+    from concurrent import futures
+except ImportError:
+    futures = None
+
+from django.core.exceptions import ImproperlyConfigured
+from redis.exceptions import ConnectionError
+
+try:
+    from redis.exceptions import TimeoutError
+    _connection_exceptions = (TimeoutError, ConnectionError, socket.timeout)
+except ImportError:
+    _connection_exceptions = (ConnectionError, socket.timeout)
+
+
+class RandomReplicaSelector(object):
+    """
+    Spread reads uniformly among the replicas. In a master/replica
+    setup, index 0 is the master and the other indexes are replicas.
+    """
+
+    def __init__(self, servers, **kwargs):
+        self.replicas = list(range(1, len(servers)))
+
+    def select(self):
+        """
+        Return the index of the server to use for the next read.
+        """
+        if not self.replicas:
+            return 0
+        return random.choice(self.replicas)
+
+    def instrument(self, index, client):
+        """
+        Hook called with every new raw client; may wrap it to
+        observe the commands sent to the server.
+        """
+        return client
+
+
+class LatencyAwareReplicaSelector(RandomReplicaSelector):
+    """
+    Prefer the fastest replicas.
+
+    Tracks an exponentially weighted moving average of the latency and
+    the number of in-flight commands of every replica, and picks the
+    cheapest of two random replicas (power of two choices). A replica
+    failing ``eject_errors`` times in a row is ejected for
+    ``eject_timeout`` seconds; when all replicas are ejected, reads go
+    to the master.
+    """
+
+    def __init__(self, servers, decay=0.3, eject_errors=3, eject_timeout=10):
+        super(LatencyAwareReplicaSelector, self).__init__(servers)
+        self.decay = decay
+        self.eject_errors = eject_errors
+        self.eject_timeout = eject_timeout
+
+        self.latency = dict.fromkeys(self.replicas, 0.0)
+        self.inflight = dict.fromkeys(self.replicas, 0)
+        self.errors = dict.fromkeys(self.replicas, 0)
+        self.ejected_until = dict.fromkeys(self.replicas, 0)
+        self._lock = threading.Lock()
+
+    def cost(self, index):
+        return self.latency[index] * (self.inflight[index] + 1)
+
+    def select(self):
+        now = time.time()
+        healthy = [i for i in self.replicas if self.ejected_until[i] <= now]
+
+        if not healthy:
+            return 0
+        if len(healthy) == 1:
+            return healthy[0]
+
+        a, b = random.sample(healthy, 2)
+        return a if self.cost(a) <= self.cost(b) else b
+
+    def start(self, index):
+        with self._lock:
+            self.inflight[index] += 1
+
+    def finish(self, index, elapsed, failed=False):
+        with self._lock:
+            self.inflight[index] -= 1
+
+            if failed:
+                self.errors[index] += 1
+                if self.errors[index] >= self.eject_errors:
+                    self.ejected_until[index] = time.time() + self.eject_timeout
+                    self.errors[index] = 0
+                return
+
+            self.errors[index] = 0
+            if self.latency[index]:
+                self.latency[index] += self.decay * (elapsed - self.latency[index])
+            else:
+                self.latency[index] = elapsed
+
+    def instrument(self, index, client):
+        if index not in self.latency:
+            return client
+
+        execute_command = client.execute_command
+
+        def _execute_command(*args, **options):
+            self.start(index)
+            started = time.time()
+            try:
+                result = execute_command(*args, **options)
+            except _connection_exceptions:
+                self.finish(index, time.time() - started, failed=True)
+                raise
+            except Exception:
+                self.finish(index, time.time() - started)
+                raise
+
+            self.finish(index, time.time() - started)
+            return result
+
+        client.execute_command = _execute_command
+        return client
+
+
+class WriteTracker(object):
+    """
+    Remember the recent writes of this process, so that reads that
+    could hit a lagging replica are sent to the master instead.
+
+    Without ``max_keys``, every read within ``window`` milliseconds of
+    the end of a write goes to the master. With it, only reads of the
+    keys written within the window do; at most ``max_keys`` keys are
+    remembered. A write of unknown keys (no keys) counts as a write of
+    every key.
+    """
+
+    def __init__(self, window, max_keys=0):
+        self.window = window / 1000.0
+        self.max_keys = max_keys
+        self.last_write = 0
+        # Time of the last write of unknown keys.
+        self.last_keyless_write = 0
+        self.keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def written(self, keys=()):
+        """
+        Record the end of a write of ``keys``.
+        """
+        now = time.time()
+        self.last_write = now
+
+        if not self.max_keys:
+            return
+        if not keys:
+            self.last_keyless_write = now
+            return
+
+        with self._lock:
+            for key in keys:
+                self.keys.pop(key, None)
+                self.keys[key] = now
+
+            while len(self.keys) > self.max_keys:
+                self.keys.popitem(last=False)
+
+    def recently_written(self, keys=()):
+        now = time.time()
+        if now - self.last_write > self.window:
+            return False
+
+        if not self.max_keys or now - self.last_keyless_write <= self.window:
+            return True
+
+        for key in keys:
+            written_at = self.keys.get(key)
+            if written_at is not None and now - written_at <= self.window:
+                return True
+        return False
+
+
+class ReadHedger(object):
+    """
+    Send a read to a second replica when the first one is slow.
+
+    A read that has not answered within ``delay`` seconds is sent to
+    another replica too, and the first answer wins. Without ``delay``,
+    the ``percentile`` of the latencies of the last ``samples`` reads is
+    used, once ``min_samples`` reads were measured, computed again every
+    ``refresh_samples`` reads. At most ``budget`` of the reads are hedged.
+    Reads that may be hedged run on a pool of ``max_workers`` threads,
+    the others in the calling thread.
+    """
+
+    def __init__(self, servers, delay=None, percentile=95, samples=1000, min_samples=100,
+                 budget=0.05, max_workers=10, refresh_samples=100):
+        if futures is None:
+            raise ImproperlyConfigured("Hedged reads require the concurrent.futures module; "
+                                       "install the futures package on Python 2.")
+
+        self.replicas = list(range(1, len(servers)))
+        self.delay = delay
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.budget = budget
+        self.refresh_samples = refresh_samples
+
+        self.latencies = deque(maxlen=samples)
+        # The delay computed from the latencies, and the reads measured since.
+        self._delay = None
+        self._new_samples = 0
+        self.reads = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    def get_delay(self):
+        """
+        Return the number of seconds to wait for the first replica
+        before hedging, or None if reads should not be hedged yet.
+        """
+        if self.delay is not None:
+            return self.delay
+        return self._delay
+
+    def _measured(self, latency):
+        self.latencies.append(latency)
+        with self._lock:
+            self._new_samples += 1
+            if self._new_samples < self.refresh_samples and self._delay is not None:
+                return
+            if len(self.latencies) < self.min_samples:
+                return
+
+            latencies = sorted(self.latencies)
+            self._new_samples = 0
+            rank = int(math.ceil(len(latencies) * self.percentile / 100.0))
+            self._delay = latencies[max(0, rank - 1)]
+
+    def _hedge_allowed(self):
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.reads:
+                return False
+            self.hedges += 1
+            return True
+
+    def read(self, func, index):
+        """
+        Return ``func(index)``, calling it with another replica
+        index too if the ``index`` replica is slow to answer.
+        """
+        if index not in self.replicas or len(self.replicas) < 2:
+            return func(index)
+
+        with self._lock:
+            self.reads += 1
+            over_budget = self.hedges + 1 > self.budget * self.reads
+
+        started = time.time()
+        delay = self.get_delay()
+        if delay is None or over_budget:
+            # Not hedged: read in the calling thread.
+            result = func(index)
+            self._measured(time.time() - started)
+            return result
+
+        first = self._executor.submit(func, index)
+        done, _ = futures.wait([first], timeout=delay)
+        if done or not self._hedge_allowed():
+            result = first.result()
+            self._measured(time.time() - started)
+            return result
+
+        other = random.choice([i for i in self.replicas if i != index])
+        pending = set([first, self._executor.submit(func, other)])
+
+        while True:
+            done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            succeeded = [future for future in done if future.exception() is None]
+            if succeeded or not pending:
+                self._measured(time.time() - started)
+                return (succeeded or list(done))[0].result()
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+from django.dispatch import Signal
+
+# Sent with the ``breaker``, its ``old_state`` and its ``new_state``
+# whenever a circuit breaker opens, closes or starts probing.
+circuit_breaker_state_changed = Signal()
+
+# Sent by django_redis.instrumentation.SignalSink with the ``name``, the
+# ``value``, the ``kind`` ("timing", "size" or "counter") and the
+# ``labels`` of every measure.
+cache_metric = Signal()
+
+# Sent by django_redis.profiling.ProfilingMiddleware with the ``request``,
+# the ``summary`` of its cache operations and their ``spans``.
+cache_profiled = Signal()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+import sys
+
+try:
+    from threading import get_ident
+except ImportError:
+    from thread import get_ident
+
+try:
+    from _thread import allocate_lock
+except ImportError:
+    from thread import allocate_lock
+
+if hasattr(os, "register_at_fork"):
+    _forks = [0]
+
+    def _count_fork():
+        _forks[0] += 1
+
+    os.register_at_fork(after_in_child=_count_fork)
+
+    def _process():
+        return _forks[0]
+else:
+    _process = os.getpid
+
+
+class _Call(object):
+    __slots__ = ("process", "generation", "thread", "result", "error", "done")
+
+    def __init__(self, generation):
+        self.process = _process()
+        self.generation = generation
+        self.thread = get_ident()
+        self.result = None
+        self.error = None
+        # Held until the call ends.
+        self.done = allocate_lock()
+        self.done.acquire()
+
+
+class SingleFlight(object):
+    """
+    Share the result of a call between the threads making it at the same
+    time: while a call for a key is in flight, the callers of the same key
+    wait for it and get its result, or its exception, instead of running
+    it again. A call made again by the thread running it, from inside the
+    call, runs on its own.
+
+    Keys are tuples starting with a name. A call is only shared with the
+    callers starting before a write of its name ends (see ``written``), so
+    a caller never gets a result read before a write it has seen end.
+    Names are hashed into ``generation_slots`` write generations: a write
+    also stops the sharing of the names of the same slot.
+
+    The calls in flight are kept in a dict, relying on the atomicity of
+    its setdefault and pop rather than on a lock, so that a call nobody
+    waits for costs little more than the call itself.
+    """
+
+    def __init__(self, generation_slots=4096):
+        self.calls = 0
+        self.shared = 0
+        self._flights = {}
+        self._epoch = 0
+        self._generations = [0] * generation_slots
+        # Serializes the bumps of the generations, not the calls.
+        self._lock = allocate_lock()
+
+    def _generation(self, name):
+        return self._epoch, self._generations[hash(name) % len(self._generations)]
+
+    def do(self, key, function):
+        """
+        Return ``function()``, or the result of the call in flight for
+        ``key``.
+        """
+        call = _Call(self._generation(key[0]))
+        current = self._flights.setdefault(key, call)
+        if current is not call:
+            if current.process != call.process or current.generation != call.generation:
+                # Calls in flight in the parent never end in the child, and
+                # a call started before a write ended may miss the write.
+                self._flights[key] = call
+            elif current.thread == call.thread:
+                return function()
+            else:
+                self.shared += 1
+                current.done.acquire()
+                current.done.release()
+                if current.error is not None:
+                    raise current.error
+                return current.result
+
+        self.calls += 1
+        try:
+            call.result = function()
+            return call.result
+        except Exception:
+            call.error = sys.exc_info()[1]
+            raise
+        finally:
+            if self._flights.get(key) is call:
+                self._flights.pop(key, None)
+            call.done.release()
+
+    def written(self, names=None):
+        """
+        Record the end of a write of ``names`` (of all names if None): the
+        calls in flight for them are not shared with the following callers.
+        """
+        with self._lock:
+            if names is None:
+                self._epoch += 1
+                return
+
+            generations = self._generations
+            for name in names:
+                generations[hash(name) % len(generations)] += 1
+
+    def stats(self):
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "shared": self.shared,
+        }
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+import threading
+import time
+import weakref
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from redis.exceptions import LockError
+
+# First item of the values stored with a soft expiration: [STALE_MARKER,
+# soft expiration time or None, value]. A list, so that every serializer
+# can store it.
+STALE_MARKER = "django_redis:stale"
+
+
+def pack(value, soft_timeout):
+    """
+    Wrap ``value`` with its soft expiration time, ``soft_timeout``
+    seconds from now (never if None).
+    """
+    expires = time.time() + soft_timeout if soft_timeout is not None else None
+    return [STALE_MARKER, expires, value]
+
+
+def unpack(packed):
+    """
+    Return (value, is stale) for a value stored by ``pack``, or
+    (packed, False) for any other value.
+    """
+    if isinstance(packed, (list, tuple)) and len(packed) == 3 and packed[0] == STALE_MARKER:
+        expires = packed[1]
+        return packed[2], expires is not None and expires <= time.time()
+    return packed, False
+
+
+def _run(ref, tasks, poll_interval=1):
+    # The refresher is only held while refreshing, so it is dropped with its
+    # cache; idle workers check for that every poll_interval seconds.
+    while True:
+        try:
+            task = tasks.get(timeout=poll_interval)
+        except queue.Empty:
+            if ref() is None:
+                return
+            continue
+
+        refresher = ref()
+        try:
+            if refresher is None:
+                return
+            refresher._refresh(*task)
+        finally:
+            tasks.task_done()
+        del refresher
+
+
+class BackgroundRefresher(object):
+    """
+    Recompute stale values in the background.
+
+    Refreshes are run by a pool of ``max_workers`` threads. A key being
+    refreshed by the process is not queued again, and the refresh of a
+    key is skipped when another process holds its refresh lock, kept in
+    redis for at most ``lock_timeout`` seconds, or when the key, read
+    again under the lock, is no longer stale. At most ``max_pending``
+    refreshes wait for a thread; the following ones are dropped, and the
+    stale value is served until a later read queues one.
+    """
+
+    def __init__(self, client, max_workers=4, lock_timeout=30, max_pending=1000):
+        # The refresher is shared by the clients of a cache, and held by them.
+        self._clients = client._sharing_clients
+        self.max_workers = max_workers
+        self.lock_timeout = lock_timeout
+        self.max_pending = max_pending
+
+        self.scheduled = 0
+        self.refreshed = 0
+        self.locked = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._queue = None
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    @property
+    def client(self):
+        return self._clients()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._refreshing.clear()
+        self._queue = queue.Queue(self.max_pending)
+        for x in range(self.max_workers):
+            thread = threading.Thread(target=_run, name="django-redis-refresh",
+                                      args=(weakref.ref(self), self._queue))
+            thread.daemon = True
+            thread.start()
+
+    def refresh(self, key, default, timeout, stale_ttl, version=None):
+        """
+        Queue the refresh of ``key`` with ``default`` (a callable, or
+        a value), unless it is already queued.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+
+            refreshing = (key, version)
+            if refreshing in self._refreshing:
+                return False
+            try:
+                self._queue.put_nowait((key, default, timeout, stale_ttl, version))
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._refreshing.add(refreshing)
+            self.scheduled += 1
+            return True
+
+    def _refresh(self, key, default, timeout, stale_ttl, version):
+        client = self.client
+        try:
+            lock = client.lock("%s:refresh" % key, version=version,
+                               timeout=self.lock_timeout)
+            if not lock.acquire(blocking=False):
+                self.locked += 1
+                return
+
+            try:
+                # Refreshed by another process since it was read, or removed.
+                packed = client.get(key, version=version)
+                if packed is None or not unpack(packed)[1]:
+                    self.skipped += 1
+                    return
+
+                value = default() if callable(default) else default
+                timeout = client.jitter_timeout(timeout, key)
+                client.set(key, pack(value, timeout), version=version, jitter=0,
+                           timeout=None if timeout is None else timeout + stale_ttl)
+                self.refreshed += 1
+            finally:
+                try:
+                    lock.release()
+                except LockError:
+                    # The refresh took longer than lock_timeout.
+                    pass
+        except Exception:
+            self.failed += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard((key, version))
+
+    def wait(self):
+        """
+        Block until the queued refreshes are done.
+        """
+        if self._queue is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def stats(self):
+        return {
+            "pending": len(self._refreshing),
+            "scheduled": self.scheduled,
+            "refreshed": self.refreshed,
+            "locked": self.locked,
+            "skipped": self.skipped,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from debug_toolbar.panels import Panel
+
+from .profiling import collect, stop_collecting, summarize
+
+
+class CachePanel(Panel):
+    """
+    Debug toolbar panel listing the redis commands of the request, with
+    the cache operation sending them, their duration and their size.
+    Only the caches with PROFILER_CLASS set are listed.
+    """
+
+    title = "Redis"
+    template = "django_redis/toolbar_panel.html"
+
+    @property
+    def nav_subtitle(self):
+        stats = self.get_stats()
+        if not stats:
+            return ""
+        summary = stats["summary"]
+        return "%d commands in %.2fms" % (summary["commands"], summary["time"] * 1000)
+
+    def enable_instrumentation(self):
+        self._collector = collect()
+
+    def disable_instrumentation(self):
+        stop_collecting(self._collector)
+
+    def generate_stats(self, request, response):
+        spans = self._collector.spans
+        by_id = dict((span.span_id, span) for span in spans)
+
+        commands = []
+        for span in spans:
+            if span.attributes.get("cache.span") != "command":
+                continue
+
+            operation = span
+            while operation.parent_id is not None and operation.parent_id in by_id:
+                operation = by_id[operation.parent_id]
+            commands.append({
+                "alias": operation.attributes.get("cache.alias"),
+                "operation": operation.name,
+                "statement": span.attributes.get("db.statement"),
+                "duration": span.duration * 1000,
+                "bytes_sent": span.attributes.get("net.bytes_sent", 0),
+                "bytes_received": span.attributes.get("net.bytes_received", 0),
+                "error": span.attributes.get("error"),
+            })
+
+        summary = summarize(spans)
+        summary["time_ms"] = summary["time"] * 1000
+        self.record_stats({"commands": commands, "summary": summary})
@@ -26,8 +26,12 @@ from collections import defaultdict
 
 if sys.version_info[0] < 3:
     integer_types = (int, long,)
+    string_types = (basestring,)
+    text_type = unicode
 else:
     integer_types = (int,)
+    string_types = (str,)
+    text_type = str
 
 
 class CacheKey(object):
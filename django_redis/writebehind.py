@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import atexit
+import logging
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# The queues holding writes, kept until they are flushed, also on exit,
+# with a client of their cache to send them.
+_pending_queues = {}
+
+
+@atexit.register
+def _flush_pending_queues():
+    for write_behind in list(_pending_queues):
+        write_behind.flush()
+
+
+def _run(ref, wakeup, flush_interval):
+    # The queue is only held while flushed, so it is dropped with its cache.
+    while True:
+        wakeup.wait(flush_interval)
+        wakeup.clear()
+        write_behind = ref()
+        if write_behind is None:
+            return
+        write_behind.flush()
+        del write_behind
+
+SET = "set"
+DELETE = "delete"
+EXPIRE = "expire"
+
+
+class WriteBehindQueue(object):
+    """
+    Queue of writes (set, delete and expire) sent in the background.
+
+    Pending writes are coalesced per key, the last one winning, and sent
+    as a single pipeline by a background thread every ``flush_interval``
+    seconds, or as soon as ``batch_size`` keys are pending. At most
+    ``max_size`` keys are pending: writes of other keys then either
+    flush the queue in the calling thread (``overflow="flush"``) or are
+    dropped (``overflow="drop"``). The queue is flushed on exit.
+
+    The values of the sets are queued encoded, so encoding errors are
+    raised by the set. A write failing on flush is counted and logged,
+    without failing the other writes of its batch.
+    """
+
+    def __init__(self, client, max_size=10000, batch_size=500, flush_interval=0.05,
+                 overflow="flush"):
+        if overflow not in ("flush", "drop"):
+            raise ValueError("overflow must be 'flush' or 'drop'")
+
+        # The queue is shared by the clients of a cache, and held by them.
+        self._clients = client._sharing_clients
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+
+        self.queued = 0
+        self.coalesced = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._pid = None
+
+    @property
+    def client(self):
+        return self._clients()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _start(self):
+        self._pid = os.getpid()
+        # Writes queued by the parent process belong to it.
+        self._pending.clear()
+        thread = threading.Thread(target=_run, name="django-redis-write-behind",
+                                  args=(weakref.ref(self), self._wakeup, self.flush_interval))
+        thread.daemon = True
+        thread.start()
+
+    def put(self, op, key, **kwargs):
+        """
+        Queue a write of ``key``, replacing its pending writes. The
+        keyword arguments are passed to the client method ``op``.
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start()
+
+        pending_key = (key, kwargs.get("version"), kwargs.get("namespace"))
+
+        while True:
+            with self._lock:
+                previous = self._pending.pop(pending_key, None)
+                if previous is not None or len(self._pending) < self.max_size:
+                    self._pending[pending_key] = self._coalesce(previous, op, key, kwargs)
+                    if self not in _pending_queues:
+                        _pending_queues[self] = self.client
+                    self.queued += 1
+                    if previous is not None:
+                        self.coalesced += 1
+                    if len(self._pending) >= self.batch_size:
+                        self._wakeup.set()
+                    return
+
+                if self.overflow == "drop":
+                    self.dropped += 1
+                    return
+
+            self.flush()
+
+    def _coalesce(self, previous, op, key, kwargs):
+        if op == EXPIRE and previous is not None:
+            if previous[0] == DELETE:
+                return previous
+            if previous[0] == SET:
+                return (SET, key, dict(previous[2], timeout=kwargs["timeout"], jitter=0))
+        return (op, key, kwargs)
+
+    def flushing(self):
+        """
+        Whether the current thread is flushing the queue.
+        """
+        return getattr(self._local, "flushing", False)
+
+    def flush(self):
+        """
+        Send all the pending writes, in the calling thread.
+        """
+        if not self._pending or self.flushing():
+            return
+
+        with self._flush_lock:
+            with self._lock:
+                writes = list(self._pending.values())
+                self._pending.clear()
+                client = _pending_queues.pop(self, None) or self.client
+
+            if not writes:
+                return
+
+            self._local.flushing = True
+            try:
+                self._send(writes, client)
+            finally:
+                self._local.flushing = False
+
+    def _send(self, writes, client):
+        pipeline = client.get_client(write=True).pipeline(transaction=False)
+        # The replies of every write: a set with tags sends several commands.
+        batch = []
+        for write in writes:
+            start = len(pipeline.command_stack)
+            try:
+                client.apply_write(write[0], write[1], pipeline, **write[2])
+            except Exception:
+                self.failed += 1
+                logger.exception("Write-behind %s of %r failed", write[0], write[1])
+                del pipeline.command_stack[start:]
+                continue
+            batch.append((write, start, len(pipeline.command_stack)))
+
+        if not batch:
+            return
+
+        try:
+            replies = pipeline.execute(raise_on_error=False)
+        except Exception:
+            # The connection failed: none of the writes is known to be done.
+            self.failed += len(batch)
+            logger.exception("Write-behind flush of %d writes failed", len(batch))
+            return
+        finally:
+            client._after_write(*[write[1] for write, start, stop in batch])
+
+        self.batches += 1
+        for write, start, stop in batch:
+            errors = [reply for reply in replies[start:stop] if isinstance(reply, Exception)]
+            if errors:
+                self.failed += 1
+                logger.error("Write-behind %s of %r failed: %s", write[0], write[1], errors[0])
+            else:
+                self.flushed += 1
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "queued": self.queued,
+            "coalesced": self.coalesced,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
@@ -16,6 +16,8 @@ setup(
     packages = [
         "django_redis",
         "django_redis.client",
+        "django_redis.management",
+        "django_redis.management.commands",
         "django_redis.serializers"
     ],
     description = description.strip(),
@@ -26,6 +28,7 @@ setup(
     include_package_data = True,
     package_data = {
         "": ["*.html"],
+        "django_redis": ["templates/django_redis/*.html"],
     },
     classifiers = [
         "Development Status :: 5 - Production/Stable",
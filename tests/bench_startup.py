@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+"""
+Measure the cost of building a cache backend and running its first
+request, as Django does for every thread, with and without the client
+state shared per process.
+
+    python bench_startup.py [settings module] [iterations]
+"""
+
+from __future__ import print_function
+
+import os, sys, time
+sys.path.insert(0, "..")
+
+if __name__ == "__main__":
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE",
+                          sys.argv[1] if len(sys.argv) > 1 else "test_sqlite")
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    import django
+    if hasattr(django, "setup"):
+        django.setup()
+
+    from django.conf import settings
+    from django_redis.cache import RedisCache
+    from django_redis.client import DefaultClient
+
+    conf = dict(settings.CACHES["default"])
+    location = conf.pop("LOCATION")
+    conf.pop("BACKEND")
+
+    def first_request(shared):
+        started = time.time()
+        for x in range(iterations):
+            if not shared:
+                DefaultClient._shared_states.clear()
+            cache = RedisCache(location, dict(conf))
+            cache.get("bench-startup")
+        return (time.time() - started) / iterations * 1e6
+
+    first_request(True)
+    print("cold client state:   %8.1f us per backend" % first_request(False))
+    print("shared client state: %8.1f us per backend" % first_request(True))
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the client side overhead and the throughput of the cache
+backend: get, set, get_many, set_many, delete_pattern and incr, for
+several value sizes, serializers, compressors and client classes, next
+to the same commands sent with redis-py alone.
+
+A redis-server is started on a free port for the run, unless --server
+gives the host:port of a running one, or --memory runs the commands
+against the in-memory server, to measure the client side alone. Results
+are written as JSON, and can be compared with the results of a previous
+run:
+
+    python benchmark.py --output new.json [--compare old.json] [--filter get]
+"""
+
+from __future__ import print_function
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+CLIENTS = {
+    "default": "django_redis.client.DefaultClient",
+    "herd": "django_redis.client.HerdClient",
+    "shard": "django_redis.client.ShardClient",
+}
+
+SERIALIZERS = {
+    "pickle": "django_redis.serializers.pickle.PickleSerializer",
+    "json": "django_redis.serializers.json.JSONSerializer",
+    "msgpack": "django_redis.serializers.msgpack.MSGPackSerializer",
+}
+
+COMPRESSORS = {
+    "none": {},
+    "zlib": {"COMPRESS_MIN_LEN": 1},
+}
+
+SIZES = (10, 1000, 100000)
+
+MANY = 10
+
+
+def start_server():
+    """
+    Start a redis-server without persistence on a free port, and
+    return the process, its port and its working directory.
+    """
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    directory = tempfile.mkdtemp(prefix="django-redis-benchmark-")
+    with open(os.devnull, "w") as devnull:
+        process = subprocess.Popen(["redis-server", "--port", str(port), "--bind", "127.0.0.1",
+                                    "--save", "", "--appendonly", "no", "--dir", directory],
+                                   stdout=devnull, stderr=subprocess.STDOUT)
+
+    import redis
+    client = redis.StrictRedis(port=port)
+    for x in range(100):
+        try:
+            client.ping()
+            return process, port, directory
+        except redis.ConnectionError:
+            time.sleep(0.05)
+
+    process.terminate()
+    raise RuntimeError("redis-server did not start")
+
+
+def make_value(size):
+    """
+    A value of about ``size`` bytes once serialized, of pseudo random
+    (so only partly compressible) text, the same for every run.
+    """
+    rnd = random.Random(size)
+    text = "".join(rnd.choice(string.ascii_letters + " ") for x in range(size))
+    return {"id": size, "payload": text}
+
+
+def measure(func, iterations, repeat, setup=None):
+    """
+    Return the timings, in seconds per call, of ``repeat`` runs of
+    ``iterations`` calls of func. ``setup`` runs untimed before every call.
+    """
+    timings = []
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for x in range(repeat):
+            total = 0.0
+            for y in range(iterations):
+                if setup is not None:
+                    setup()
+                started = time.time()
+                func()
+                total += time.time() - started
+            timings.append(total / iterations)
+    finally:
+        if enabled:
+            gc.enable()
+    return timings
+
+
+def cache_cases(server, sizes, in_memory=False):
+    """
+    Yield (client, serializer, compressor, size, cache) for every
+    combination to benchmark through the cache backend.
+    """
+    from django_redis.cache import RedisCache
+
+    for client_name, client_cls in sorted(CLIENTS.items()):
+        if client_name == "shard":
+            location = ["%s:1" % server, "%s:2" % server]
+        else:
+            location = "%s:1" % server
+
+        for serializer_name, serializer_cls in sorted(SERIALIZERS.items()):
+            for compressor_name, compressor_options in sorted(COMPRESSORS.items()):
+                options = {"CLIENT_CLASS": client_cls, "SERIALIZER": serializer_cls}
+                options.update(compressor_options)
+                if in_memory:
+                    options["CONNECTION_FACTORY"] = "django_redis.memory.InMemoryConnectionFactory"
+                cache = RedisCache(location, {"OPTIONS": options})
+
+                # Skip the combinations that do not work here, like the
+                # herd client with another serializer than pickle.
+                try:
+                    cache.set("bench-probe", {"probe": "probe"})
+                    cache.get("bench-probe")
+                except Exception as e:
+                    print("skipping %s/%s/%s: %r" % (client_name, serializer_name,
+                                                     compressor_name, e))
+                    continue
+
+                for size in sizes:
+                    yield client_name, serializer_name, compressor_name, size, cache
+
+
+def cache_operations(cache, client_name, value, first):
+    """
+    Return (name, func, setup) for the operations to benchmark. The
+    ones not depending on the value only run for the ``first`` size.
+    """
+    keys = ["bench:%d" % x for x in range(MANY)]
+    data = dict((key, value) for key in keys)
+    cache.set_many(data)
+
+    operations = [
+        ("set", lambda: cache.set("bench:0", value), None),
+        ("get", lambda: cache.get("bench:0"), None),
+        ("set_many", lambda: cache.set_many(data), None),
+        ("get_many", lambda: cache.get_many(keys), None),
+    ]
+
+    if first:
+        operations.append(("delete_pattern", lambda: cache.delete_pattern("bench:*"),
+                           lambda: cache.set_many(data)))
+        if client_name != "herd":
+            cache.set("bench-counter", 0)
+            operations.append(("incr", lambda: cache.incr("bench-counter"), None))
+
+    return operations
+
+
+def raw_operations(client, value):
+    """
+    The commands of cache_operations, sent with redis-py alone.
+    """
+    payload = json.dumps(value).encode("utf-8")
+    keys = ["raw:%d" % x for x in range(MANY)]
+    data = dict((key, payload) for key in keys)
+    client.mset(data)
+    client.set("raw:counter", 0)
+
+    return [
+        ("set", lambda: client.set("raw:0", payload), None),
+        ("get", lambda: client.get("raw:0"), None),
+        ("set_many", lambda: client.mset(data), None),
+        ("get_many", lambda: client.mget(keys), None),
+        ("incr", lambda: client.incr("raw:counter"), None),
+    ]
+
+
+def run(server, iterations, repeat, sizes, name_filter=None, in_memory=False):
+    import django
+    import redis
+    import django_redis
+
+    results = []
+
+    def bench(name, params, func, setup):
+        if name_filter and name_filter not in name:
+            return
+        timings = measure(func, iterations, repeat, setup)
+        median = sorted(timings)[len(timings) // 2]
+        result = dict(params, name=name, iterations=iterations, repeat=repeat,
+                      min_us=min(timings) * 1e6, median_us=median * 1e6,
+                      ops_per_sec=1.0 / median if median else 0)
+        results.append(result)
+        print("%-45s %10.1f us %10.0f ops/s" % (name, result["median_us"],
+                                               result["ops_per_sec"]))
+
+    host, port = server.rsplit(":", 1)
+    if in_memory:
+        from django_redis.memory import InMemoryConnectionPool
+        client = redis.StrictRedis(connection_pool=InMemoryConnectionPool(host=host,
+                                                                          port=int(port), db=1))
+    else:
+        client = redis.StrictRedis(host=host, port=int(port), db=1)
+    for size in sizes:
+        value = make_value(size)
+        for operation, func, setup in raw_operations(client, value):
+            if operation == "incr" and size != sizes[0]:
+                continue
+            name = "redis-py/-/-/%s/%d" % (operation, size)
+            bench(name, {"client": "redis-py", "serializer": None, "compressor": None,
+                         "operation": operation, "size": size}, func, setup)
+
+    for client_name, serializer, compressor, size, cache in cache_cases(server, sizes, in_memory):
+        value = make_value(size)
+        for operation, func, setup in cache_operations(cache, client_name, value,
+                                                       size == sizes[0]):
+            name = "%s/%s/%s/%s/%d" % (client_name, serializer, compressor, operation, size)
+            bench(name, {"client": client_name, "serializer": serializer,
+                         "compressor": compressor, "operation": operation, "size": size},
+                  func, setup)
+        cache.clear()
+
+    info = client.info("server")
+    client.flushdb()
+
+    return {
+        "version": 1,
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "django": django.get_version(),
+            "redis-py": redis.__version__,
+            "redis-server": "memory" if in_memory else info.get("redis_version"),
+            "django-redis": django_redis.__version__,
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the ratio of the median timings of ``results`` over the
+    ones of ``baseline``, and return the names of the benchmarks slower
+    than ``threshold`` times their baseline.
+    """
+    previous = dict((result["name"], result) for result in baseline["results"])
+    regressions = []
+
+    print("\n%-45s %10s %10s %7s" % ("benchmark", "old us", "new us", "ratio"))
+    for result in results["results"]:
+        old = previous.get(result["name"])
+        if old is None or not old["median_us"]:
+            continue
+        ratio = result["median_us"] / old["median_us"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  slower"
+            regressions.append(result["name"])
+        print("%-45s %10.1f %10.1f %7.2f%s" % (result["name"], old["median_us"],
+                                              result["median_us"], ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--server", help="host:port of a running redis server to use; its "
+                                         "databases 1 and 2 are flushed")
+    parser.add_argument("--memory", action="store_true",
+                        help="use the in-memory server instead of a redis server")
+    parser.add_argument("--output", default="benchmark.json", help="file to write results to")
+    parser.add_argument("--compare", help="results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="ratio over which a benchmark is reported as slower")
+    parser.add_argument("--filter", help="only run the benchmarks whose name contains this")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES),
+                        help="comma separated value sizes, in bytes")
+    args = parser.parse_args(argv)
+
+    from django.conf import settings
+    if not settings.configured:
+        settings.configure(CACHES={}, SECRET_KEY="django-redis-benchmark")
+
+    import django
+    if hasattr(django, "setup"):
+        django.setup()
+
+    process = directory = None
+    server = args.server
+    if args.memory:
+        server = "127.0.0.1:6379"
+    elif server is None:
+        process, port, directory = start_server()
+        server = "127.0.0.1:%d" % port
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(",")]
+        results = run(server, args.iterations, args.repeat, sizes, args.filter, args.memory)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+            shutil.rmtree(directory, ignore_errors=True)
+
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+    print("\nResults written to %s" % args.output)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline), args.threshold)
+        if regressions:
+            print("\n%d benchmarks slower than %.2f times their baseline."
+                  % (len(regressions), args.threshold))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
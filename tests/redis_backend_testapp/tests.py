@@ -2,17 +2,32 @@
 
 from __future__ import absolute_import, unicode_literals, print_function
 
+import gc
 import sys
+import threading
 import time
 import datetime
+import json
+import random
+import warnings
+import weakref
+from optparse import OptionParser
 
 try:
     from unittest.mock import patch
 except ImportError:
     from mock import patch
 
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
 from django.conf import settings
 from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
 
 try:
     from django.core.cache import caches
@@ -23,9 +38,20 @@ except ImportError:
 
 from django.test import TestCase
 
+import redis
+
 import django_redis.cache
-from django_redis import pool
+from django_redis import instrumentation, memory, pool, profiling, stale
+from django_redis.breaker import CircuitBreaker
 from django_redis.client import herd
+from django_redis.exceptions import ValueSizeWarning, ValueTooLarge
+from django_redis.jitter import TTLJitter
+from django_redis.loadgen import Workload, ZipfKeys, parse_mix
+from django_redis.management.base import optparse_options
+from django_redis.management.commands import redis_big_keys, redis_hot_keys, redis_load
+from django_redis.replicas import LatencyAwareReplicaSelector, ReadHedger, WriteTracker
+from django_redis.singleflight import SingleFlight
+from django_redis.signals import cache_metric, cache_profiled, circuit_breaker_state_changed
 
 from django_redis.serializers.json import JSONSerializer
 from django_redis.serializers.msgpack import MSGPackSerializer
@@ -33,6 +59,10 @@ from django_redis.serializers.msgpack import MSGPackSerializer
 
 herd.CACHE_HERD_TIMEOUT = 2
 
+# Whether the caches use the in-memory server (runtests-memory.py).
+IN_MEMORY = getattr(settings, "DJANGO_REDIS_CONNECTION_FACTORY", None) == \
+    "django_redis.memory.InMemoryConnectionFactory"
+
 if sys.version_info[0] < 3:
     text_type = unicode
     bytes_type = str
@@ -91,6 +121,1444 @@ class DjangoRedisConnectionStrings(TestCase):
         self.assertEqual(res3["url"], self.constring6)
 
 
+class LatencyAwareReplicaSelectorTests(TestCase):
+    def setUp(self):
+        self.selector = LatencyAwareReplicaSelector(["master", "r1", "r2", "r3"],
+                                                    eject_errors=2, eject_timeout=60)
+
+    def test_prefers_fast_replicas(self):
+        for index, latency in [(1, 0.010), (2, 0.001), (3, 0.050)]:
+            self.selector.start(index)
+            self.selector.finish(index, latency)
+
+        choices = [self.selector.select() for x in range(200)]
+        self.assertNotIn(3, choices)
+        self.assertTrue(choices.count(2) > choices.count(1))
+
+    def test_ejects_failing_replicas(self):
+        for x in range(2):
+            self.selector.start(1)
+            self.selector.finish(1, 0.001, failed=True)
+
+        choices = set(self.selector.select() for x in range(100))
+        self.assertEqual(choices, set([2, 3]))
+
+        for index in (2, 3):
+            for x in range(2):
+                self.selector.start(index)
+                self.selector.finish(index, 0.001, failed=True)
+
+        self.assertEqual(self.selector.select(), 0)
+
+    def test_instrumented_client(self):
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:1,127.0.0.1:6379:1", {
+            "OPTIONS": {
+                "REPLICA_SELECTOR_CLASS": "django_redis.replicas.LatencyAwareReplicaSelector",
+            }
+        })
+        cache.set("foo", "bar")
+        self.assertEqual(cache.get("foo"), "bar")
+        self.assertEqual(cache.client.get_next_client_index(write=True), 0)
+
+        selector = cache.client._replica_selector
+        self.assertIsInstance(selector, LatencyAwareReplicaSelector)
+        self.assertTrue(selector.latency[1] > 0)
+        self.assertEqual(selector.inflight[1], 0)
+
+
+class SharedClientStateTests(TestCase):
+    def test_shared_per_settings(self):
+        params = {"OPTIONS": {"READ_YOUR_WRITES_WINDOW": 100}}
+        first = django_redis.cache.RedisCache("127.0.0.1:6379:1,127.0.0.1:6379:1", dict(params))
+        second = django_redis.cache.RedisCache("127.0.0.1:6379:1,127.0.0.1:6379:1", dict(params))
+        other = django_redis.cache.RedisCache("127.0.0.1:6379:1,127.0.0.1:6379:1",
+                                              {"OPTIONS": {"READ_YOUR_WRITES_WINDOW": 100}})
+
+        self.assertIsNot(first.client, second.client)
+        self.assertIs(first.client._backend, first)
+        self.assertIs(second.client._backend, second)
+
+        for name in ("_serializer", "connection_factory", "_server", "_clients", "_write_tracker"):
+            self.assertIs(getattr(first.client, name), getattr(second.client, name))
+            self.assertIsNot(getattr(first.client, name), getattr(other.client, name))
+
+    def test_helpers_use_a_live_client(self):
+        params = {"OPTIONS": {
+            "WRITE_BEHIND_CLASS": "django_redis.writebehind.WriteBehindQueue",
+            "WRITE_BEHIND_KWARGS": {"flush_interval": 60},
+        }}
+        first = django_redis.cache.RedisCache("127.0.0.1:6379:1", dict(params))
+        second = django_redis.cache.RedisCache("127.0.0.1:6379:1", dict(params))
+        write_behind = first.client._write_behind
+        self.assertIs(second.client._write_behind, write_behind)
+
+        first_client = weakref.ref(first.client)
+        del first
+        gc.collect()
+        self.assertIsNone(first_client())
+        self.assertIs(write_behind.client, second.client)
+
+        second.set("shared_state_key", 1)
+        second.flush_writes()
+        self.assertEqual(second.get("shared_state_key"), 1)
+        second.delete("shared_state_key")
+
+    def test_dropped_with_the_last_client(self):
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:1", {"OPTIONS": {
+            "WRITE_BEHIND_CLASS": "django_redis.writebehind.WriteBehindQueue",
+            "WRITE_BEHIND_KWARGS": {"flush_interval": 0.01},
+        }})
+        cache.set("shared_state_key", 1)
+        state = weakref.ref(cache.client._shared_state)
+        write_behind = weakref.ref(cache.client._write_behind)
+
+        # Flushed by its thread, then dropped.
+        del cache
+        time.sleep(0.05)
+        gc.collect()
+        self.assertIsNone(state())
+        self.assertIsNone(write_behind())
+
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:1", {})
+        self.assertEqual(cache.get("shared_state_key"), 1)
+        cache.delete("shared_state_key")
+
+
+class ConnectionPoolTests(TestCase):
+    def get_cache(self, location="redis://127.0.0.1:6379/3", **options):
+        options.setdefault("CONNECTION_POOL_CLASS", "django_redis.pool.ConnectionPool")
+        return django_redis.cache.RedisCache(location, {"OPTIONS": options})
+
+    def test_stats_and_warm_up(self):
+        cache = self.get_cache()
+        cache.warm_up(3)
+
+        stats = cache.connection_pool_stats()["redis://127.0.0.1:6379/3"]
+        self.assertEqual(stats["created"], 3)
+        self.assertEqual(stats["idle"], 3)
+        self.assertEqual(stats["in_use"], 0)
+
+        cache.set("foo", 1)
+        stats = cache.connection_pool_stats()["redis://127.0.0.1:6379/3"]
+        self.assertEqual(stats["created"], 3)
+        self.assertTrue(stats["waits"] > 3)
+        cache.delete("foo")
+
+    def test_blocking_pool(self):
+        connection_pool = pool.BlockingConnectionPool(max_connections=1, timeout=0.05)
+        connection = connection_pool.get_connection("GET")
+
+        self.assertRaises(redis.ConnectionError, connection_pool.get_connection, "GET")
+        self.assertEqual(connection_pool.stats()["in_use"], 1)
+        self.assertTrue(connection_pool.stats()["max_wait_time"] >= 0.05)
+
+        connection_pool.release(connection)
+        self.assertEqual(connection_pool.stats()["idle"], 1)
+
+    def test_reset_connection_pools(self):
+        if IN_MEMORY:
+            self.skipTest("needs connections to fail")
+        cache = self.get_cache()
+        cache.warm_up(2)
+        connection_pool = cache.client.get_client().connection_pool
+        connection = connection_pool._available_connections[0]
+        sock = connection._sock
+
+        pool.reset_connection_pools()
+        self.assertIsNone(connection._sock)
+        self.assertEqual(connection_pool.stats()["created"], 0)
+        self.assertRaises(Exception, sock.getpeername)
+
+        cache.set("foo", 1)
+        self.assertEqual(cache.get("foo"), 1)
+        cache.delete("foo")
+
+    def test_warm_up_option(self):
+        cache = self.get_cache("redis://127.0.0.1:6379/6", WARM_UP=2)
+        stats = cache.connection_pool_stats()["redis://127.0.0.1:6379/6"]
+        self.assertEqual(stats["created"], 2)
+        self.assertEqual(stats["idle"], 2)
+
+    def test_default_pool_keeps_no_stats(self):
+        if IN_MEMORY:
+            self.skipTest("uses the in-memory pool")
+        cache = django_redis.cache.RedisCache("redis://127.0.0.1:6379/7", {})
+        self.assertIs(type(cache.client.get_client().connection_pool), redis.ConnectionPool)
+        self.assertNotIn("redis://127.0.0.1:6379/7", cache.connection_pool_stats())
+
+
+class AutoPipelineTests(TestCase):
+    def setUp(self):
+        self.cache = django_redis.cache.RedisCache("redis://127.0.0.1:6379/4", {
+            "OPTIONS": {
+                "CONNECTION_POOL_CLASS": "django_redis.autopipeline.AutoPipelineConnectionPool",
+            }
+        })
+
+    def tearDown(self):
+        self.cache.clear()
+
+    def test_concurrent_commands(self):
+        errors = []
+
+        def worker(n):
+            try:
+                for x in range(50):
+                    key = "auto-%d-%d" % (n, x)
+                    self.cache.set(key, x)
+                    if self.cache.get(key) != x:
+                        errors.append(key)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        stats = self.cache.connection_pool_stats()["redis://127.0.0.1:6379/4"]
+        self.assertEqual(stats["batched_commands"], 1000)
+        self.assertTrue(stats["batches"] <= 1000)
+        self.assertEqual(stats["created"], 1)
+
+    def test_errors_and_pipelines(self):
+        self.cache.set("auto", "not a number")
+        self.assertRaises(redis.ResponseError,
+                          self.cache.client.get_client().incr, self.cache.make_key("auto"))
+        self.assertEqual(self.cache.get("auto"), "not a number")
+
+        with self.cache.pipeline() as p:
+            value = p.get("auto")
+        self.assertEqual(value.value, "not a number")
+
+
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker("redis://127.0.0.1:6379/1", min_requests=4,
+                                      reset_timeout=0.1)
+        self.changes = []
+        circuit_breaker_state_changed.connect(self.state_changed)
+
+    def tearDown(self):
+        circuit_breaker_state_changed.disconnect(self.state_changed)
+
+    def state_changed(self, sender, breaker, old_state, new_state, **kwargs):
+        self.changes.append((old_state, new_state))
+
+    def test_opens_on_failure_rate(self):
+        for failed in (False, True, False, True):
+            self.assertTrue(self.breaker.allow())
+            if failed:
+                self.breaker.failure()
+            else:
+                self.breaker.success()
+
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.changes, [("closed", "open")])
+
+    def test_half_open_probe(self):
+        for x in range(4):
+            self.breaker.failure()
+
+        time.sleep(0.15)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, "open")
+
+        time.sleep(0.15)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.success()
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertEqual(self.changes, [("closed", "open"), ("open", "half-open"),
+                                        ("half-open", "open"), ("open", "half-open"),
+                                        ("half-open", "closed")])
+
+    def test_fails_fast(self):
+        if IN_MEMORY:
+            self.skipTest("needs connections to fail")
+        cache = django_redis.cache.RedisCache("redis://127.0.0.1:1/1", {
+            "OPTIONS": {
+                "IGNORE_EXCEPTIONS": True,
+                "CIRCUIT_BREAKER_CLASS": "django_redis.breaker.CircuitBreaker",
+                "CIRCUIT_BREAKER_KWARGS": {"min_requests": 2},
+            }
+        })
+        self.assertEqual(cache.get("foo", "default"), "default")
+        self.assertEqual(cache.get("foo", "default"), "default")
+
+        with patch.object(redis.StrictRedis, "execute_command") as execute_command:
+            self.assertEqual(cache.get("foo", "default"), "default")
+            self.assertFalse(execute_command.called)
+
+        stats = cache.circuit_breaker_stats()["redis://127.0.0.1:1/1"]
+        self.assertEqual(stats["state"], "open")
+        self.assertEqual(stats["rejected"], 1)
+
+
+class SentinelConnectionFactoryTests(TestCase):
+    options = {
+        "CONNECTION_FACTORY": "django_redis.pool.SentinelConnectionFactory",
+        "SENTINELS": [("127.0.0.1", 26379)],
+        "SENTINEL_TOPOLOGY_TIMEOUT": 60,
+    }
+
+    def test_topology_cache(self):
+        sentinel = pool.CachedSentinel([("127.0.0.1", 26379)], topology_timeout=60)
+        with patch.object(pool.Sentinel, "discover_master",
+                          return_value=("127.0.0.1", 6379)) as discover_master:
+            self.assertEqual(sentinel.discover_master("mymaster"), ("127.0.0.1", 6379))
+            self.assertEqual(sentinel.discover_master("mymaster"), ("127.0.0.1", 6379))
+            self.assertEqual(discover_master.call_count, 1)
+
+            sentinel.reset("mymaster")
+            sentinel.discover_master("mymaster")
+            self.assertEqual(discover_master.call_count, 2)
+
+    def test_connection_pools(self):
+        factory = pool.get_connection_factory(options=self.options)
+        self.assertIsInstance(factory, pool.SentinelConnectionFactory)
+
+        master = factory.connect("redis://MyMaster/2").connection_pool
+        slave = factory.connect("redis://MyMaster/2?is_master=0").connection_pool
+
+        self.assertEqual(master.service_name, "MyMaster")
+        self.assertTrue(master.is_master)
+        self.assertFalse(slave.is_master)
+        self.assertEqual(slave.connection_kwargs["db"], 2)
+        self.assertIs(master.sentinel_manager, factory.sentinel)
+
+    def test_master_and_replicas(self):
+        try:
+            masters = redis.StrictRedis(port=26379).sentinel_masters()
+        except redis.ConnectionError:
+            self.skipTest("no sentinel listening on 127.0.0.1:26379")
+        if not masters:
+            self.skipTest("no master monitored by the sentinel")
+
+        service = list(masters)[0]
+        location = "redis://{0}/1,redis://{0}/1?is_master=0".format(service)
+        cache = django_redis.cache.RedisCache(location, {"OPTIONS": self.options})
+        cache.set("foo", "bar")
+
+        master = cache.client.get_client(write=True)
+        self.assertEqual(cache.client.get("foo", client=master), "bar")
+        self.assertIn(service, cache.client.connection_factory.sentinel._masters)
+
+
+class ReadHedgerTests(TestCase):
+    def slow_first(self, index):
+        if index == 1:
+            time.sleep(0.5)
+        return index
+
+    def test_hedges_slow_reads(self):
+        hedger = ReadHedger(["master", "r1", "r2"], delay=0.01, budget=1)
+        started = time.time()
+        self.assertEqual(hedger.read(self.slow_first, 1), 2)
+        self.assertTrue(time.time() - started < 0.4)
+        self.assertEqual(hedger.hedges, 1)
+
+    def test_budget(self):
+        hedger = ReadHedger(["master", "r1", "r2"], delay=0.01, budget=0.5)
+        self.assertEqual(hedger.read(self.slow_first, 1), 1)
+        self.assertEqual(hedger.read(self.slow_first, 1), 2)
+        self.assertEqual(hedger.hedges, 1)
+
+    def test_adaptive_delay(self):
+        hedger = ReadHedger(["master", "r1", "r2"], min_samples=10)
+        self.assertIsNone(hedger.get_delay())
+
+        for x in range(10):
+            hedger.read(lambda index: index, 2)
+        self.assertTrue(0 < hedger.get_delay() < 0.1)
+
+    def test_delay_percentile(self):
+        hedger = ReadHedger(["master", "r1", "r2"], percentile=1, min_samples=10,
+                            refresh_samples=5)
+        for latency in range(1, 11):
+            hedger._measured(latency)
+        self.assertEqual(hedger.get_delay(), 1)
+
+        # Computed again every refresh_samples reads.
+        hedger.percentile = 100
+        for latency in range(11, 15):
+            hedger._measured(latency)
+        self.assertEqual(hedger.get_delay(), 1)
+        hedger._measured(15)
+        self.assertEqual(hedger.get_delay(), 15)
+
+    def test_reads_not_hedged_run_inline(self):
+        hedger = ReadHedger(["master", "r1", "r2"], min_samples=10)
+        thread = threading.current_thread()
+        self.assertTrue(hedger.read(lambda index: threading.current_thread() is thread, 1))
+
+        hedger = ReadHedger(["master", "r1", "r2"], delay=0.01, budget=0)
+        self.assertTrue(hedger.read(lambda index: threading.current_thread() is thread, 1))
+
+    def test_hedged_cache_reads(self):
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:1,127.0.0.1:6379:1,127.0.0.1:6379:1", {
+            "OPTIONS": {
+                "READ_HEDGER_CLASS": "django_redis.replicas.ReadHedger",
+                "READ_HEDGER_KWARGS": {"delay": 0.05},
+            }
+        })
+        cache.set_many({"hedged-a": 1, "hedged-b": 2})
+        self.assertEqual(cache.get("hedged-a"), 1)
+        self.assertEqual(cache.get_many(["hedged-a", "hedged-b", "hedged-c"]),
+                         {"hedged-a": 1, "hedged-b": 2})
+        self.assertEqual(cache.client._read_hedger.reads, 2)
+        cache.delete_many(["hedged-a", "hedged-b"])
+
+
+class NamespaceGenerationTests(TestCase):
+    def test_generations_are_read_from_the_master(self):
+        # The slave, another database, never sees the invalidation.
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:5,127.0.0.1:6379:6", {})
+        self.addCleanup(cache.clear)
+        cache.invalidate_namespace("ns1")
+        cache.client._namespace_generations.clear()
+
+        self.assertEqual(cache.client.get_namespace_generation("ns1"), 1)
+        cache.client._namespace_generations.clear()
+        self.assertIsNone(cache.get("a", namespace="ns1"))
+        self.assertEqual(cache.client.get_namespace_generation("ns1"), 1)
+
+    def test_cached_generations_are_bounded(self):
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:5", {
+            "OPTIONS": {"NAMESPACE_GENERATION_CACHE_SIZE": 2},
+        })
+        self.addCleanup(cache.clear)
+        for x in range(5):
+            cache.client.get_namespace_generation("ns%d" % x)
+        self.assertTrue(len(cache.client._namespace_generations) <= 2)
+
+
+class ReadYourWritesTests(TestCase):
+    def test_window(self):
+        tracker = WriteTracker(50)
+        self.assertFalse(tracker.recently_written(["foo"]))
+
+        tracker.written(["foo"])
+        self.assertTrue(tracker.recently_written(["bar"]))
+
+        time.sleep(0.1)
+        self.assertFalse(tracker.recently_written(["foo"]))
+
+    def test_tracked_keys(self):
+        tracker = WriteTracker(1000, max_keys=2)
+        tracker.written(["a", "b"])
+        tracker.written(["c"])
+
+        self.assertFalse(tracker.recently_written(["a", "x"]))
+        self.assertTrue(tracker.recently_written(["x", "b"]))
+        self.assertTrue(tracker.recently_written(["c"]))
+
+    def test_keyless_writes_are_writes_of_every_key(self):
+        tracker = WriteTracker(50, max_keys=2)
+        tracker.written(["a"])
+        tracker.written()
+        self.assertTrue(tracker.recently_written(["x"]))
+
+        time.sleep(0.1)
+        self.assertFalse(tracker.recently_written(["x"]))
+
+    def test_reads_routed_to_master(self):
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:1,127.0.0.1:6379:1", {
+            "OPTIONS": {
+                "READ_YOUR_WRITES_WINDOW": 1000,
+                "READ_YOUR_WRITES_MAX_KEYS": 10,
+            }
+        })
+        cache.client._write_tracker.keys.clear()
+        cache.client._write_tracker.last_keyless_write = 0
+        cache.set("foo", 1)
+
+        with patch.object(cache.client, "get_client", wraps=cache.client.get_client) as get_client:
+            self.assertEqual(cache.get("foo"), 1)
+            get_client.assert_called_with(write=True)
+
+            self.assertEqual(cache.get_many(["bar", "foo"]), {"foo": 1})
+            get_client.assert_called_with(write=True)
+
+            cache.get("bar")
+            get_client.assert_called_with(write=False)
+
+    def test_invalidated_tags_are_tracked(self):
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:1,127.0.0.1:6379:1", {
+            "OPTIONS": {
+                "READ_YOUR_WRITES_WINDOW": 1000,
+                "READ_YOUR_WRITES_MAX_KEYS": 10,
+            }
+        })
+        cache.set_many({"foo": 1, "bar": 2}, tags=["t"])
+        cache.client._write_tracker.keys.clear()
+
+        self.assertEqual(cache.invalidate_tags(["t"]), 2)
+        self.assertEqual(set(cache.client._write_tracker.keys), set(["foo", "bar"]))
+
+    def test_writes_are_tracked_once_acknowledged(self):
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:1,127.0.0.1:6379:1", {
+            "OPTIONS": {
+                "READ_YOUR_WRITES_WINDOW": 1000,
+                "READ_YOUR_WRITES_MAX_KEYS": 10,
+            }
+        })
+        cache.delete("foo")
+        self.addCleanup(cache.delete, "foo")
+        written = []
+
+        def record(keys=()):
+            written.append((list(keys), cache.has_key("foo")))
+
+        with patch.object(cache.client._write_tracker, "written", side_effect=record):
+            cache.set("foo", 1)
+        self.assertEqual(written, [(["foo"], True)])
+
+
+class WriteBehindTests(TestCase):
+    def get_cache(self, **kwargs):
+        options = {"flush_interval": 60}
+        options.update(kwargs)
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:5", {
+            "OPTIONS": {
+                "WRITE_BEHIND_CLASS": "django_redis.writebehind.WriteBehindQueue",
+                "WRITE_BEHIND_KWARGS": options,
+            }
+        })
+        self.addCleanup(cache.clear)
+        return cache
+
+    def test_coalesced_writes(self):
+        cache = self.get_cache()
+        self.assertTrue(cache.set("foo", 1))
+        cache.set("foo", 2)
+        cache.expire("foo", 100)
+        cache.set("bar", 1)
+        cache.delete("bar")
+
+        self.assertIsNone(cache.get("foo"))
+        self.assertEqual(len(cache.client._write_behind), 2)
+
+        cache.flush_writes()
+        self.assertEqual(cache.get("foo"), 2)
+        self.assertTrue(90 < cache.ttl("foo") <= 100)
+        self.assertFalse(cache.has_key("bar"))
+
+        stats = cache.write_behind_stats()
+        self.assertEqual(stats["queued"], 5)
+        self.assertEqual(stats["coalesced"], 3)
+        self.assertEqual(stats["flushed"], 2)
+        self.assertEqual(stats["batches"], 1)
+
+    def test_overflow(self):
+        cache = self.get_cache(max_size=2, overflow="drop")
+        for key, value in [("a", 1), ("b", 2), ("c", 3)]:
+            cache.set(key, value)
+        cache.set("a", 4)
+        cache.flush_writes()
+
+        self.assertEqual(cache.get_many(["a", "b", "c"]), {"a": 4, "b": 2})
+        self.assertEqual(cache.write_behind_stats()["dropped"], 1)
+
+        cache = self.get_cache(max_size=2)
+        for key, value in [("a", 1), ("b", 2), ("c", 3)]:
+            cache.set(key, value)
+        self.assertEqual(len(cache.client._write_behind), 1)
+        self.assertEqual(cache.get_many(["a", "b"]), {"a": 1, "b": 2})
+
+    def test_synchronous_writes_keep_order(self):
+        cache = self.get_cache()
+        cache.set("foo", 1)
+        cache.incr("foo")
+        self.assertEqual(cache.get("foo"), 2)
+
+        cache.set("bar", 1)
+        cache.delete_pattern("*")
+        self.assertIsNone(cache.get("bar"))
+
+    def test_values_are_encoded_when_queued(self):
+        cache = self.get_cache()
+        value = {"foo": 1}
+        cache.set("foo", value)
+        value["foo"] = 2
+        with self.assertRaises(Exception):
+            cache.set("bar", lambda: None)
+        cache.flush_writes()
+        self.assertEqual(cache.get("foo"), {"foo": 1})
+        self.assertFalse(cache.has_key("bar"))
+
+    def test_failed_writes_do_not_fail_the_batch(self):
+        cache = self.get_cache()
+        # A tag set holding a string fails the write tagged with it.
+        raw_client = cache.client.get_client(write=True)
+        raw_client.set(cache.client.make_tag_key("foo"), "bar")
+        stats = cache.write_behind_stats()
+
+        cache.set("foo", 1)
+        cache.set("bar", 2, tags=["foo"])
+        cache.set("baz", 3)
+        with patch("django_redis.writebehind.logger") as logger:
+            cache.flush_writes()
+        self.assertEqual(logger.error.call_count, 1)
+
+        self.assertEqual(cache.get_many(["foo", "baz"]), {"foo": 1, "baz": 3})
+        self.assertEqual(cache.write_behind_stats()["flushed"], stats["flushed"] + 2)
+        self.assertEqual(cache.write_behind_stats()["failed"], stats["failed"] + 1)
+
+    def test_background_flush(self):
+        cache = self.get_cache(flush_interval=0.01)
+        cache.set("foo", 1)
+        time.sleep(0.2)
+        self.assertEqual(cache.get("foo"), 1)
+
+    def test_shard_client_unsupported(self):
+        with self.assertRaises(ImproperlyConfigured):
+            django_redis.cache.RedisCache("127.0.0.1:6379:5", {
+                "OPTIONS": {
+                    "CLIENT_CLASS": "django_redis.client.ShardClient",
+                    "WRITE_BEHIND_CLASS": "django_redis.writebehind.WriteBehindQueue",
+                }
+            }).client
+
+
+class BufferedCountersTests(TestCase):
+    def setUp(self):
+        self.cache = django_redis.cache.RedisCache("127.0.0.1:6379:5", {
+            "OPTIONS": {"BUFFERED_COUNTERS_KWARGS": {"flush_interval": 60}},
+        })
+        self.addCleanup(self.cache.clear)
+
+    def test_buffered_increments(self):
+        self.cache.set("hits", 10, timeout=None)
+        self.cache.incr_buffered("hits")
+        self.cache.incr_buffered("hits", 5)
+        self.cache.incr_buffered("misses", timeout=100)
+        self.assertEqual(self.cache.get("hits"), 10)
+        self.assertIsNone(self.cache.get("misses"))
+
+        self.assertEqual(self.cache.flush_counters(), 2)
+        self.assertEqual(self.cache.get("hits"), 16)
+        self.assertEqual(self.cache.get("misses"), 1)
+        self.assertIsNone(self.cache.ttl("hits"))
+        self.assertTrue(90 < self.cache.ttl("misses") <= 100)
+
+        stats = self.cache.buffered_counters_stats()
+        self.assertEqual(stats["increments"], 3)
+        self.assertEqual(stats["flushed"], 2)
+        self.assertEqual(stats["pending"], 0)
+
+    def test_expired_counters_are_deleted(self):
+        self.cache.set("hits", 10, timeout=None)
+        self.cache.incr_buffered("hits", timeout=0)
+        self.cache.incr_buffered("misses", timeout=-1)
+        self.assertEqual(self.cache.flush_counters(), 2)
+        self.assertFalse(self.cache.has_key("hits"))
+        self.assertFalse(self.cache.has_key("misses"))
+
+    def test_increments_of_threads_are_merged(self):
+        def count():
+            for x in range(100):
+                self.cache.incr_buffered("hits")
+
+        threads = [threading.Thread(target=count) for x in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.cache.flush_counters(), 1)
+        self.assertEqual(self.cache.get("hits"), 400)
+        self.assertEqual(self.cache.buffered_counters_stats()["batches"], 1)
+
+    def test_failed_counters(self):
+        self.cache.set("name", "foo")
+        self.cache.incr_buffered("name")
+        self.cache.incr_buffered("hits")
+        self.cache.flush_counters()
+
+        self.assertEqual(self.cache.get("hits"), 1)
+        self.assertEqual(self.cache.buffered_counters_stats()["failed"], 1)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        self.measures = []
+        instrumentation._registry.clear()
+        self.addCleanup(instrumentation._registry.clear)
+
+    def get_cache(self, location="127.0.0.1:6379:5", **options):
+        options.setdefault("INSTRUMENTATION_CLASS", "django_redis.instrumentation.Metrics")
+        options.setdefault("INSTRUMENTATION_KWARGS", {
+            "prefix_separator": ":",
+            "sinks": [instrumentation.CallbackSink(self.record)],
+        })
+        return django_redis.cache.RedisCache(location, {"OPTIONS": options})
+
+    def record(self, name, value, kind, labels):
+        self.measures.append((name, kind, labels.get("operation")))
+
+    def test_disabled(self):
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:5", {"OPTIONS": {}})
+        self.assertIsNone(cache._metrics)
+        self.assertIsNone(cache.get("missing"))
+
+    def test_prefixes_are_bounded_across_threads(self):
+        metrics = instrumentation.Metrics("default", prefix_separator=":", max_prefixes=5)
+
+        def count(n):
+            for x in range(50):
+                metrics._prefix("%d-%d:key" % (n, x))
+
+        threads = [threading.Thread(target=count, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(metrics._prefixes), 5)
+        self.assertEqual(metrics._prefix("new:key"), "other")
+
+    def test_operations(self):
+        cache = self.get_cache()
+        self.addCleanup(cache.clear)
+        metrics = cache._metrics
+
+        cache.set("user:1", "foo")
+        self.assertEqual(cache.get("user:1"), "foo")
+        self.assertEqual(cache.get("user:2", 0), 0)
+        self.assertEqual(cache.get_many(["user:1", "session:1"]), {"user:1": "foo"})
+
+        self.assertEqual(metrics.alias, "127.0.0.1:6379:5")
+        self.assertEqual(metrics.get_counter("hits"), 2)
+        self.assertEqual(metrics.get_counter("misses", prefix="user"), 1)
+        self.assertEqual(metrics.get_counter("misses", prefix="session"), 1)
+        self.assertEqual(metrics.get_counter("bytes_received"), 2 * len(cache.client._encode("foo")))
+        self.assertEqual(metrics.get_histogram("operation", operation="get", key="user:1").count, 2)
+        self.assertEqual(metrics.get_histogram("encode").count, 1)
+
+        self.assertIn(("operation", "timing", "set"), self.measures)
+        self.assertIn(("hits", "counter", None), self.measures)
+
+    def test_ignored_errors(self):
+        if IN_MEMORY:
+            self.skipTest("needs connections to fail")
+        cache = self.get_cache("127.0.0.1:1:0", IGNORE_EXCEPTIONS=True)
+        self.assertIsNone(cache.get("foo"))
+        self.assertIsNone(cache.set("foo", 1))
+        self.assertEqual(cache._metrics.get_counter("ignored_errors"), 2)
+        self.assertEqual(cache._metrics.get_counter("ignored_errors", operation="set"), 1)
+
+    def test_signal_sink(self):
+        received = []
+
+        def receiver(sender, name, value, kind, labels, **kwargs):
+            received.append((name, labels["alias"]))
+
+        cache_metric.connect(receiver)
+        self.addCleanup(cache_metric.disconnect, receiver)
+
+        caches = dict(settings.CACHES, instrumented={
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": "127.0.0.1:6379:5",
+            "OPTIONS": {
+                "INSTRUMENTATION_CLASS": "django_redis.instrumentation.Metrics",
+                "INSTRUMENTATION_KWARGS": {"sinks": ["django_redis.instrumentation.SignalSink"]},
+            },
+        })
+        with self.settings(CACHES=caches):
+            cache = django_redis.cache.RedisCache("127.0.0.1:6379:5", caches["instrumented"])
+            cache.has_key("foo")
+
+        self.assertEqual(received, [("operation", "instrumented")])
+
+    def test_prometheus_text(self):
+        cache = self.get_cache()
+        cache.get("user:1")
+
+        text = instrumentation.prometheus_text()
+        self.assertIn("# TYPE django_redis_operation_seconds histogram\n", text)
+        self.assertIn('django_redis_operation_seconds_count{alias="127.0.0.1:6379:5",'
+                      'operation="get",prefix="user"} 1\n', text)
+        self.assertIn('le="+Inf"', text)
+        self.assertIn('django_redis_misses_total{alias="127.0.0.1:6379:5",prefix="user"} 1\n', text)
+
+        response = instrumentation.metrics_view(None)
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4")
+
+
+class HotKeysTests(TestCase):
+    def get_cache(self, **kwargs):
+        options = {"sample_rate": 1, "top_k": 3, "hot_threshold": 3}
+        options.update(kwargs)
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:5", {
+            "OPTIONS": {
+                "HOT_KEYS_CLASS": "django_redis.hotkeys.HotKeyTracker",
+                "HOT_KEYS_KWARGS": options,
+            },
+        })
+        self.addCleanup(cache.clear)
+        return cache
+
+    def test_top_keys(self):
+        cache = self.get_cache()
+        for key, count in [("a", 5), ("b", 1), ("c", 3), ("d", 4), ("e", 2)]:
+            for x in range(count):
+                cache.get(key)
+
+        top = cache.hot_keys()
+        self.assertEqual([count for key, count in top], [5, 4, 3])
+        self.assertEqual(top[0][0], str(cache.client.make_key("a")))
+        self.assertTrue(cache.client._hot_keys.is_hot(cache.client.make_key("d")))
+        self.assertFalse(cache.client._hot_keys.is_hot(cache.client.make_key("e")))
+
+    def test_decay(self):
+        cache = self.get_cache(decay_interval=0)
+        for x in range(4):
+            cache.get("a")
+        self.assertEqual(cache.hot_keys(), [(str(cache.client.make_key("a")), 1)])
+
+    def test_local_cache(self):
+        cache = self.get_cache(local_timeout=10)
+        cache.set("foo", 1)
+        for x in range(4):
+            self.assertEqual(cache.get("foo"), 1)
+
+        raw = cache.client.get_client(write=True)
+        raw.set(cache.client.make_key("foo"), 2)
+        self.assertEqual(cache.get("foo"), 1)
+        self.assertEqual(cache.client._hot_keys.local_hits, 3)
+
+        cache.set("foo", 3)
+        self.assertEqual(cache.get("foo"), 3)
+
+    def test_local_cache_skips_misses_and_writes(self):
+        cache = self.get_cache(local_timeout=10)
+        for x in range(4):
+            self.assertIsNone(cache.get("foo"))
+        raw = cache.client.get_client(write=True)
+        raw.set(cache.client.make_key("foo"), cache.client.encode(1))
+        self.assertEqual(cache.get("foo"), 1)
+
+        # A value read before a write of the process ends is not kept.
+        tracker = cache.client._hot_keys
+        nkey = cache.client.make_key("foo")
+        writes = tracker.writes
+        cache.set("foo", 2)
+        tracker.set_local(nkey, "foo", cache.client.encode(1), writes)
+        self.assertEqual(tracker.get_local(nkey), (False, None))
+        self.assertEqual(cache.get("foo"), 2)
+
+    def test_published(self):
+        caches = dict(settings.CACHES, hot={
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": "127.0.0.1:6379:5",
+            "OPTIONS": {
+                "HOT_KEYS_CLASS": "django_redis.hotkeys.HotKeyTracker",
+                "HOT_KEYS_KWARGS": {"sample_rate": 1},
+            },
+        })
+        with self.settings(CACHES=caches):
+            cache = get_cache("hot")
+            self.addCleanup(cache.clear)
+            for x in range(3):
+                cache.get("foo")
+            cache.client._hot_keys.publish()
+
+            self.assertEqual(cache.published_hot_keys(), [(str(cache.client.make_key("foo")), 3)])
+
+            out = StringIO()
+            call_command(redis_hot_keys.Command(), cache="hot", stdout=out)
+            self.assertEqual(out.getvalue(), "3  %s\n" % cache.client.make_key("foo"))
+
+            with self.assertRaises(CommandError):
+                call_command(redis_hot_keys.Command(), cache="default")
+
+    def test_optparse_options(self):
+        # The options of the commands for Django < 1.8.
+        parser = OptionParser(option_list=list(optparse_options(redis_hot_keys.Command.add_arguments)))
+        self.assertEqual(vars(parser.parse_args(["--count", "5"])[0]),
+                         {"cache": "default", "count": 5})
+
+
+class ValueSizeTests(TestCase):
+    def get_cache(self, **options):
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:5", {"OPTIONS": options})
+        self.addCleanup(cache.clear)
+        return cache
+
+    def test_soft_limit_warns(self):
+        cache = self.get_cache(VALUE_SIZE_SOFT_LIMIT=100)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            cache.set("small", "a")
+            cache.set("big", "a" * 1000)
+
+        self.assertEqual([w.category for w in caught if w.category is ValueSizeWarning],
+                         [ValueSizeWarning])
+        self.assertEqual(cache.get("big"), "a" * 1000)
+
+    def test_soft_limit_compresses(self):
+        cache = self.get_cache(VALUE_SIZE_SOFT_LIMIT=100, VALUE_SIZE_SOFT_LIMIT_ACTION="compress")
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            cache.set("big", "a" * 1000)
+
+        self.assertFalse([w for w in caught if w.category is ValueSizeWarning])
+        raw = cache.client.get_client(write=True).get(cache.client.make_key("big"))
+        self.assertLess(len(raw), 100)
+        self.assertEqual(cache.get("big"), "a" * 1000)
+
+    def test_hard_limit_rejects(self):
+        cache = self.get_cache(VALUE_SIZE_HARD_LIMIT=100)
+        with self.assertRaises(ValueTooLarge):
+            cache.set("big", "a" * 1000)
+        self.assertFalse(cache.has_key("big"))
+
+        with self.assertRaises(ImproperlyConfigured):
+            django_redis.cache.RedisCache("127.0.0.1:6379:5", {
+                "OPTIONS": {"VALUE_SIZE_SOFT_LIMIT_ACTION": "drop"},
+            }).client
+
+    def test_size_metrics(self):
+        instrumentation._registry.clear()
+        self.addCleanup(instrumentation._registry.clear)
+        cache = self.get_cache(INSTRUMENTATION_CLASS="django_redis.instrumentation.Metrics",
+                               INSTRUMENTATION_KWARGS={"prefix_separator": ":"},
+                               COMPRESS_MIN_LEN=10)
+        cache.set("page:1", "a" * 1000)
+        cache.set("user:1", 1)
+
+        metrics = cache._metrics
+        self.assertEqual(metrics.get_histogram("value_raw", key="page:1").sum, 1000)
+        self.assertEqual(metrics.get_histogram("value_serialized", key="page:1").count, 1)
+        self.assertIsNone(metrics.get_histogram("value_stored", key="user:1"))
+        self.assertLess(metrics.compression_ratio(prefix="page"), 0.1)
+        self.assertIn("django_redis_value_stored_bytes_bucket", instrumentation.prometheus_text())
+
+    def test_big_keys_command(self):
+        self.addCleanup(cache.delete_many, ["big:1", "big:2", "small:1"])
+        cache.set("big:1", "a" * 5000)
+        cache.set("big:2", "a" * 100)
+        cache.set("small:1", 1)
+
+        out = StringIO()
+        call_command(redis_big_keys.Command(), stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertIn("prefix", lines[0])
+        self.assertTrue(lines[1].endswith("big (big:1)"))
+
+
+class InMemoryServerTests(TestCase):
+    def setUp(self):
+        self.cache = django_redis.cache.RedisCache("redis://memory-tests:6379/0", {
+            "OPTIONS": {"CONNECTION_POOL_CLASS": "django_redis.memory.InMemoryConnectionPool"},
+        })
+        self.addCleanup(memory.flush_all)
+
+    def test_commands(self):
+        client = self.cache.client.get_client()
+        self.assertIsInstance(client.connection_pool.get_connection("GET"),
+                              memory.InMemoryConnection)
+
+        self.assertTrue(client.set("a", 1, ex=10))
+        self.assertIsNone(client.set("a", 2, nx=True))
+        self.assertEqual(client.get("a"), b"1")
+        self.assertEqual(client.incr("a", 4), 5)
+        self.assertEqual(client.ttl("a"), 10)
+        self.assertTrue(client.persist("a"))
+        self.assertEqual(client.ttl("a"), -1)
+
+        client.mset({"b:1": "x", "b:2": "y", "b[3]": "z"})
+        self.assertEqual(client.mget(["b:1", "c"]), [b"x", None])
+        self.assertEqual(sorted(client.scan_iter("b:?")), [b"b:1", b"b:2"])
+        self.assertEqual(client.keys("b\\[*"), [b"b[3]"])
+        self.assertEqual(client.delete("b:1", "b:2", "c"), 2)
+
+        client.sadd("s", "x")
+        self.assertRaises(redis.ResponseError, client.get, "s")
+        self.assertRaises(redis.ResponseError, client.execute_command, "HSET", "h", "f", "v")
+        self.assertRaises(redis.ResponseError, client.execute_command, "GET")
+        self.assertRaises(redis.ResponseError, client.execute_command, "GET", "a", "b")
+
+        # Errors of the commands are not taken for wrong numbers of arguments.
+        server = memory.get_server(("memory-tests", 6379))
+        with patch.dict(server._commands, {b"ECHO": (lambda db, message: None + 1, 1, 1)}):
+            self.assertRaises(TypeError, client.execute_command, "ECHO", "x")
+
+        client.pexpire("a", 1)
+        time.sleep(0.01)
+        self.assertIsNone(client.get("a"))
+        self.assertEqual(client.dbsize(), 2)
+
+        # The data belongs to the server of the location, not to the pool.
+        other = django_redis.cache.RedisCache("redis://memory-tests:6379/0", {
+            "OPTIONS": {"CONNECTION_FACTORY": "django_redis.memory.InMemoryConnectionFactory",
+                        "CONNECTION_POOL_CLASS": "django_redis.pool.BlockingConnectionPool"},
+        })
+        self.assertEqual(other.client.get_client().smembers("s"), set([b"x"]))
+        self.assertIn(b"b[3]", memory.get_server(("memory-tests", 6379)).database(0).data)
+        self.assertEqual(memory.get_server(("memory-tests", 6380)).databases, {})
+
+    def test_pipelines_and_scripts(self):
+        client = self.cache.client.get_client()
+        pipeline = client.pipeline()
+        pipeline.set("a", 1).incr("a").sadd("a", "x").get("a")
+        self.assertRaises(redis.ResponseError, pipeline.execute)
+        self.assertEqual(client.get("a"), b"2")
+
+        self.cache.set("counter", 1, tags=["t"])
+        self.assertEqual(self.cache.incr("counter"), 2)
+        self.assertEqual(self.cache.invalidate_tags(["t"]), 1)
+        self.assertFalse(self.cache.has_key("counter"))
+
+        with self.cache.lock("lock", timeout=1):
+            self.assertTrue(client.exists(self.cache.make_key("lock")))
+        self.assertFalse(client.exists(self.cache.make_key("lock")))
+
+        self.assertRaises(redis.ResponseError, client.eval, "return 1", 0)
+        memory.register_script("return 1", lambda call, keys, args: 1)
+        self.assertEqual(client.eval("return 1", 0), 1)
+
+
+class LoadGenTests(TestCase):
+    def test_zipf_keys(self):
+        keys = ZipfKeys(1000)
+        rnd = random.Random(0)
+        samples = [keys.sample(rnd) for x in range(10000)]
+        self.assertTrue(all(0 <= sample < 1000 for sample in samples))
+        # The top 1% of the keys take about a third of the accesses.
+        self.assertGreater(sum(1 for sample in samples if sample < 10), 2500)
+
+    def test_workload(self):
+        self.assertEqual(parse_mix("get=3,set=1"), [("get", 3.0), ("set", 1.0)])
+        self.assertRaises(ValueError, parse_mix, "foo=1")
+
+        workload = Workload(keys=10, distribution="uniform", mix=[("get", 1)],
+                            value_size=(5, 10), prefix="load-test", fill_misses=True)
+        self.addCleanup(cache.delete_pattern, "load-test:*")
+        rnd = random.Random(0)
+        self.assertEqual(workload.execute(cache, "get", rnd), (0, 1))
+        workload.preload(cache)
+        self.assertEqual(workload.execute(cache, "get", rnd), (1, 0))
+        self.assertTrue(5 <= len(cache.get("load-test:3")) <= 10)
+
+    def test_load_command(self):
+        out = StringIO()
+        call_command(redis_load.Command(), operations=200, threads=2, keys=50,
+                     mix="get=6,get_many=2,set=1,delete=1", prefix="load-test",
+                     fill_misses=True, cleanup=True, seed=1, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report["operations"], 200)
+        self.assertEqual(report["errors"], 0)
+        self.assertEqual(sorted(report["latency"]), ["delete", "get", "get_many", "set"])
+        self.assertLessEqual(report["latency"]["get"]["p50"], report["latency"]["get"]["p99"])
+        self.assertTrue(0 < report["hit_ratio"] < 1)
+        self.assertEqual(cache.keys("load-test:*"), [])
+
+        with self.assertRaises(CommandError):
+            call_command(redis_load.Command(), mix="get=1,scan=1")
+
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        self.spans = []
+        profiling._registry.clear()
+        self.addCleanup(profiling._registry.clear)
+
+    def get_cache(self, sample_rate=1, **options):
+        options.setdefault("PROFILER_CLASS", "django_redis.profiling.Profiler")
+        options.setdefault("PROFILER_KWARGS", {
+            "sample_rate": sample_rate,
+            "exporters": [profiling.CallbackExporter(self.spans.append)],
+        })
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:5", {"OPTIONS": options})
+        self.addCleanup(cache.clear)
+        return cache
+
+    def test_spans(self):
+        cache = self.get_cache(COMPRESS_MIN_LEN=1)
+        cache.set("foo", "a" * 100)
+        self.assertEqual([span["name"] for span in self.spans],
+                         ["set", "make_key", "serialize", "compress", "SET"])
+        operation, make_key, serialize, compress, command = self.spans
+        self.assertIsNone(operation["parent_id"])
+        self.assertEqual(operation["attributes"]["cache.key"], "foo")
+        self.assertTrue(all(span["trace_id"] == operation["trace_id"] and
+                            span["parent_id"] == operation["span_id"]
+                            for span in self.spans[1:]))
+        self.assertLess(compress["attributes"]["bytes.out"], compress["attributes"]["bytes.in"])
+        self.assertEqual(command["attributes"]["db.statement"][:10], "SET :1:foo")
+        self.assertGreater(command["attributes"]["net.bytes_sent"],
+                           compress["attributes"]["bytes.out"])
+        self.assertLessEqual(operation["start_time"], command["start_time"])
+        self.assertLessEqual(command["end_time"], operation["end_time"])
+
+        del self.spans[:]
+        self.assertEqual(cache.get("foo"), "a" * 100)
+        self.assertEqual([span["name"] for span in self.spans],
+                         ["get", "make_key", "GET", "decompress", "deserialize"])
+        self.assertGreater(self.spans[2]["attributes"]["net.bytes_received"], 0)
+
+        del self.spans[:]
+        cache.set_many({"a": 1, "b": 2})
+        self.assertEqual(self.spans[-1]["name"], "PIPELINE")
+        self.assertEqual(self.spans[-1]["attributes"]["db.commands"], 2)
+
+    def test_sampling(self):
+        cache = self.get_cache(sample_rate=0)
+        cache.set("foo", 1)
+        self.assertEqual(self.spans, [])
+        self.assertFalse(cache._profiler.active())
+
+        collector = profiling.collect()
+        try:
+            cache.get("foo")
+        finally:
+            profiling.stop_collecting(collector)
+        cache.get("foo")
+
+        self.assertEqual([span.name for span in collector.spans], ["get", "make_key", "GET"])
+        self.assertEqual(len(self.spans), 3)
+
+        summary = profiling.summarize(collector.spans)
+        self.assertEqual(summary["operations"], 1)
+        self.assertEqual(summary["commands"], 1)
+        self.assertEqual(summary["spans"]["make_key"]["count"], 1)
+
+    def test_middleware(self):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+
+        cache = self.get_cache(sample_rate=0)
+        profiles = []
+
+        def receiver(sender, request, summary, spans, **kwargs):
+            profiles.append(summary)
+
+        def view(request):
+            cache.set("foo", 1)
+            cache.get("foo")
+            return HttpResponse("ok")
+
+        cache_profiled.connect(receiver)
+        self.addCleanup(cache_profiled.disconnect, receiver)
+
+        request = RequestFactory().get("/")
+        response = profiling.ProfilingMiddleware(view)(request)
+        self.assertEqual(request.cache_profile["operations"], 2)
+        self.assertEqual(profiles, [request.cache_profile])
+        self.assertTrue(response["Server-Timing"].startswith("cache;dur="))
+        self.assertIn('desc="2 operations, 2 commands"', response["Server-Timing"])
+        self.assertIn("cache-make-key;dur=", response["Server-Timing"])
+
+
+class StaleWhileRevalidateTests(TestCase):
+    def setUp(self):
+        self.cache = django_redis.cache.RedisCache("127.0.0.1:6379:5", {})
+        self.addCleanup(self.cache.clear)
+        self.calls = []
+
+    def compute(self, value):
+        def compute():
+            self.calls.append(value)
+            return value
+        return compute
+
+    def test_fresh_values(self):
+        cache = self.cache
+        self.assertEqual(cache.get_or_set("foo", self.compute(1), timeout=100, stale_ttl=50), 1)
+        self.assertEqual(cache.get_or_set("foo", self.compute(2), timeout=100, stale_ttl=50), 1)
+        self.assertEqual(self.calls, [1])
+        self.assertTrue(140 < cache.ttl("foo") <= 150)
+
+        self.assertEqual(cache.get_or_set("bar", self.compute(3), timeout=None, stale_ttl=50), 3)
+        self.assertIsNone(cache.ttl("bar"))
+
+        # Without stale_ttl, values are stored as usual.
+        self.assertEqual(cache.get_or_set("baz", 4, timeout=100), 4)
+        self.assertEqual(cache.get("baz"), 4)
+
+    def test_stale_values_are_refreshed(self):
+        cache = self.cache
+        cache.set("foo", stale.pack("old", -1), timeout=100)
+        # The refresher is shared by the caches with the same settings.
+        refreshed = cache.background_refresh_stats()["refreshed"]
+
+        self.assertEqual(cache.get_or_set("foo", self.compute("new"), timeout=100,
+                                          stale_ttl=50), "old")
+        cache.client._refresher.wait()
+        self.assertEqual(self.calls, ["new"])
+        self.assertEqual(cache.get_or_set("foo", self.compute("newer"), timeout=100,
+                                          stale_ttl=50), "new")
+        self.assertEqual(self.calls, ["new"])
+        self.assertTrue(140 < cache.ttl("foo") <= 150)
+        self.assertEqual(cache.background_refresh_stats()["refreshed"], refreshed + 1)
+
+    def test_refreshes_are_deduplicated(self):
+        cache = self.cache
+        cache.set("foo", stale.pack("old", -1), timeout=100)
+        stats = cache.background_refresh_stats()
+        computing = threading.Event()
+        self.addCleanup(computing.set)
+
+        def compute():
+            computing.wait(5)
+            self.calls.append("new")
+            return "new"
+
+        for x in range(3):
+            self.assertEqual(cache.get_or_set("foo", compute, timeout=100, stale_ttl=50), "old")
+        computing.set()
+        cache.client._refresher.wait()
+        self.assertEqual(self.calls, ["new"])
+        self.assertEqual(cache.background_refresh_stats()["scheduled"], stats["scheduled"] + 1)
+
+        # A refresh run by another process holds the lock.
+        cache.set("bar", stale.pack("old", -1), timeout=100)
+        lock = cache.lock("bar:refresh", timeout=10)
+        self.assertTrue(lock.acquire(blocking=False))
+        self.addCleanup(lock.release)
+
+        self.assertEqual(cache.get_or_set("bar", compute, timeout=100, stale_ttl=50), "old")
+        cache.client._refresher.wait()
+        self.assertEqual(stale.unpack(cache.get("bar")), ("old", True))
+        self.assertEqual(self.calls, ["new"])
+        self.assertEqual(cache.background_refresh_stats()["locked"], stats["locked"] + 1)
+
+    def test_fresh_values_are_not_refreshed(self):
+        cache = self.cache
+        refresher = cache.client._refresher
+        skipped = cache.background_refresh_stats()["skipped"]
+
+        # Refreshed by another process, or removed, once the refresh is queued.
+        cache.set("foo", stale.pack("new", 100), timeout=150)
+        refresher._refresh("foo", self.compute("newer"), 100, 50, None)
+        refresher._refresh("bar", self.compute("newer"), 100, 50, None)
+        self.assertEqual(self.calls, [])
+        self.assertEqual(cache.background_refresh_stats()["skipped"], skipped + 2)
+        self.assertFalse(cache.has_key("bar"))
+
+    def test_values_are_read_wrapped_by_get(self):
+        cache = self.cache
+        cache.get_or_set("foo", self.compute(1), timeout=100, stale_ttl=50)
+        packed = cache.get("foo")
+        self.assertEqual(packed[0], stale.STALE_MARKER)
+        self.assertEqual(stale.unpack(packed), (1, False))
+        self.assertEqual(stale.unpack(cache.get_many(["foo"])["foo"]), (1, False))
+
+
+class TTLJitterTests(TestCase):
+    def get_cache(self, **options):
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:5", {"OPTIONS": options})
+        self.addCleanup(cache.clear)
+        return cache
+
+    def test_jitter(self):
+        jitter = TTLJitter(spread=0.5)
+        timeouts = [jitter.apply(1000, "foo") for x in range(100)]
+        self.assertTrue(all(500 <= timeout <= 1000 for timeout in timeouts))
+        self.assertGreater(len(set(timeouts)), 1)
+        self.assertIsNone(jitter.apply(None, "foo"))
+        self.assertEqual(jitter.apply(1000, "foo", spread=0), 1000)
+
+        jitter = TTLJitter(spread=0.5, deterministic=True)
+        self.assertEqual(len(set(jitter.apply(1000, "foo") for x in range(10))), 1)
+        self.assertEqual(TTLJitter(spread=0.5, distribution=lambda rnd: 1).apply(1000, "foo"), 500)
+        self.assertRaises(ValueError, TTLJitter, spread=2)
+
+    def test_jittered_timeouts(self):
+        cache = self.get_cache(TTL_JITTER=0.5)
+        cache.set_many(dict(("key%d" % x, x) for x in range(20)), timeout=1000)
+        ttls = [cache.ttl("key%d" % x) for x in range(20)]
+        self.assertTrue(all(490 <= ttl <= 1000 for ttl in ttls))
+        self.assertGreater(len(set(ttls)), 1)
+
+        cache.set("foo", 1, timeout=1000, jitter=0)
+        self.assertTrue(990 < cache.ttl("foo") <= 1000)
+        self.assertTrue(cache.add("bar", 1, timeout=1000, jitter=0.001))
+        self.assertTrue(990 < cache.ttl("bar") <= 1000)
+
+        cache = self.get_cache()
+        cache.set("foo", 1, timeout=1000)
+        self.assertTrue(990 < cache.ttl("foo") <= 1000)
+        cache.set("foo", 1, timeout=1000, jitter=0.5)
+        self.assertTrue(490 <= cache.ttl("foo") <= 1000)
+
+    def test_deterministic_jitter(self):
+        cache = self.get_cache(TTL_JITTER_KWARGS={"spread": 0.5, "deterministic": True})
+        expected = TTLJitter(spread=0.5, deterministic=True).apply(1000, "foo")
+        for x in range(3):
+            cache.set("foo", 1, timeout=1000)
+            self.assertTrue(expected - 10 < cache.ttl("foo") <= expected)
+
+    def test_herd_expiration(self):
+        cache = self.get_cache(CLIENT_CLASS="django_redis.client.HerdClient", TTL_JITTER=0.5)
+        cache.set("foo", 1, timeout=1000)
+        packed = cache.client.decode(cache.client.get_client().get(cache.client.make_key("foo")))
+        ttl = cache.ttl("foo") - herd.CACHE_HERD_TIMEOUT
+        self.assertTrue(ttl - 2 <= packed[2] - int(time.time()) <= ttl + 2)
+
+
+class SingleFlightTests(TestCase):
+    def wait_for(self, condition):
+        deadline = time.time() + 5
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def run_threads(self, function, count=5):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(function()))
+                   for x in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_calls_are_shared(self):
+        single_flight = SingleFlight()
+        release = threading.Event()
+        self.addCleanup(release.set)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return object()
+
+        threads, results = self.run_threads(lambda: single_flight.do(("foo",), compute))
+        self.wait_for(lambda: single_flight.shared == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(single_flight.stats(), {"in_flight": 0, "calls": 1, "shared": 4})
+
+        # Reentrant calls run on their own.
+        self.assertEqual(single_flight.do(("foo",), lambda: single_flight.do(("foo",), lambda: 2)), 2)
+
+    def test_errors_are_shared(self):
+        single_flight = SingleFlight()
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def fail():
+            release.wait(5)
+            raise ValueError("foo")
+
+        def call():
+            try:
+                return single_flight.do(("foo",), fail)
+            except ValueError as e:
+                return e
+
+        threads, results = self.run_threads(call, count=3)
+        self.wait_for(lambda: single_flight.shared == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(single_flight.stats()["in_flight"], 0)
+
+    def test_calls_are_not_shared_after_a_write(self):
+        single_flight = SingleFlight()
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def compute():
+            release.wait(5)
+            return "old"
+
+        threads, results = self.run_threads(lambda: single_flight.do(("foo", None), compute), count=1)
+        self.wait_for(lambda: single_flight.calls == 1)
+        single_flight.written(["foo"])
+        self.assertEqual(single_flight.do(("foo", None), lambda: "new"), "new")
+        single_flight.written()
+        self.assertEqual(single_flight.do(("foo", None), lambda: "new"), "new")
+        release.set()
+        threads[0].join()
+        self.assertEqual(results, ["old"])
+        self.assertEqual(single_flight.shared, 0)
+
+    def test_get_after_set(self):
+        # A GET answered while a SET is sent is not shared with the
+        # readers starting once the SET is acknowledged.
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:5", {"OPTIONS": {}})
+        self.addCleanup(cache.clear)
+        cache.set("foo", "old")
+
+        client = cache.client
+        read_client = client.get_client(write=False)
+        replied = threading.Event()
+        release = threading.Event()
+        self.addCleanup(release.set)
+        threads = []
+
+        class SlowReplies(object):
+            def get(self, name):
+                value = read_client.get(name)
+                replied.set()
+                release.wait(5)
+                return value
+
+        def before_write(*keys):
+            del client._before_write
+            type(client)._before_write(client, *keys)
+            # Read the key between the start and the end of the write.
+            threads.extend(self.run_threads(lambda: cache.get("foo"), count=1))
+            self.assertTrue(replied.wait(5))
+            del client.get_read_client
+
+        client.get_read_client = lambda key: SlowReplies()
+        client._before_write = before_write
+        cache.set("foo", "new")
+        self.assertEqual(cache.get("foo"), "new")
+        release.set()
+        threads[0][0].join()
+        self.assertEqual(threads[1], ["old"])
+
+    def test_get_or_set(self):
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:5", {"OPTIONS": {}})
+        self.addCleanup(cache.clear)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return "bar"
+
+        shared = cache.single_flight_stats()["shared"]
+        threads, results = self.run_threads(lambda: cache.get_or_set("foo", compute, 100))
+        self.wait_for(lambda: cache.single_flight_stats()["shared"] >= shared + 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ["bar"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get("foo"), "bar")
+        self.assertEqual(cache.get_or_set("foo", compute), "bar")
+        self.assertEqual(len(calls), 1)
+
+    def test_disabled(self):
+        cache = django_redis.cache.RedisCache("127.0.0.1:6379:5", {
+            "OPTIONS": {"SINGLE_FLIGHT_CLASS": None},
+        })
+        self.addCleanup(cache.clear)
+        self.assertEqual(cache.get_or_set("foo", lambda: "bar"), "bar")
+        self.assertEqual(cache.get("foo"), "bar")
+        self.assertEqual(cache.single_flight_stats(), {})
+
+
 class DjangoRedisCacheTestCustomKeyFunction(TestCase):
     def setUp(self):
         self.old_kf = settings.CACHES['default'].get('KEY_FUNCTION')
@@ -443,6 +1911,232 @@ class DjangoRedisCacheTests(TestCase):
         except NotImplementedError as e:
             print(e)
 
+    def test_incr_version_keeps_ttl(self):
+        self.cache.set("keytest", 2, timeout=20)
+        self.cache.incr_version("keytest")
+
+        ttl = self.cache.ttl("keytest", version=2)
+        self.assertTrue(15 < ttl <= 22)
+        self.assertEqual(self.cache.get("keytest", version=2), 2)
+
+    def test_incr_version_not_found(self):
+        self.assertRaises(ValueError, self.cache.incr_version, "missing")
+
+    def test_incr_version_moves_between_nodes(self):
+        client = self.cache.client
+        if not isinstance(client, django_redis.client.ShardClient):
+            return
+
+        def moves(key):
+            old_key, new_key = client._make_version_keys(key, 1, 1)
+            return client.get_server_name(old_key) != client.get_server_name(new_key)
+        key = [key for key in ("moved-%d" % i for i in range(100)) if moves(key)][0]
+        self.cache.set(key, 1)
+        get_script = client.get_script
+
+        def write_then_get_script(script, redis_client):
+            # Written between the DUMP and the deletion of the old key.
+            self.cache.set(key, 2)
+            return get_script(script, redis_client)
+
+        with patch.object(client, "get_script", side_effect=write_then_get_script), \
+                patch.object(client, "_after_write", wraps=client._after_write) as after_write:
+            self.assertEqual(self.cache.incr_version(key), 2)
+        after_write.assert_any_call(key)
+        self.assertEqual(self.cache.get(key, version=2), 1)
+        self.assertEqual(self.cache.get(key), 2)
+        self.cache.delete(key)
+
+    def test_incr_version_many(self):
+        self.cache.set_many({"a": 1, "b": 2, "c": 3})
+
+        res = self.cache.incr_version_many(["a", "b", "c", "missing"])
+        self.assertEqual(res, {"a": 2, "b": 2, "c": 2})
+
+        res = self.cache.get_many(["a", "b", "c"])
+        self.assertEqual(res, {})
+
+        res = self.cache.get_many(["a", "b", "c"], version=2)
+        self.assertEqual(res, {"a": 1, "b": 2, "c": 3})
+
+        res = self.cache.incr_version_many((key for key in ["a", "b"]), version=2)
+        self.assertEqual(res, {"a": 3, "b": 3})
+
+    def test_invalidate_tags(self):
+        self.cache.set("a", 1, tags=["t1"])
+        self.cache.set_many({"b": 2, "c": 3}, tags=["t1", "t2"])
+        self.cache.set("d", 4, tags=["t2"])
+        self.cache.set("e", 5)
+
+        res = self.cache.invalidate_tags(["t1"])
+        self.assertEqual(res, 3)
+
+        res = self.cache.get_many(["a", "b", "c", "d", "e"])
+        self.assertEqual(res, {"d": 4, "e": 5})
+
+        res = self.cache.invalidate_tags(["t1"])
+        self.assertEqual(res, 0)
+
+    def test_tags_of_writes_not_made(self):
+        self.cache.set("a", 1)
+        self.assertFalse(self.cache.set("a", 2, nx=True, tags=["t1"]))
+
+        self.assertEqual(self.cache.invalidate_tags(["t1"]), 0)
+        self.assertEqual(self.cache.get("a"), 1)
+
+    def test_tags_do_not_collide_with_keys(self):
+        self.cache.set("tag:t1", "value")
+        self.cache.set("a", 1, tags=["t1"])
+
+        self.assertEqual(self.cache.invalidate_tags(["t1"]), 1)
+        self.assertEqual(self.cache.get("tag:t1"), "value")
+
+    def test_tags_expire_with_members(self):
+        cache = get_cache("default")
+        _params = cache._params
+        _is_shard = (_params["OPTIONS"]["CLIENT_CLASS"] ==
+                     "django_redis.client.ShardClient")
+
+        # Tag sets live on the node of their members.
+        if _is_shard:
+            return
+
+        cache.set("a", 1, timeout=10, tags=["t1"])
+        cache.set("b", 1, timeout=20, tags=["t1"])
+        cache.set("c", 1, timeout=5, tags=["t1"])
+        client = cache.client.get_client(write=True)
+        tag_key = cache.client.make_tag_key("t1")
+        self.assertTrue(15 < client.ttl(tag_key) <= 22)
+
+        cache.set("d", 1, timeout=None, tags=["t1"])
+        self.assertEqual(client.ttl(tag_key), -1)
+
+    def test_invalidate_namespace(self):
+        self.cache.set("a", 1, namespace="ns1")
+        self.cache.set_many({"b": 2, "c": 3}, namespace="ns1")
+        self.cache.set("a", 4, namespace="ns2")
+        self.cache.set("a", 5)
+
+        res = self.cache.get_many(["a", "b", "c"], namespace="ns1")
+        self.assertEqual(res, {"a": 1, "b": 2, "c": 3})
+
+        self.cache.invalidate_namespace("ns1")
+        self.assertIsNone(self.cache.get("a", namespace="ns1"))
+        self.assertEqual(self.cache.get_many(["a", "b", "c"], namespace="ns1"), {})
+        self.assertEqual(self.cache.get("a", namespace="ns2"), 4)
+        self.assertEqual(self.cache.get("a"), 5)
+
+        self.cache.set("a", 6, namespace="ns1")
+        self.assertEqual(self.cache.get("a", namespace="ns1"), 6)
+
+    def test_namespace_stale_generation(self):
+        self.cache.set("a", 1, namespace="ns1")
+        self.cache.invalidate_namespace("ns1")
+        self.cache.set("a", 2, namespace="ns1")
+
+        # Simulate another process with an outdated generation.
+        generations = self.cache.client._namespace_generations
+        for cache_key in generations:
+            generations[cache_key] = (0, 0)
+
+        self.assertEqual(self.cache.get("a", namespace="ns1"), 2)
+
+        for cache_key in generations:
+            generations[cache_key] = (0, 0)
+
+        self.assertEqual(self.cache.get_many(["a"], namespace="ns1"), {"a": 2})
+
+    def test_get_deferred(self):
+        self.cache.set_many({"a": 1, "b": 2})
+
+        with patch.object(self.cache.client, "get_many",
+                          wraps=self.cache.client.get_many) as get_many:
+            with self.cache.read_batch():
+                a = self.cache.get_deferred("a")
+                b = self.cache.get_deferred("b")
+                c = self.cache.get_deferred("c", default=3)
+                self.assertFalse(a.done())
+
+                self.assertEqual(b.value, 2)
+                self.assertTrue(a.done())
+                self.assertTrue(c.done())
+
+                d = self.cache.get_deferred("a")
+
+            self.assertTrue(d.done())
+            self.assertEqual(get_many.call_count, 2)
+
+        self.assertEqual(a.value, 1)
+        self.assertEqual(c.value, 3)
+        self.assertEqual(d.value, 1)
+
+    def test_pipeline(self):
+        try:
+            pipeline = self.cache.pipeline()
+        except NotImplementedError:
+            # Not supported for shard client.
+            return
+
+        self.cache.set("a", 1)
+        with pipeline as p:
+            a = p.get("a")
+            p.set("b", "foo")
+            added = p.add("a", 3)
+            missing = p.get("missing", default="default")
+            p.expire("a", 20)
+            deleted = p.delete("a")
+            self.assertFalse(a.done())
+
+        self.assertEqual(a.value, 1)
+        self.assertFalse(added.value)
+        self.assertEqual(missing.value, "default")
+        self.assertEqual(deleted.value, 1)
+        self.assertEqual(p.results, [1, True, False, "default", True, 1])
+
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get("b"), "foo")
+
+    def test_pipeline_transaction(self):
+        try:
+            pipeline = self.cache.pipeline(transaction=True)
+        except NotImplementedError:
+            return
+
+        with pipeline as p:
+            p.set("a", 1)
+            p.set("b", 2)
+            b = p.get("b")
+
+        self.assertEqual(b.value, 2)
+        self.assertEqual(p.results, [True, True, 2])
+
+    def test_pipeline_incr(self):
+        try:
+            pipeline = self.cache.pipeline()
+            self.cache.set("num", 1)
+
+            with pipeline as p:
+                num = p.incr("num", 2)
+                missing = p.decr("missing")
+        except NotImplementedError:
+            return
+
+        self.assertEqual(num.value, 3)
+        self.assertRaises(ValueError, lambda: missing.value)
+        self.assertFalse(self.cache.has_key("missing"))
+
+    def test_pipeline_wait(self):
+        try:
+            pipeline = self.cache.pipeline()
+        except NotImplementedError:
+            return
+
+        with pipeline as p:
+            p.set("a", 1)
+            replicas = p.wait(0, 100)
+
+        self.assertEqual(replicas.value, 0)
+
     def test_delete_pattern(self):
         for key in ["foo-aa","foo-ab", "foo-bb","foo-bc"]:
             self.cache.set(key, "foo")
@@ -592,6 +2286,12 @@ class DjangoOmitExceptionsTests(TestCase):
         self.assertEqual(self.cache.get("key", "default"), "default")
         self.assertEqual(self.cache.get("key", default="default"), "default")
 
+    def test_get_or_set_returns_the_computed_value(self):
+        self.assertEqual(self.cache.get_or_set("key", lambda: "computed"), "computed")
+        self.assertEqual(self.cache.get_or_set("key", "default"), "default")
+        self.assertEqual(self.cache.get_or_set("key", lambda: "computed", stale_ttl=10), "computed")
+        self.assertEqual(self.cache.get_or_set_stale("key", "default", stale_ttl=10), "default")
+
 
 from django.contrib.sessions.backends.cache import SessionStore as CacheSession
 
@@ -0,0 +1,57 @@
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3"
+    },
+}
+
+SECRET_KEY = "django_tests_secret_key"
+TIME_ZONE = "America/Chicago"
+LANGUAGE_CODE = "en-us"
+ADMIN_MEDIA_PREFIX = "/static/admin/"
+STATICFILES_DIRS = ()
+
+MIDDLEWARE_CLASSES = []
+
+DJANGO_REDIS_CONNECTION_FACTORY = "django_redis.memory.InMemoryConnectionFactory"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": [
+            "redis://127.0.0.1:6379?db=1",
+            "redis://127.0.0.1:6379?db=1",
+        ],
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        }
+    },
+    "doesnotexist": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "127.0.0.1:56379:1",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "CONNECTION_FACTORY": "django_redis.pool.ConnectionFactory",
+        }
+    },
+    "sample": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "127.0.0.1:6379:1,127.0.0.1:6379:1",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        }
+    },
+    "with_prefix": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "127.0.0.1:6379:1",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        },
+        "KEY_PREFIX": "test-prefix",
+    },
+}
+
+INSTALLED_APPS = (
+    "django.contrib.sessions",
+    "redis_backend_testapp",
+    "hashring_test",
+)